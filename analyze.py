@@ -2,17 +2,21 @@
 
 import argparse
 import sys
+import time
 from pathlib import Path
 import h5py
 import numpy as np
 
+from frame_cache import FrameStore
 
-def analyze_hdf5(file_path: Path) -> None:
+
+def analyze_hdf5(file_path: Path, sample_frames: int = 8) -> None:
     """
     Analyze and print out the contents of an HDF5 file.
 
     Args:
         file_path (Path): Path to the HDF5 file to analyze
+        sample_frames (int): Frames decoded per camera stream (0 to skip)
     """
     try:
         with h5py.File(file_path, "r") as f:
@@ -20,6 +24,9 @@ def analyze_hdf5(file_path: Path) -> None:
             print("\nStructure:")
             print_structure(f)
 
+            if sample_frames > 0:
+                analyze_frames(f, sample_frames)
+
             # # Detailed analysis of camera data if present
             # if "camera0_rgb" in f:
             #     print("\nDetailed Camera Data Analysis:")
@@ -61,6 +68,8 @@ def analyze_camera_data(f: h5py.File) -> None:
         print("\nDepth Data Analysis:")
         print(f"  Number of frames: {len(depth_data)}")
         print(f"  Size of first frame: {len(depth_data[0])} bytes")
+        if "codec" in depth_data.attrs:
+            print(f"  Codec: {depth_data.attrs['codec']} (sizes are encoded bytes)")
 
         # Sample the first frame data
         first_frame = depth_data[0]
@@ -82,6 +91,38 @@ def analyze_camera_data(f: h5py.File) -> None:
         )
 
 
+def analyze_frames(f: h5py.File, sample_frames: int) -> None:
+    """
+    Decode evenly spaced frames of every camera stream and report their geometry.
+
+    Args:
+        f (h5py.File): Open HDF5 file handle
+        sample_frames (int): Frames decoded per stream
+    """
+    keys = sorted(
+        key
+        for key, val in f.items()
+        if isinstance(val, h5py.Dataset)
+        and (key.endswith("_rgb") or key.endswith("_depth"))
+        and len(val)
+    )
+    if not keys:
+        return
+    print("\nDecoded Frames:")
+    with FrameStore(f) as store:
+        for key in keys:
+            n = len(f[key])
+            indices = np.unique(np.linspace(0, n - 1, min(sample_frames, n)).astype(int))
+            start = time.perf_counter()
+            frames = store.get_frames(key, indices)
+            elapsed = time.perf_counter() - start
+            first = frames[0]
+            print(
+                f"  {key}: shape {first.shape}, dtype {first.dtype}, "
+                f"{len(frames)} of {n} frames decoded in {elapsed * 1000:.1f} ms"
+            )
+
+
 def print_structure(item: h5py.Group, indent: str = "") -> None:
     """
     Recursively print the HDF5 file structure.
@@ -113,6 +154,12 @@ def parse_arguments() -> argparse.Namespace:
     parser.add_argument(
         "--compare", action="store_true", help="Compare multiple files for differences"
     )
+    parser.add_argument(
+        "--sample-frames",
+        type=int,
+        default=8,
+        help="Frames decoded per camera stream (0 to skip decoding)",
+    )
 
     return parser.parse_args()
 
@@ -130,7 +177,7 @@ def main() -> None:
             print(f"Error: {file_path} is not a file", file=sys.stderr)
             continue
 
-        analyze_hdf5(file_path)
+        analyze_hdf5(file_path, args.sample_frames)
 
     # If comparing multiple files
     if args.compare and len(args.files) > 1:
@@ -0,0 +1,128 @@
+import os
+import threading
+import time
+from typing import Dict, List, Optional
+
+from upload_engine import HASH_CACHE_NAME, MANIFEST_NAME, UploadEngine, get_backend
+
+LOW_PRIORITY_NICE = 19
+
+
+def _lower_thread_priority(niceness: int) -> None:
+    # On Linux nice values are per thread and inherited by threads it spawns,
+    # so this also covers the engine's worker pool
+    try:
+        os.setpriority(os.PRIO_PROCESS, threading.get_native_id(), niceness)
+    except (AttributeError, OSError) as e:
+        print(f"Could not lower upload thread priority: {e}")
+
+
+class BackgroundUploader:
+    """
+    Periodically delta-upload a directory while the flow keeps working.
+
+    Each cycle uploads files that have not been modified for ``settle_seconds``
+    so half-written files are not shipped; anything that changes afterwards is
+    picked up by the content-hash comparison of a later cycle. :meth:`finish`
+    stops the loop and does one last full pass, which is all the flow waits for.
+
+    Args:
+        src (str): Directory to mirror
+        dst (str): ``gs://bucket/prefix`` or local directory
+        interval (float): Seconds between cycles
+        settle_seconds (float): Minimum age of a file before it is uploaded
+        workers (int): Concurrent uploads while in the background
+        niceness (int): Nice value of the background thread
+    """
+
+    def __init__(
+        self,
+        src: str,
+        dst: str,
+        interval: float = 60.0,
+        settle_seconds: float = 30.0,
+        workers: int = 2,
+        niceness: int = LOW_PRIORITY_NICE,
+    ):
+        self.src = src
+        self.dst = dst
+        self.interval = interval
+        self.settle_seconds = settle_seconds
+        self.workers = workers
+        self.niceness = niceness
+        self.cycles: List[Dict] = []
+        self.errors: List[str] = []
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def __enter__(self) -> "BackgroundUploader":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.finish()
+
+    def start(self) -> "BackgroundUploader":
+        self._thread = threading.Thread(
+            target=self._run, name="background-upload", daemon=True
+        )
+        self._thread.start()
+        print(f"Background upload of {self.src} to {self.dst} started")
+        return self
+
+    def _settled_keys(self) -> List[str]:
+        cutoff = time.time() - self.settle_seconds
+        keys = []
+        for root, _, files in os.walk(self.src):
+            for name in files:
+                if name in (HASH_CACHE_NAME, MANIFEST_NAME) or name.endswith(".tmp"):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    if os.path.getmtime(path) <= cutoff:
+                        keys.append(os.path.relpath(path, self.src).replace(os.sep, "/"))
+                except FileNotFoundError:
+                    continue
+        return keys
+
+    def _run(self) -> None:
+        _lower_thread_priority(self.niceness)
+        engine = UploadEngine(get_backend(self.dst), workers=self.workers)
+        while not self._stop.is_set():
+            try:
+                report = engine.upload(self.src, keys=self._settled_keys())
+                if report.files_uploaded:
+                    print(f"[background] {report.summary()}")
+                self.cycles.append(report.to_dict())
+            except Exception as e:
+                # A failed cycle is retried on the next one; finish() surfaces it
+                self.errors.append(str(e))
+                print(f"[background] upload cycle failed: {e}")
+            self._stop.wait(self.interval)
+
+    def finish(self, workers: int = 8) -> Dict:
+        """
+        Stop the background loop and upload whatever is left.
+
+        Args:
+            workers (int): Concurrent uploads for the final, foreground pass
+
+        Returns:
+            Dict: Final pass report plus totals over the background cycles
+        """
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+
+        engine = UploadEngine(get_backend(self.dst), workers=workers)
+        final = engine.upload(self.src)
+        print(f"Final upload: {final.summary()}")
+
+        result = final.to_dict()
+        result["background_cycles"] = len(self.cycles)
+        result["background_bytes_uploaded"] = sum(
+            c["bytes_uploaded"] for c in self.cycles
+        )
+        result["background_errors"] = self.errors
+        result["tail_seconds"] = final.seconds
+        return result
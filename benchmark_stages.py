@@ -0,0 +1,359 @@
+#!/usr/bin/env python3
+
+import argparse
+import contextlib
+import json
+import os
+import platform as host_platform
+import shutil
+import subprocess
+import tempfile
+import time
+from dataclasses import asdict
+from typing import Dict, List, Optional
+
+import h5py
+import numpy as np
+
+from fake_platform import FakeDataPlatform, NetworkProfile
+from stage_metrics import StageRecorder
+from synthetic_data import SCALES, scaled_spec
+from upload_engine import UploadEngine
+
+EQUIDIFF_CONVERSION = (
+    "/workspaces/bdai/projects/maple/scripts/equidiff/equidiff_data_conversion.py"
+)
+STAGES = [
+    "download",
+    "discover",
+    "materialize",
+    "validate",
+    "simplify",
+    "analyze",
+    "convert",
+    "stats",
+    "upload",
+]
+
+
+class StageTimer:
+    """Accumulates wall time, item counts and logical bytes per stage."""
+
+    def __init__(self):
+        self.stages: Dict[str, Dict] = {}
+        self.recorder = StageRecorder()
+
+    @contextlib.contextmanager
+    def stage(self, name: str, num_bytes: int = 0):
+        entry = self.stages.setdefault(name, {"seconds": 0.0, "count": 0, "bytes": 0})
+        start = time.perf_counter()
+        try:
+            with self.recorder.stage(name):
+                yield entry
+        finally:
+            entry["seconds"] += time.perf_counter() - start
+            entry["count"] += 1
+            entry["bytes"] += num_bytes
+
+    def results(self) -> Dict[str, Dict]:
+        totals = self.recorder.totals()
+        for name, entry in self.stages.items():
+            entry["mb_per_s"] = entry["bytes"] / 1e6 / max(entry["seconds"], 1e-9)
+            entry["cpu_seconds"] = (
+                totals[name]["cpu_seconds"] + totals[name]["child_cpu_seconds"]
+            )
+            entry["peak_rss_mb"] = totals[name]["peak_rss_mb"]
+        return self.stages
+
+
+def _tree_bytes(path: str) -> int:
+    if os.path.isfile(path):
+        return os.path.getsize(path)
+    return sum(
+        os.path.getsize(os.path.join(dirpath, name))
+        for dirpath, _, files in os.walk(path)
+        for name in files
+    )
+
+
+def discover_layout(download_path: str) -> Dict[str, str]:
+    """
+    Locate the MCAP, ``hdf5`` directory, demo and DC json of a downloaded session.
+
+    Mirrors the directory walk the flows do after ``download``.
+    """
+    mcap_files = [
+        os.path.join(root, f)
+        for root, _, files in os.walk(download_path)
+        for f in files
+        if f.endswith(".mcap")
+    ]
+    if not mcap_files:
+        raise Exception("No mcap file found after download")
+    source_hdf5 = next(
+        (
+            os.path.join(root, "hdf5")
+            for root, dirs, _ in os.walk(download_path)
+            if "hdf5" in dirs
+        ),
+        None,
+    )
+    if not source_hdf5:
+        raise Exception("No hdf5 directory found")
+    demo_number = next(
+        item
+        for item in sorted(os.listdir(source_hdf5))
+        if item.startswith("demo_") and os.path.isdir(os.path.join(source_hdf5, item))
+    )
+    parent_dir = os.path.dirname(source_hdf5)
+    dc_json = next(f for f in os.listdir(parent_dir) if f.endswith(".json"))
+    return {
+        "mcap": mcap_files[0],
+        "hdf5": source_hdf5,
+        "demo": demo_number,
+        "dc_json": os.path.join(parent_dir, dc_json),
+        "logs": os.path.join(parent_dir, "logs"),
+    }
+
+
+def materialize(layout: Dict[str, str], output_dir: str) -> str:
+    """Copy a session into the flow output structure; returns the demo directory."""
+    demo = layout["demo"]
+    demo_dir = os.path.join(output_dir, "hdf5", demo)
+    shutil.copytree(os.path.join(layout["hdf5"], demo), demo_dir, dirs_exist_ok=True)
+    metadata = os.path.join(layout["hdf5"], f"{demo}_metadata.json")
+    if os.path.isfile(metadata):
+        shutil.copy2(metadata, os.path.join(output_dir, "hdf5"))
+    logs_dir = os.path.join(output_dir, "logs", demo)
+    os.makedirs(logs_dir, exist_ok=True)
+    if os.path.isdir(layout["logs"]):
+        for name in os.listdir(layout["logs"]):
+            shutil.copy2(os.path.join(layout["logs"], name), logs_dir)
+    shutil.copy2(layout["dc_json"], os.path.join(output_dir, "metadata.json"))
+    return demo_dir
+
+
+def convert_demos(hdf5_root: str, output: str) -> None:
+    """
+    Minimal stand-in for the equidiff conversion, used when it is not installed.
+
+    Writes the robomimic layout (``data/demo_N/obs/*`` and ``actions``) with the
+    low-dimensional state and one decoded camera stream per demo.
+    """
+    from frame_cache import FrameStore
+
+    with h5py.File(output, "w") as out:
+        data = out.create_group("data")
+        for demo in sorted(d for d in os.listdir(hdf5_root) if d.startswith("demo_")):
+            demo_dir = os.path.join(hdf5_root, demo)
+            if not os.path.isdir(demo_dir):
+                continue
+            path = os.path.join(demo_dir, f"{demo}.hdf5")
+            group = data.create_group(demo)
+            with h5py.File(path, "r") as f, FrameStore(f) as store:
+                n = len(f["timestamps"])
+                group.attrs["num_samples"] = n
+                obs = group.create_group("obs")
+                for key in ("joint_states", "ee_pose", "gripper_cmd"):
+                    obs.create_dataset(key, data=f[key][()])
+                frames = store.get_frames("camera0", range(n))
+                obs.create_dataset("camera0_image", data=np.stack(frames))
+                group.create_dataset("actions", data=f["ee_goal_pose"][()])
+
+
+def run_benchmark(
+    workdir: str,
+    scale: str = "small",
+    network: Optional[NetworkProfile] = None,
+    upload_workers: int = 8,
+    converter: Optional[str] = None,
+) -> Dict:
+    """
+    Generate a synthetic platform and time each pipeline stage against it.
+
+    Args:
+        workdir (str): Scratch directory (the platform is reused if present)
+        scale (str): Key of :data:`synthetic_data.SCALES`
+        network (Optional[NetworkProfile]): Link shaping for download and upload
+        upload_workers (int): Upload engine concurrency
+        converter (Optional[str]): Conversion script (default: equidiff if present)
+
+    Returns:
+        Dict: Run description and per-stage results
+    """
+    network = network or NetworkProfile()
+    spec = scaled_spec(scale)
+    num_sessions = SCALES[scale]["sessions"]
+    platform_root = os.path.join(workdir, f"platform_{scale}")
+    platform = FakeDataPlatform(platform_root, network)
+
+    start = time.perf_counter()
+    rows = platform.catalog()
+    if len(rows) != num_sessions:
+        rows = platform.populate(["bench_task"], num_sessions, spec)
+    generate_seconds = time.perf_counter() - start
+
+    timer = StageTimer()
+    output_dir = os.path.join(workdir, "output")
+    shutil.rmtree(output_dir, ignore_errors=True)
+    for subdir in ["videos", "hdf5", "logs"]:
+        os.makedirs(os.path.join(output_dir, subdir), exist_ok=True)
+
+    demo_dirs = []
+    for row in rows:
+        with tempfile.TemporaryDirectory(dir=workdir) as tmpdir:
+            with timer.stage("download", row["size_bytes"]):
+                platform.download(row["session_id"], data_local_path=tmpdir)
+            with timer.stage("discover"):
+                layout = discover_layout(tmpdir)
+            with timer.stage("materialize", row["size_bytes"]):
+                demo_dirs.append(materialize(layout, output_dir))
+
+    from validate_data import check_demo, load_expectations
+
+    expectations = load_expectations()
+    demo_files = []
+    for demo_dir in demo_dirs:
+        with timer.stage("validate"):
+            check_demo(demo_dir, expectations=expectations)
+        demo_files.extend(
+            os.path.join(demo_dir, name)
+            for name in sorted(os.listdir(demo_dir))
+            if name.endswith(".hdf5")
+        )
+
+    from analyze import analyze_camera_data, print_structure
+    from simplify_hdf5 import simplify_hdf5
+
+    with tempfile.TemporaryDirectory(dir=workdir) as tmpdir:
+        for path in demo_files:
+            with timer.stage("simplify", _tree_bytes(path)):
+                simplify_hdf5(path, os.path.join(tmpdir, os.path.basename(path)))
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        for path in demo_files:
+            with timer.stage("analyze", _tree_bytes(path)):
+                with h5py.File(path, "r") as f:
+                    print_structure(f)
+                    analyze_camera_data(f)
+
+    converter = converter or (
+        EQUIDIFF_CONVERSION if os.path.isfile(EQUIDIFF_CONVERSION) else None
+    )
+    dataset_path = os.path.join(output_dir, "training_data.hdf5")
+    with timer.stage("convert", _tree_bytes(os.path.join(output_dir, "hdf5"))):
+        if converter:
+            subprocess.run(
+                [
+                    "python",
+                    converter,
+                    "--source",
+                    os.path.join(output_dir, "hdf5"),
+                    "--output",
+                    dataset_path,
+                    "--point-cloud",
+                    "--collected-data",
+                    "--force",
+                ],
+                check=True,
+            )
+        else:
+            convert_demos(os.path.join(output_dir, "hdf5"), dataset_path)
+
+    from normalizer_stats import write_stats_sidecar
+
+    with timer.stage("stats", _tree_bytes(dataset_path)):
+        write_stats_sidecar(dataset_path)
+
+    dst = f"gs://maple-bench/{scale}-{int(time.time())}"
+    with timer.stage("upload", _tree_bytes(output_dir)) as entry:
+        report = UploadEngine(
+            platform.storage_backend(dst), workers=upload_workers
+        ).upload(output_dir)
+        entry["files"] = report.files_total
+    shutil.rmtree(platform.storage_backend(dst).root, ignore_errors=True)
+
+    stages = timer.results()
+    return {
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "host": host_platform.node(),
+        "cpu_count": os.cpu_count(),
+        "scale": scale,
+        "sessions": len(rows),
+        "spec": asdict(spec),
+        "network": asdict(network),
+        "converter": converter or "builtin",
+        "generate_seconds": generate_seconds,
+        "dataset_bytes": sum(row["size_bytes"] for row in rows),
+        "total_seconds": sum(entry["seconds"] for entry in stages.values()),
+        "stages": {name: stages[name] for name in STAGES if name in stages},
+    }
+
+
+def compare(current: Dict, baseline: Dict) -> List[str]:
+    """Format per-stage time ratios of ``current`` against ``baseline``."""
+    lines = []
+    for name, entry in current["stages"].items():
+        base = baseline.get("stages", {}).get(name)
+        if not base:
+            continue
+        ratio = entry["seconds"] / max(base["seconds"], 1e-9)
+        flag = "  <-- slower" if ratio > 1.2 else ""
+        lines.append(
+            f"{name:12s} {base['seconds']:8.3f}s -> {entry['seconds']:8.3f}s "
+            f"({ratio:5.2f}x){flag}"
+        )
+    return lines
+
+
+def parse_arguments() -> argparse.Namespace:
+    """
+    Parse command line arguments.
+
+    Returns:
+        argparse.Namespace: Parsed command line arguments
+    """
+    parser = argparse.ArgumentParser(
+        description="Time the pipeline stages against synthetic data and local stand-ins",
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+    )
+    parser.add_argument("--workdir", type=str, default="/tmp/maple_bench")
+    parser.add_argument("--scale", type=str, default="small", choices=sorted(SCALES))
+    parser.add_argument(
+        "--network",
+        type=str,
+        default="",
+        help="Link shaping, e.g. bandwidth_mb_s=50,latency_ms=20",
+    )
+    parser.add_argument("--upload-workers", type=int, default=8)
+    parser.add_argument("--converter", type=str, default=None, help="Conversion script")
+    parser.add_argument("--output", type=str, default=None, help="Results JSON path")
+    parser.add_argument(
+        "--compare", type=str, default=None, help="Baseline results JSON"
+    )
+    return parser.parse_args()
+
+
+def main() -> None:
+    """Run the stage benchmark and print (and optionally save) the results."""
+    args = parse_arguments()
+    os.makedirs(args.workdir, exist_ok=True)
+    results = run_benchmark(
+        args.workdir,
+        args.scale,
+        NetworkProfile.parse(args.network),
+        args.upload_workers,
+        args.converter,
+    )
+    print(json.dumps(results, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"Results saved to {args.output}")
+    if args.compare:
+        with open(args.compare, "r") as f:
+            baseline = json.load(f)
+        print("\n".join(compare(results, baseline)))
+
+
+if __name__ == "__main__":
+    main()
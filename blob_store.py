@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+
+import argparse
+import json
+import os
+import shutil
+import tempfile
+from dataclasses import asdict, dataclass, field
+from typing import Dict, List, Optional
+
+from upload_engine import build_manifest
+
+STORE_DIR_NAME = ".blob_store"
+
+
+@dataclass
+class DedupReport:
+    root: str
+    files: int = 0
+    unique_blobs: int = 0
+    bytes_total: int = 0
+    bytes_unique: int = 0
+    files_linked: int = 0
+    link_failures: int = 0
+    duplicates: Dict[str, List[str]] = field(default_factory=dict)
+
+    @property
+    def bytes_saved(self) -> int:
+        return self.bytes_total - self.bytes_unique
+
+    def to_dict(self) -> Dict:
+        result = asdict(self)
+        result["bytes_saved"] = self.bytes_saved
+        return result
+
+    def summary(self) -> str:
+        return (
+            f"{self.files} files in {self.root}: {self.unique_blobs} unique blobs, "
+            f"{self.bytes_saved / 1e6:.1f} MB of {self.bytes_total / 1e6:.1f} MB "
+            f"saved by deduplication"
+        )
+
+
+class BlobStore:
+    """
+    Local content-addressed store of files, laid out as ``<root>/<ab>/<sha256>``.
+
+    Tree files are hard links to their blob, so identical files share one copy
+    on disk. Only link trees whose files will no longer be written in place:
+    an in-place write through any link changes every file sharing the blob.
+
+    Args:
+        root (str): Store directory, on the same filesystem as the trees
+    """
+
+    def __init__(self, root: str):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+
+    def blob_path(self, digest: str) -> str:
+        return os.path.join(self.root, digest[:2], digest)
+
+    def link(self, path: str, digest: str) -> bool:
+        """
+        Make ``path`` a hard link to the blob for ``digest``, storing it if new.
+
+        Args:
+            path (str): File whose contents hash to ``digest``
+            digest (str): SHA-256 of the file
+
+        Returns:
+            bool: True if ``path`` now shares its blob with at least one other file
+        """
+        blob = self.blob_path(digest)
+        if not os.path.exists(blob):
+            os.makedirs(os.path.dirname(blob), exist_ok=True)
+            os.link(path, blob)
+            return False
+        if os.path.samefile(path, blob):
+            return os.stat(blob).st_nlink > 2
+        tmp_path = path + ".dedup.tmp"
+        os.link(blob, tmp_path)
+        os.replace(tmp_path, path)
+        return True
+
+
+def dedup_tree(tree: str, store_root: Optional[str] = None) -> DedupReport:
+    """
+    Replace identical files under ``tree`` with hard links to one stored blob.
+
+    Without ``store_root`` the blobs go to a temporary store next to the tree
+    (same filesystem, not uploaded) that is removed afterwards: the tree's
+    duplicates keep sharing one inode, and nothing outlives the call to pin
+    disk space. An explicit ``store_root`` is kept, so it can dedup across trees.
+
+    Args:
+        tree (str): Finished output directory
+        store_root (Optional[str]): Persistent blob store location
+
+    Returns:
+        DedupReport: Logical vs unique bytes and which files were duplicates
+    """
+    if store_root is None:
+        parent = os.path.dirname(os.path.abspath(tree))
+        store_root = tempfile.mkdtemp(prefix=STORE_DIR_NAME + "-", dir=parent)
+        try:
+            return _dedup_into(tree, BlobStore(store_root))
+        finally:
+            shutil.rmtree(store_root, ignore_errors=True)
+    return _dedup_into(tree, BlobStore(store_root))
+
+
+def _dedup_into(tree: str, store: BlobStore) -> DedupReport:
+    manifest = build_manifest(tree)
+    report = DedupReport(root=tree, files=len(manifest))
+
+    by_digest: Dict[str, List[str]] = {}
+    for rel, entry in manifest.items():
+        by_digest.setdefault(entry["sha256"], []).append(rel)
+        report.bytes_total += entry["size"]
+
+    for digest, paths in by_digest.items():
+        report.unique_blobs += 1
+        report.bytes_unique += manifest[paths[0]]["size"]
+        if len(paths) > 1:
+            report.duplicates[digest] = paths
+        for rel in paths:
+            try:
+                store.link(os.path.join(tree, *rel.split("/")), digest)
+                report.files_linked += 1
+            except OSError as e:
+                # e.g. EXDEV when the store is on another filesystem
+                report.link_failures += 1
+                print(f"Could not link {rel} into blob store: {e}")
+    return report
+
+
+def link_or_copy(src: str, dst: str) -> None:
+    """Hard-link ``src`` to ``dst`` when possible, falling back to a copy."""
+    if os.path.exists(dst):
+        os.remove(dst)
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copy2(src, dst)
+
+
+def parse_arguments() -> argparse.Namespace:
+    """
+    Parse command line arguments.
+
+    Returns:
+        argparse.Namespace: Parsed command line arguments
+    """
+    parser = argparse.ArgumentParser(
+        description="Deduplicate identical files in an output tree via a blob store",
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+    )
+    parser.add_argument("tree", type=str, help="Output directory to deduplicate")
+    parser.add_argument(
+        "--store", type=str, default=None, help="Persistent blob store directory"
+    )
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+    return parser.parse_args()
+
+
+def main() -> None:
+    """Deduplicate a tree and print the bytes saved."""
+    args = parse_arguments()
+    report = dedup_tree(args.tree, args.store)
+    print(report.summary())
+    for digest, paths in report.duplicates.items():
+        print(f"  {digest[:12]}: {', '.join(paths)}")
+    if args.json:
+        print(json.dumps(report.to_dict(), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+import os
+import re
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+from upload_engine import UploadEngine, get_backend
+
+EPOCH_PATTERN = re.compile(r"epoch=(\d+)")
+
+
+class CheckpointWatcher:
+    """
+    Follow a training run's checkpoints and upload each one as it lands.
+
+    The watcher polls ``root`` for checkpoint files written after it started.
+    Once the first one appears it narrows the scan to that file's directory,
+    so it never walks the whole data tree again and never picks up checkpoints
+    left over from earlier runs. A checkpoint is uploaded once its size and
+    mtime are unchanged between two polls; the upload engine's manifest skips
+    files whose content did not change.
+
+    Args:
+        root (str): Directory the trainer writes its run directories under
+        dst (str): Destination for checkpoints (``gs://...`` or local directory)
+        suffix (str): Checkpoint file suffix
+        interval (float): Seconds between polls
+        workers (int): Concurrent uploads
+    """
+
+    def __init__(
+        self,
+        root: str,
+        dst: str,
+        suffix: str = ".ckpt",
+        interval: float = 30.0,
+        workers: int = 4,
+    ):
+        self.root = root
+        self.dst = dst
+        self.suffix = suffix
+        self.interval = interval
+        self.run_dir: Optional[str] = None
+        self.lineage: List[Dict] = []
+        self.errors: List[str] = []
+        self._engine = UploadEngine(get_backend(dst), workers=workers)
+        self._last_seen: Dict[str, Tuple[int, int]] = {}
+        self._uploaded: Dict[str, Tuple[int, int]] = {}
+        self._started_at = time.time()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> "CheckpointWatcher":
+        self._started_at = time.time()
+        self._thread = threading.Thread(
+            target=self._run, name="checkpoint-watcher", daemon=True
+        )
+        self._thread.start()
+        print(f"Watching {self.root} for *{self.suffix} checkpoints")
+        return self
+
+    def _find_run_dir(self) -> Optional[str]:
+        newest, newest_mtime = None, self._started_at
+        for dirpath, _, files in os.walk(self.root):
+            for name in files:
+                if not name.endswith(self.suffix):
+                    continue
+                try:
+                    mtime = os.path.getmtime(os.path.join(dirpath, name))
+                except FileNotFoundError:
+                    continue
+                if mtime >= newest_mtime:
+                    newest, newest_mtime = dirpath, mtime
+        return newest
+
+    def _scan(self) -> Dict[str, Tuple[int, int]]:
+        if self.run_dir is None:
+            self.run_dir = self._find_run_dir()
+            if self.run_dir is None:
+                return {}
+            print(f"Found training checkpoint directory: {self.run_dir}")
+
+        current = {}
+        for name in os.listdir(self.run_dir):
+            if not name.endswith(self.suffix):
+                continue
+            try:
+                st = os.stat(os.path.join(self.run_dir, name))
+            except FileNotFoundError:
+                continue
+            current[name] = (st.st_size, st.st_mtime_ns)
+        return current
+
+    def _upload(self, current: Dict[str, Tuple[int, int]], require_stable: bool) -> None:
+        ready = [
+            name
+            for name, state in current.items()
+            if self._uploaded.get(name) != state
+            and (not require_stable or self._last_seen.get(name) == state)
+        ]
+        self._last_seen = current
+        if not ready:
+            return
+
+        report = self._engine.upload(self.run_dir, keys=ready)
+        manifest = self._engine.backend.read_manifest() or {}
+        for name in sorted(ready):
+            self._uploaded[name] = current[name]
+            entry = manifest.get(name, {})
+            epoch = EPOCH_PATTERN.search(name)
+            self.lineage.append(
+                {
+                    "name": name,
+                    "source": os.path.join(self.run_dir, name),
+                    "destination": f"{self.dst.rstrip('/')}/{name}",
+                    "sha256": entry.get("sha256"),
+                    "size": current[name][0],
+                    "epoch": int(epoch.group(1)) if epoch else None,
+                    "uploaded_at": time.time(),
+                }
+            )
+        print(f"[checkpoints] {report.summary()}")
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            try:
+                self._upload(self._scan(), require_stable=True)
+            except Exception as e:
+                self.errors.append(str(e))
+                print(f"[checkpoints] upload failed, retrying next poll: {e}")
+
+    def finish(self) -> List[Dict]:
+        """
+        Stop watching and upload any checkpoint not yet shipped.
+
+        Returns:
+            List[Dict]: Every uploaded checkpoint version, oldest first
+        """
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+        self._upload(self._scan(), require_stable=False)
+        return self.lineage
+
+    @property
+    def latest(self) -> Optional[Dict]:
+        """The most recent upload of ``latest<suffix>``, or the newest checkpoint."""
+        for entry in reversed(self.lineage):
+            if entry["name"] == f"latest{self.suffix}":
+                return entry
+        return self.lineage[-1] if self.lineage else None
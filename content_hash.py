@@ -0,0 +1,30 @@
+import hashlib
+import os
+from typing import Tuple
+
+CHUNK_SIZE = 8 * 1024 * 1024
+
+
+def file_digest(path: str, algorithm: str = "sha256", chunk_size: int = CHUNK_SIZE) -> str:
+    """
+    Hash a file's contents in fixed-size chunks.
+
+    Args:
+        path (str): File to hash
+        algorithm (str): Any ``hashlib`` algorithm name
+        chunk_size (int): Bytes read per iteration
+
+    Returns:
+        str: Hex digest of the file contents
+    """
+    h = hashlib.new(algorithm)
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def stat_key(path: str) -> Tuple[int, int]:
+    """Return ``(size, mtime_ns)``, a cheap proxy for "unchanged since hashed"."""
+    st = os.stat(path)
+    return st.st_size, st.st_mtime_ns
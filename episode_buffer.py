@@ -0,0 +1,319 @@
+#!/usr/bin/env python3
+
+import argparse
+import hashlib
+import json
+import multiprocessing as mp
+import os
+import shutil
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import h5py
+import numpy as np
+
+CACHE_ROOT_ENV = "MAPLE_EPISODE_CACHE"
+META_FILE = "meta.json"
+
+
+def demo_names(data: h5py.Group) -> List[str]:
+    """Return ``demo_N`` group names sorted by their numeric suffix."""
+    demos = [k for k in data.keys() if k.startswith("demo_")]
+    return sorted(demos, key=lambda k: int(k.split("_")[-1]))
+
+
+def episode_keys(demo: h5py.Group) -> List[str]:
+    """
+    List the per-step datasets of one episode as slash-separated keys.
+
+    Args:
+        demo (h5py.Group): A ``data/demo_N`` group of a converted dataset
+
+    Returns:
+        List[str]: Keys such as ``actions`` or ``obs/agentview_image``
+    """
+    keys = []
+
+    def visit(name, obj):
+        if isinstance(obj, h5py.Dataset) and obj.ndim > 0:
+            keys.append(name)
+
+    demo.visititems(visit)
+    return sorted(keys)
+
+
+def _cache_dir_for(hdf5_path: Path, cache_root: Optional[Path]) -> Path:
+    stat = hdf5_path.stat()
+    ident = f"{hdf5_path.resolve()}:{stat.st_size}:{stat.st_mtime_ns}"
+    digest = hashlib.sha1(ident.encode()).hexdigest()[:16]
+    root = cache_root or Path(
+        os.environ.get(CACHE_ROOT_ENV, os.path.join(tempfile.gettempdir(), "maple_episodes"))
+    )
+    return root / f"{hdf5_path.stem}-{digest}"
+
+
+def _file_name(key: str) -> str:
+    return key.replace("/", ".") + ".bin"
+
+
+class SharedEpisodeBuffer:
+    """
+    Concatenated episode arrays backed by ``np.memmap`` files.
+
+    The converted dataset is copied once into one flat file per key (on the
+    local SSD, or ``/dev/shm`` for true shared memory). Every dataloader worker
+    maps the same files read-only, so a sample is a zero-copy slice served from
+    the page cache instead of a fresh HDF5 chunk read and decompression.
+
+    Args:
+        directory (Path): Directory produced by :meth:`build`
+    """
+
+    def __init__(self, directory: Path):
+        self.directory = Path(directory)
+        with open(self.directory / META_FILE, "r") as f:
+            self.meta = json.load(f)
+        self.episode_ends = np.asarray(self.meta["episode_ends"], dtype=np.int64)
+        self._arrays: Dict[str, np.memmap] = {}
+
+    @classmethod
+    def build(
+        cls,
+        hdf5_path: Path,
+        cache_root: Optional[Path] = None,
+        keys: Optional[List[str]] = None,
+    ) -> "SharedEpisodeBuffer":
+        """
+        Load a converted dataset into memmap files, reusing an existing copy.
+
+        The cache directory is keyed by path, size and mtime of the source, so
+        every worker that calls this with the same file ends up on one copy.
+
+        Args:
+            hdf5_path (Path): Converted dataset (``training_data.hdf5``)
+            cache_root (Optional[Path]): Where to put the memmap directory
+            keys (Optional[List[str]]): Subset of episode keys to load
+
+        Returns:
+            SharedEpisodeBuffer: Buffer over the cached files
+        """
+        hdf5_path = Path(hdf5_path)
+        directory = _cache_dir_for(hdf5_path, cache_root)
+        if (directory / META_FILE).exists():
+            return cls(directory)
+
+        directory.parent.mkdir(parents=True, exist_ok=True)
+        staging = Path(tempfile.mkdtemp(prefix=".staging-", dir=directory.parent))
+        try:
+            cls._write(hdf5_path, staging, keys)
+            try:
+                os.rename(staging, directory)
+            except OSError:
+                # Another process finished first, use its copy
+                shutil.rmtree(staging, ignore_errors=True)
+        except BaseException:
+            shutil.rmtree(staging, ignore_errors=True)
+            raise
+        return cls(directory)
+
+    @staticmethod
+    def _write(hdf5_path: Path, directory: Path, keys: Optional[List[str]]) -> None:
+        with h5py.File(hdf5_path, "r") as f:
+            data = f["data"]
+            demos = demo_names(data)
+            if not demos:
+                raise ValueError(f"No demo_* groups found in {hdf5_path}")
+            keys = keys or episode_keys(data[demos[0]])
+
+            lengths = [len(data[demo][keys[0]]) for demo in demos]
+            episode_ends = np.cumsum(lengths).tolist()
+            total = episode_ends[-1]
+
+            arrays = {}
+            for key in keys:
+                first = data[demos[0]][key]
+                shape = (total,) + first.shape[1:]
+                out = np.memmap(
+                    directory / _file_name(key), dtype=first.dtype, mode="w+", shape=shape
+                )
+                start = 0
+                for demo, length in zip(demos, lengths):
+                    data[demo][key].read_direct(out, dest_sel=np.s_[start : start + length])
+                    start += length
+                out.flush()
+                arrays[key] = {"dtype": first.dtype.str, "shape": list(shape)}
+                del out
+
+        meta = {
+            "source": str(hdf5_path),
+            "demos": demos,
+            "episode_ends": episode_ends,
+            "arrays": arrays,
+        }
+        with open(directory / META_FILE, "w") as f:
+            json.dump(meta, f, indent=2)
+
+    @property
+    def keys(self) -> List[str]:
+        return list(self.meta["arrays"])
+
+    @property
+    def num_episodes(self) -> int:
+        return len(self.episode_ends)
+
+    @property
+    def num_steps(self) -> int:
+        return int(self.episode_ends[-1]) if len(self.episode_ends) else 0
+
+    def array(self, key: str) -> np.memmap:
+        """Return the read-only memmap for ``key``, opening it on first use."""
+        if key not in self._arrays:
+            spec = self.meta["arrays"][key]
+            self._arrays[key] = np.memmap(
+                self.directory / _file_name(key),
+                dtype=np.dtype(spec["dtype"]),
+                mode="r",
+                shape=tuple(spec["shape"]),
+            )
+        return self._arrays[key]
+
+    def episode_range(self, episode: int) -> Tuple[int, int]:
+        start = int(self.episode_ends[episode - 1]) if episode > 0 else 0
+        return start, int(self.episode_ends[episode])
+
+    def episode(self, episode: int, key: str) -> np.ndarray:
+        start, stop = self.episode_range(episode)
+        return self.array(key)[start:stop]
+
+    def sample(
+        self, index: int, horizon: int, keys: Optional[List[str]] = None
+    ) -> Dict[str, np.ndarray]:
+        """
+        Return a ``horizon``-step window starting at a global step index.
+
+        Windows never cross an episode end; the last step is repeated instead,
+        matching how sequence samplers pad at episode boundaries.
+
+        Args:
+            index (int): Global step index of the first sample
+            horizon (int): Number of steps in the window
+            keys (Optional[List[str]]): Keys to return (default all)
+
+        Returns:
+            Dict[str, np.ndarray]: One ``(horizon, ...)`` array per key
+        """
+        episode = int(np.searchsorted(self.episode_ends, index, side="right"))
+        _, stop = self.episode_range(episode)
+        end = min(index + horizon, stop)
+        result = {}
+        for key in keys or self.keys:
+            window = self.array(key)[index:end]
+            if end - index < horizon:
+                pad = np.repeat(window[-1:], horizon - (end - index), axis=0)
+                window = np.concatenate([window, pad])
+            result[key] = window
+        return result
+
+
+def _h5py_worker(args) -> int:
+    hdf5_path, indices, horizon, keys = args
+    with h5py.File(hdf5_path, "r") as f:
+        data = f["data"]
+        demos = demo_names(data)
+        lengths = [len(data[d][keys[0]]) for d in demos]
+        ends = np.cumsum(lengths)
+        for index in indices:
+            episode = int(np.searchsorted(ends, index, side="right"))
+            local = index - (int(ends[episode - 1]) if episode > 0 else 0)
+            for key in keys:
+                data[demos[episode]][key][local : local + horizon]
+    return len(indices)
+
+
+def _memmap_worker(args) -> int:
+    directory, indices, horizon, keys = args
+    buffer = SharedEpisodeBuffer(directory)
+    for index in indices:
+        sample = buffer.sample(index, horizon, keys)
+        for value in sample.values():
+            np.ascontiguousarray(value)  # touch the pages like a collate would
+    return len(indices)
+
+
+def benchmark(
+    hdf5_path: Path,
+    workers: int,
+    samples: int,
+    horizon: int,
+    cache_root: Optional[Path] = None,
+) -> Dict[str, float]:
+    """
+    Compare random window reads through h5py and through the memmap buffer.
+
+    Args:
+        hdf5_path (Path): Converted dataset
+        workers (int): Reader processes, like ``dataloader.num_workers``
+        samples (int): Total windows to read per method
+        horizon (int): Steps per window
+        cache_root (Optional[Path]): Memmap cache location
+
+    Returns:
+        Dict[str, float]: Samples per second for each method and the build time
+    """
+    start = time.perf_counter()
+    buffer = SharedEpisodeBuffer.build(hdf5_path, cache_root)
+    build_seconds = time.perf_counter() - start
+
+    rng = np.random.default_rng(0)
+    indices = rng.integers(0, buffer.num_steps, size=samples).tolist()
+    chunks = [indices[i::workers] for i in range(workers)]
+    keys = buffer.keys
+
+    results = {"build_seconds": build_seconds}
+    ctx = mp.get_context("spawn")
+    for name, worker, source in (
+        ("h5py", _h5py_worker, str(hdf5_path)),
+        ("memmap", _memmap_worker, str(buffer.directory)),
+    ):
+        with ctx.Pool(workers) as pool:
+            start = time.perf_counter()
+            done = sum(pool.map(worker, [(source, c, horizon, keys) for c in chunks]))
+            elapsed = time.perf_counter() - start
+        results[f"{name}_samples_per_sec"] = done / max(elapsed, 1e-9)
+    return results
+
+
+def parse_arguments() -> argparse.Namespace:
+    """
+    Parse command line arguments.
+
+    Returns:
+        argparse.Namespace: Parsed command line arguments
+    """
+    parser = argparse.ArgumentParser(
+        description="Build the shared memmap episode buffer and benchmark it against h5py",
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+    )
+    parser.add_argument("dataset", type=Path, help="Converted training_data.hdf5")
+    parser.add_argument("--cache-root", type=Path, default=None, help="Memmap cache root")
+    parser.add_argument("--workers", type=int, default=16, help="Reader processes")
+    parser.add_argument("--samples", type=int, default=20000, help="Windows per method")
+    parser.add_argument("--horizon", type=int, default=16, help="Steps per window")
+    return parser.parse_args()
+
+
+def main() -> None:
+    """Build the buffer for a dataset and print the read benchmark."""
+    args = parse_arguments()
+    results = benchmark(
+        args.dataset, args.workers, args.samples, args.horizon, args.cache_root
+    )
+    print(json.dumps(results, indent=2))
+    speedup = results["memmap_samples_per_sec"] / max(results["h5py_samples_per_sec"], 1e-9)
+    print(f"memmap speedup over h5py: {speedup:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
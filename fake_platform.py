@@ -0,0 +1,417 @@
+#!/usr/bin/env python3
+
+import argparse
+import fnmatch
+import functools
+import json
+import os
+import random
+import re
+import shutil
+import threading
+import time
+from dataclasses import asdict, dataclass
+from typing import Callable, Dict, List, Optional, Sequence
+
+from query_cache import JsonBackend
+from synthetic_data import SCALES, SessionSpec, scaled_spec, write_session
+from upload_engine import COPY_BUFFER, LocalBackend
+
+PLATFORM_ENV = "MAPLE_FAKE_PLATFORM"
+NETWORK_ENV = "MAPLE_FAKE_NETWORK"
+CATALOG_NAME = "catalog.json"
+
+
+class InjectedNetworkError(IOError):
+    """Raised by the stand-ins when a request is chosen to fail."""
+
+
+@dataclass
+class NetworkProfile:
+    """
+    Simulated link between the pod and the platform.
+
+    Args:
+        bandwidth_mb_s (float): Throughput shared by all transfers (0 = unlimited)
+        latency_ms (float): Added to every request before data flows
+        failure_rate (float): Probability that a request fails
+        seed (Optional[int]): Seed for the failure draws, for reproducible runs
+    """
+
+    bandwidth_mb_s: float = 0.0
+    latency_ms: float = 0.0
+    failure_rate: float = 0.0
+    seed: Optional[int] = None
+
+    @classmethod
+    def parse(cls, spec: str) -> "NetworkProfile":
+        """Parse ``"bandwidth_mb_s=50,latency_ms=20,failure_rate=0.01"``."""
+        values = {}
+        for item in filter(None, (part.strip() for part in spec.split(","))):
+            key, value = item.split("=", 1)
+            if key not in cls.__dataclass_fields__:
+                raise ValueError(f"Unknown network setting: {key}")
+            values[key] = int(value) if key == "seed" else float(value)
+        return cls(**values)
+
+    @classmethod
+    def from_env(cls) -> "NetworkProfile":
+        return cls.parse(os.environ.get(NETWORK_ENV, ""))
+
+
+class ShapedLink:
+    """
+    Applies a :class:`NetworkProfile` to requests and transfers.
+
+    Bandwidth is one budget shared across threads, like a pod's NIC, so
+    concurrent transfers slow each other down instead of each getting the
+    full rate.
+    """
+
+    def __init__(self, profile: Optional[NetworkProfile] = None):
+        self.profile = profile or NetworkProfile()
+        self.bytes_transferred = 0
+        self.requests = 0
+        self.failures = 0
+        self._rng = random.Random(self.profile.seed)
+        self._lock = threading.Lock()
+        self._available_at = 0.0
+
+    def request(self, what: str) -> None:
+        """Pay the per-request latency and possibly fail."""
+        with self._lock:
+            self.requests += 1
+            fail = self._rng.random() < self.profile.failure_rate
+            if fail:
+                self.failures += 1
+        if self.profile.latency_ms:
+            time.sleep(self.profile.latency_ms / 1000)
+        if fail:
+            raise InjectedNetworkError(f"Injected network failure: {what}")
+
+    def transfer(self, num_bytes: int) -> None:
+        """Block until ``num_bytes`` fit through the shared bandwidth budget."""
+        with self._lock:
+            self.bytes_transferred += num_bytes
+            if not self.profile.bandwidth_mb_s:
+                return
+            start = max(time.monotonic(), self._available_at)
+            self._available_at = start + num_bytes / (self.profile.bandwidth_mb_s * 1e6)
+            done_at = self._available_at
+        delay = done_at - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+
+    def copy_file(self, src: str, dst: str, offset: int = 0, length: int = -1) -> None:
+        """Copy (a range of) a file through the link, one request per call."""
+        self.request(os.path.basename(src))
+        os.makedirs(os.path.dirname(dst) or ".", exist_ok=True)
+        remaining = os.path.getsize(src) - offset if length < 0 else length
+        with open(src, "rb") as fin, open(dst + ".tmp", "wb") as fout:
+            fin.seek(offset)
+            while remaining > 0:
+                chunk = fin.read(min(COPY_BUFFER, remaining))
+                if not chunk:
+                    break
+                self.transfer(len(chunk))
+                fout.write(chunk)
+                remaining -= len(chunk)
+        os.replace(dst + ".tmp", dst)
+
+    def stats(self) -> Dict:
+        return {
+            "profile": asdict(self.profile),
+            "requests": self.requests,
+            "failures": self.failures,
+            "bytes_transferred": self.bytes_transferred,
+        }
+
+
+class FakeDataPlatform:
+    """
+    Local data platform serving synthetic sessions.
+
+    ``<root>/catalog.json`` lists sessions in the :class:`query_cache.JsonBackend`
+    format and ``<root>/sessions/<session_id>/`` holds each session in the
+    layout a real download produces. ``<root>/gcs/<bucket>/`` backs ``gs://``
+    destinations.
+
+    Args:
+        root (str): Platform directory
+        profile (Optional[NetworkProfile]): Link shaping (default ``$MAPLE_FAKE_NETWORK``)
+    """
+
+    def __init__(self, root: str, profile: Optional[NetworkProfile] = None):
+        self.root = os.path.abspath(root)
+        self.link = ShapedLink(profile or NetworkProfile.from_env())
+        os.makedirs(self.root, exist_ok=True)
+
+    @property
+    def catalog_path(self) -> str:
+        return os.path.join(self.root, CATALOG_NAME)
+
+    def session_dir(self, session_id: str) -> str:
+        return os.path.join(self.root, "sessions", session_id)
+
+    def catalog(self) -> List[Dict]:
+        if not os.path.isfile(self.catalog_path):
+            return []
+        with open(self.catalog_path, "r") as f:
+            return json.load(f)["sessions"]
+
+    def _write_catalog(self, rows: List[Dict]) -> None:
+        with open(self.catalog_path + ".tmp", "w") as f:
+            json.dump({"sessions": rows}, f, indent=2)
+        os.replace(self.catalog_path + ".tmp", self.catalog_path)
+
+    def add_session(
+        self,
+        session_id: str,
+        task_id: str,
+        demo_index: int = 0,
+        spec: Optional[SessionSpec] = None,
+    ) -> Dict:
+        """Generate a synthetic session and register it in the catalog."""
+        session_dir = self.session_dir(session_id)
+        shutil.rmtree(session_dir, ignore_errors=True)
+        write_session(session_dir, session_id, task_id, demo_index, spec)
+        size = sum(
+            os.path.getsize(os.path.join(dirpath, name))
+            for dirpath, _, files in os.walk(session_dir)
+            for name in files
+        )
+        row = {
+            "session_id": session_id,
+            "task_id": task_id,
+            "location": f"file://{session_dir}",
+            "size_bytes": size,
+        }
+        rows = [r for r in self.catalog() if r["session_id"] != session_id]
+        self._write_catalog(rows + [row])
+        return row
+
+    def populate(
+        self,
+        task_ids: List[str],
+        sessions_per_task: int = 2,
+        spec: Optional[SessionSpec] = None,
+    ) -> List[Dict]:
+        """Add ``sessions_per_task`` sessions for every task, demos numbered per task."""
+        spec = spec or SessionSpec()
+        rows = []
+        for task_id in task_ids:
+            for demo_index in range(sessions_per_task):
+                session_id = f"{task_id}-{demo_index:04d}"
+                session_spec = SessionSpec(**dict(asdict(spec), seed=len(rows)))
+                rows.append(
+                    self.add_session(session_id, task_id, demo_index, session_spec)
+                )
+        return rows
+
+    def download(
+        self,
+        session_id: str,
+        data_local_path: str,
+        skip_confirmation: bool = True,
+        include: Optional[Sequence[str]] = None,
+    ) -> None:
+        """
+        Stand-in for ``bdai_cli.data_platform.download.download``.
+
+        ``include`` restricts the transfer to files whose session-relative
+        path matches one of the glob patterns.
+        """
+        source = self.session_dir(session_id)
+        if not os.path.isdir(source):
+            raise FileNotFoundError(f"Unknown session: {session_id}")
+        self.link.request(f"download {session_id}")
+        for dirpath, _, files in os.walk(source):
+            rel = os.path.relpath(dirpath, source)
+            for name in files:
+                path = os.path.normpath(os.path.join(rel, name))
+                if include is not None and not any(
+                    fnmatch.fnmatch(path, p) for p in include
+                ):
+                    continue
+                self.link.copy_file(
+                    os.path.join(dirpath, name),
+                    os.path.join(data_local_path, rel, name),
+                )
+
+    def location_provider(self, user_input: str, session_only: bool = True):
+        return FakeLocationProvider(self, user_input, session_only)
+
+    def storage_backend(self, url: str) -> "FakeGCSBackend":
+        return FakeGCSBackend(self, url)
+
+
+_EQUALS = re.compile(r'=\s*"([^"]*)"')
+_IN = re.compile(r"IN\s*\(([^)]*)\)")
+_LIKE = re.compile(r'LIKE\s*"([^"]*)"')
+
+
+class FakeLocationProvider:
+    """Stand-in for ``DataPlatformLocationProvider`` over the platform catalog."""
+
+    def __init__(self, platform: FakeDataPlatform, user_input: str, session_only=True):
+        self.platform = platform
+        self.user_input = user_input
+        self.session_only = session_only
+        self.resolved_keys: List[str] = []
+
+    def __call__(self) -> Dict:
+        task_ids = _EQUALS.findall(self.user_input)
+        for group in _IN.findall(self.user_input):
+            task_ids.extend(re.findall(r'"([^"]*)"', group))
+        patterns = _LIKE.findall(self.user_input)
+
+        self.platform.link.request("query")
+        backend = JsonBackend(self.platform.catalog_path)
+        result = backend.resolve(task_ids, None)
+        for pattern in patterns:
+            matched = backend.resolve([], pattern)
+            result.session_ids += matched.session_ids
+            result.locations.update(matched.locations)
+        self.resolved_keys = list(dict.fromkeys(result.session_ids))
+        return {key: result.locations[key] for key in self.resolved_keys}
+
+
+class FakeGCSBackend(LocalBackend):
+    """Object store stand-in: a :class:`LocalBackend` behind the shaped link."""
+
+    def __init__(self, platform: FakeDataPlatform, url: str):
+        self.link = platform.link
+        self.url = url
+        super().__init__(os.path.join(platform.root, "gcs", url[len("gs://") :]))
+
+    def __repr__(self) -> str:
+        return f"FakeGCSBackend({self.url!r} -> {self.root!r})"
+
+    def read_manifest(self) -> Optional[Dict]:
+        self.link.request("read manifest")
+        return super().read_manifest()
+
+    def write_manifest(self, manifest: Dict) -> None:
+        self.link.request("write manifest")
+        super().write_manifest(manifest)
+
+    def put_file(self, local_path: str, key: str) -> None:
+        self.link.copy_file(local_path, self._path(key))
+
+    def existing_parts(self, key: str, token: str):
+        self.link.request("list parts")
+        return super().existing_parts(key, token)
+
+    def put_part(
+        self, local_path: str, offset: int, length: int, key: str, token: str, index: int
+    ) -> None:
+        part_path = os.path.join(self._parts_dir(token), f"{index:05d}")
+        self.link.copy_file(local_path, part_path, offset, length)
+
+    def compose(self, key: str, token: str, num_parts: int) -> None:
+        self.link.request("compose")
+        super().compose(key, token, num_parts)
+
+    def copy(self, src_key: str, dst_key: str) -> None:
+        # Server-side: costs a request but no bandwidth
+        self.link.request("copy")
+        super().copy(src_key, dst_key)
+
+
+_platforms: Dict[str, FakeDataPlatform] = {}
+
+
+def active_platform() -> Optional[FakeDataPlatform]:
+    """The platform named by ``$MAPLE_FAKE_PLATFORM``, or None for the real one."""
+    root = os.environ.get(PLATFORM_ENV)
+    if not root:
+        return None
+    root = os.path.abspath(root)
+    if root not in _platforms:
+        _platforms[root] = FakeDataPlatform(root)
+    return _platforms[root]
+
+
+def get_download(include: Optional[Sequence[str]] = None) -> Callable:
+    """
+    ``download(session_id, data_local_path, skip_confirmation)``, real or fake.
+
+    With ``include`` glob patterns only matching session-relative paths are
+    kept. The fake platform transfers only those; the real CLI has no filter,
+    so it downloads everything and the rest is deleted straight away.
+    """
+    platform = active_platform()
+    if platform is not None:
+        if include is None:
+            return platform.download
+        return functools.partial(platform.download, include=include)
+    from bdai_cli.data_platform.download import download
+
+    if include is None:
+        return download
+
+    def filtered(session_id, data_local_path, skip_confirmation=True):
+        print("Warning: bdai_cli downloads whole sessions; dropping unneeded files")
+        download(session_id, data_local_path, skip_confirmation=skip_confirmation)
+        for dirpath, _, files in os.walk(data_local_path):
+            for name in files:
+                path = os.path.join(dirpath, name)
+                rel = os.path.relpath(path, data_local_path)
+                if not any(fnmatch.fnmatch(rel, p) for p in include):
+                    os.remove(path)
+
+    return filtered
+
+
+def parse_arguments() -> argparse.Namespace:
+    """
+    Parse command line arguments.
+
+    Returns:
+        argparse.Namespace: Parsed command line arguments
+    """
+    parser = argparse.ArgumentParser(
+        description="Create a local fake data platform with synthetic sessions",
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+    )
+    parser.add_argument("root", type=str, help="Platform directory")
+    parser.add_argument(
+        "--task-ids", type=str, default="synthetic_task", help="Comma-separated task IDs"
+    )
+    parser.add_argument(
+        "--scale", type=str, default="small", choices=sorted(SCALES), help="Size preset"
+    )
+    parser.add_argument(
+        "--sessions-per-task", type=int, default=None, help="Override the preset"
+    )
+    parser.add_argument("--cameras", type=int, default=None, help="Override the preset")
+    parser.add_argument("--height", type=int, default=None, help="Override the preset")
+    parser.add_argument("--width", type=int, default=None, help="Override the preset")
+    parser.add_argument("--duration", type=float, default=None, help="Seconds")
+    return parser.parse_args()
+
+
+def main() -> None:
+    """Populate a fake platform and print how to point the flows at it."""
+    args = parse_arguments()
+    platform = FakeDataPlatform(args.root)
+    spec = scaled_spec(
+        args.scale,
+        cameras=args.cameras,
+        height=args.height,
+        width=args.width,
+        duration_s=args.duration,
+    )
+    task_ids = [t.strip() for t in args.task_ids.split(",") if t.strip()]
+    sessions_per_task = args.sessions_per_task or max(
+        1, SCALES[args.scale]["sessions"] // len(task_ids)
+    )
+    rows = platform.populate(task_ids, sessions_per_task, spec)
+    total = sum(row["size_bytes"] for row in rows)
+    print(f"Created {len(rows)} sessions ({total / 1e6:.1f} MB) in {platform.root}")
+    print(f"Run flows with: export {PLATFORM_ENV}={platform.root}")
+    print(f"Shape the link with: export {NETWORK_ENV}=bandwidth_mb_s=50,latency_ms=20")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+
+import argparse
+import json
+import os
+import shutil
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import h5py
+import numpy as np
+
+from episode_buffer import demo_names, episode_keys
+
+INDEX_FILE = "index.json"
+FORMAT_VERSION = 1
+
+
+def export_flat(hdf5_path: Path, output_dir: Path, force: bool = False) -> Path:
+    """
+    Export a converted dataset to one raw ``.npy`` array per key.
+
+    Episodes are concatenated along the first axis and their boundaries are
+    written to ``index.json`` together with each array's dtype and shape, so
+    readers can ``np.load(..., mmap_mode="r")`` without going through HDF5.
+
+    Args:
+        hdf5_path (Path): Converted dataset (``training_data.hdf5``)
+        output_dir (Path): Directory to write the flat episode format into
+        force (bool): Overwrite an existing export
+
+    Returns:
+        Path: The output directory
+    """
+    hdf5_path = Path(hdf5_path)
+    output_dir = Path(output_dir)
+    if (output_dir / INDEX_FILE).exists():
+        if not force:
+            raise FileExistsError(f"{output_dir} already contains an export")
+        shutil.rmtree(output_dir)
+
+    staging = output_dir.with_name(output_dir.name + ".partial")
+    shutil.rmtree(staging, ignore_errors=True)
+    staging.mkdir(parents=True)
+
+    with h5py.File(hdf5_path, "r") as f:
+        data = f["data"]
+        demos = demo_names(data)
+        if not demos:
+            raise ValueError(f"No demo_* groups found in {hdf5_path}")
+        keys = episode_keys(data[demos[0]])
+
+        lengths = [len(data[demo][keys[0]]) for demo in demos]
+        episode_ends = np.cumsum(lengths).tolist()
+
+        arrays = {}
+        for key in keys:
+            first = data[demos[0]][key]
+            shape = (episode_ends[-1],) + first.shape[1:]
+            path = staging / f"{key}.npy"
+            path.parent.mkdir(parents=True, exist_ok=True)
+            out = np.lib.format.open_memmap(path, mode="w+", dtype=first.dtype, shape=shape)
+            start = 0
+            for demo, length in zip(demos, lengths):
+                data[demo][key].read_direct(out, dest_sel=np.s_[start : start + length])
+                start += length
+            out.flush()
+            del out
+            arrays[key] = {
+                "file": f"{key}.npy",
+                "dtype": first.dtype.str,
+                "shape": list(shape),
+            }
+
+        attrs = {k: _jsonable(v) for k, v in data.attrs.items()}
+
+    index = {
+        "format_version": FORMAT_VERSION,
+        "source": str(hdf5_path),
+        "demos": demos,
+        "episode_ends": episode_ends,
+        "arrays": arrays,
+        "attrs": attrs,
+    }
+    with open(staging / INDEX_FILE, "w") as f:
+        json.dump(index, f, indent=2)
+
+    os.replace(staging, output_dir)
+    return output_dir
+
+
+def _jsonable(value):
+    if isinstance(value, bytes):
+        return value.decode()
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
+
+class FlatEpisodeDataset:
+    """
+    Reader for a directory written by :func:`export_flat`.
+
+    Arrays are opened lazily with ``np.load(mmap_mode="r")``, so any number of
+    dataloader processes can share them through the page cache.
+
+    Args:
+        directory (Path): Export directory containing ``index.json``
+    """
+
+    def __init__(self, directory: Path):
+        self.directory = Path(directory)
+        with open(self.directory / INDEX_FILE, "r") as f:
+            self.index = json.load(f)
+        if self.index.get("format_version") != FORMAT_VERSION:
+            raise ValueError(
+                f"Unsupported flat episode format {self.index.get('format_version')}"
+            )
+        self.episode_ends = np.asarray(self.index["episode_ends"], dtype=np.int64)
+        self._arrays: Dict[str, np.ndarray] = {}
+
+    @staticmethod
+    def is_flat_dir(path: Path) -> bool:
+        return (Path(path) / INDEX_FILE).is_file()
+
+    @property
+    def keys(self) -> List[str]:
+        return list(self.index["arrays"])
+
+    @property
+    def demos(self) -> List[str]:
+        return list(self.index["demos"])
+
+    @property
+    def num_episodes(self) -> int:
+        return len(self.episode_ends)
+
+    @property
+    def num_steps(self) -> int:
+        return int(self.episode_ends[-1]) if len(self.episode_ends) else 0
+
+    def array(self, key: str) -> np.ndarray:
+        """Return the memory-mapped array for ``key``."""
+        if key not in self._arrays:
+            spec = self.index["arrays"][key]
+            self._arrays[key] = np.load(self.directory / spec["file"], mmap_mode="r")
+        return self._arrays[key]
+
+    def episode_range(self, episode: int) -> Tuple[int, int]:
+        start = int(self.episode_ends[episode - 1]) if episode > 0 else 0
+        return start, int(self.episode_ends[episode])
+
+    def episode(
+        self, episode: int, keys: Optional[List[str]] = None
+    ) -> Dict[str, np.ndarray]:
+        """Return zero-copy views of one episode's arrays."""
+        start, stop = self.episode_range(episode)
+        return {key: self.array(key)[start:stop] for key in keys or self.keys}
+
+
+def parse_arguments() -> argparse.Namespace:
+    """
+    Parse command line arguments.
+
+    Returns:
+        argparse.Namespace: Parsed command line arguments
+    """
+    parser = argparse.ArgumentParser(
+        description="Export training_data.hdf5 to memory-mappable .npy arrays",
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+    )
+    parser.add_argument("source", type=Path, help="Converted training_data.hdf5")
+    parser.add_argument("output", type=Path, help="Output directory")
+    parser.add_argument("--force", action="store_true", help="Overwrite existing export")
+    return parser.parse_args()
+
+
+def main() -> None:
+    """Export a dataset and print the resulting index summary."""
+    args = parse_arguments()
+    export_flat(args.source, args.output, force=args.force)
+
+    dataset = FlatEpisodeDataset(args.output)
+    print(
+        f"Exported {dataset.num_episodes} episodes "
+        f"({dataset.num_steps} steps) to {args.output}"
+    )
+    for key in dataset.keys:
+        spec = dataset.index["arrays"][key]
+        print(f"  {key}: Shape {tuple(spec['shape'])}, Dtype {np.dtype(spec['dtype'])}")
+
+
+if __name__ == "__main__":
+    main()
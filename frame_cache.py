@@ -0,0 +1,270 @@
+#!/usr/bin/env python3
+
+import argparse
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Sequence, Tuple, Union
+
+import h5py
+import numpy as np
+
+import depth_codec
+
+DEFAULT_CACHE_BYTES = 512 * 1024 * 1024
+
+_JPEG_MAGIC = b"\xff\xd8\xff"
+_PNG_MAGIC = b"\x89PNG\r\n\x1a\n"
+
+
+def _imdecode(blob: bytes, unchanged: bool) -> np.ndarray:
+    """Decode a compressed image blob with OpenCV, falling back to Pillow."""
+    try:
+        import cv2
+
+        flag = cv2.IMREAD_UNCHANGED if unchanged else cv2.IMREAD_COLOR
+        frame = cv2.imdecode(np.frombuffer(blob, dtype=np.uint8), flag)
+        if frame is None:
+            raise ValueError("cv2.imdecode could not decode frame")
+        if frame.ndim == 3 and not unchanged:
+            frame = frame[..., ::-1]  # BGR -> RGB
+        return frame
+    except ImportError:
+        import io
+
+        from PIL import Image
+
+        return np.asarray(Image.open(io.BytesIO(blob)))
+
+
+def decode_frame(
+    blob: bytes, dtype: np.dtype = np.uint8, shape: Optional[Tuple[int, ...]] = None
+) -> np.ndarray:
+    """
+    Decode a single stored frame blob into an array.
+
+    JPEG and PNG blobs are decoded with an image codec (which releases the GIL),
+    :mod:`depth_codec` blobs with the lossless depth codec, and anything else
+    is treated as raw pixel bytes.
+
+    Args:
+        blob (bytes): Encoded frame bytes as stored in the HDF5 dataset
+        dtype (np.dtype): Pixel dtype used for raw frames
+        shape (Optional[Tuple[int, ...]]): Frame shape used to reshape raw frames
+
+    Returns:
+        np.ndarray: Decoded frame
+    """
+    if blob.startswith(_JPEG_MAGIC):
+        return _imdecode(blob, unchanged=False)
+    if blob.startswith(_PNG_MAGIC):
+        return _imdecode(blob, unchanged=True)
+    if depth_codec.is_encoded(blob):
+        frame = depth_codec.decode(blob)
+    else:
+        frame = np.frombuffer(blob, dtype=dtype)
+    if shape is not None:
+        frame = frame.reshape(shape)
+    return frame
+
+
+def _blob_bytes(item) -> bytes:
+    """Normalize an h5py element (vlen uint8 array, bytes, void) to bytes."""
+    if isinstance(item, bytes):
+        return item
+    if isinstance(item, np.void):
+        return item.tobytes()
+    return np.asarray(item).tobytes()
+
+
+class FrameStore:
+    """
+    Batched, cached access to the per-frame camera datasets of a demo HDF5.
+
+    Frames are read from the file in one sorted request per batch, decoded in a
+    thread pool and kept in a least-recently-used cache bounded by the number
+    of bytes of decoded pixels.
+
+    Args:
+        source (Union[str, Path, h5py.File]): Demo HDF5 path or open file handle
+        max_cache_bytes (int): Upper bound on the decoded bytes kept in memory
+        num_workers (Optional[int]): Decode threads (defaults to the executor's choice)
+        decoder (Optional[Callable]): Override for ``decode_frame(blob, dtype, shape)``
+    """
+
+    def __init__(
+        self,
+        source: Union[str, Path, h5py.File],
+        max_cache_bytes: int = DEFAULT_CACHE_BYTES,
+        num_workers: Optional[int] = None,
+        decoder: Optional[Callable[..., np.ndarray]] = None,
+    ):
+        if isinstance(source, h5py.File):
+            self._file = source
+            self._owns_file = False
+        else:
+            self._file = h5py.File(source, "r")
+            self._owns_file = True
+        self.max_cache_bytes = max_cache_bytes
+        self._decoder = decoder or decode_frame
+        self._pool = ThreadPoolExecutor(max_workers=num_workers)
+        self._cache: "OrderedDict[Tuple[str, int], np.ndarray]" = OrderedDict()
+        self._cache_bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def __enter__(self) -> "FrameStore":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """Shut down the decode pool and close the file if we opened it."""
+        self._pool.shutdown(wait=True)
+        if self._owns_file:
+            self._file.close()
+
+    @property
+    def cache_bytes(self) -> int:
+        return self._cache_bytes
+
+    def cameras(self) -> List[str]:
+        """Return camera names that have an ``<camera>_rgb`` dataset."""
+        return sorted(k[: -len("_rgb")] for k in self._file.keys() if k.endswith("_rgb"))
+
+    def num_frames(self, camera: str, kind: str = "rgb") -> int:
+        return len(self._file[self._dataset_key(camera, kind)])
+
+    def get_frames(
+        self, camera: str, indices: Sequence[int], kind: str = "rgb"
+    ) -> List[np.ndarray]:
+        """
+        Return decoded frames for a camera in the order of ``indices``.
+
+        Args:
+            camera (str): Camera name (e.g. ``camera0``) or full dataset key
+            indices (Sequence[int]): Frame indices, may repeat or be unsorted
+            kind (str): ``rgb`` or ``depth`` when ``camera`` is a bare name
+
+        Returns:
+            List[np.ndarray]: One decoded array per requested index
+        """
+        key = self._dataset_key(camera, kind)
+        dataset = self._file[key]
+        indices = [int(i) % len(dataset) if i < 0 else int(i) for i in indices]
+
+        found: Dict[int, np.ndarray] = {}
+        with self._lock:
+            for idx in indices:
+                frame = self._cache.get((key, idx))
+                if frame is not None:
+                    self._cache.move_to_end((key, idx))
+                    found[idx] = frame
+            self.hits += len(found)
+
+        missing = sorted(set(indices) - found.keys())
+        if missing:
+            with self._lock:
+                self.misses += len(missing)
+            decoded = self._load(dataset, missing)
+            found.update(decoded)
+            with self._lock:
+                for idx, frame in decoded.items():
+                    self._insert((key, idx), frame)
+
+        return [found[idx] for idx in indices]
+
+    def _dataset_key(self, camera: str, kind: str) -> str:
+        if camera in self._file:
+            return camera
+        return f"{camera}_{kind}"
+
+    def _load(self, dataset: h5py.Dataset, indices: List[int]) -> Dict[int, np.ndarray]:
+        # Fixed-shape pixel datasets need no decoding; h5py wants sorted indices
+        if dataset.dtype.kind in "uif" and dataset.ndim > 1:
+            return dict(zip(indices, dataset[indices]))
+
+        # h5py reads are serialized by its global lock, so read once up front
+        # and only fan out the decode, which is where the time goes
+        blobs = [_blob_bytes(b) for b in dataset[indices]]
+        dtype = np.dtype(dataset.attrs.get("pixel_dtype", _default_dtype(dataset.name)))
+        shape = dataset.attrs.get("frame_shape")
+        shape = tuple(int(s) for s in shape) if shape is not None else None
+        if self._decoder is decode_frame and all(map(depth_codec.is_encoded, blobs)):
+            # Encoded depth decodes as one vectorized batch on the same pool
+            frames = depth_codec.decode_batch(blobs, pool=self._pool)
+            if shape is not None:
+                frames = [frame.reshape(shape) for frame in frames]
+        else:
+            frames = self._pool.map(lambda b: self._decoder(b, dtype, shape), blobs)
+        return dict(zip(indices, frames))
+
+    def _insert(self, key: Tuple[str, int], frame: np.ndarray) -> None:
+        if frame.nbytes > self.max_cache_bytes or key in self._cache:
+            return
+        self._cache[key] = frame
+        self._cache_bytes += frame.nbytes
+        while self._cache_bytes > self.max_cache_bytes:
+            _, evicted = self._cache.popitem(last=False)
+            self._cache_bytes -= evicted.nbytes
+
+
+def _default_dtype(dataset_name: str) -> str:
+    return "uint16" if dataset_name.endswith("_depth") else "uint8"
+
+
+def parse_arguments() -> argparse.Namespace:
+    """
+    Parse command line arguments.
+
+    Returns:
+        argparse.Namespace: Parsed command line arguments
+    """
+    parser = argparse.ArgumentParser(
+        description="Decode camera frames from a demo HDF5 and report throughput",
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+    )
+    parser.add_argument("file", type=Path, help="Demo HDF5 file")
+    parser.add_argument("--camera", type=str, default="camera0", help="Camera name")
+    parser.add_argument("--kind", choices=["rgb", "depth"], default="rgb")
+    parser.add_argument("--batch-size", type=int, default=32, help="Frames per batch")
+    parser.add_argument("--workers", type=int, default=None, help="Decode threads")
+    parser.add_argument(
+        "--cache-mb", type=int, default=DEFAULT_CACHE_BYTES // (1024 * 1024)
+    )
+    return parser.parse_args()
+
+
+def main() -> None:
+    """Decode every frame of one camera twice (cold, then cached) and time it."""
+    args = parse_arguments()
+
+    with FrameStore(
+        args.file, max_cache_bytes=args.cache_mb * 1024 * 1024, num_workers=args.workers
+    ) as store:
+        n = store.num_frames(args.camera, args.kind)
+        for label in ("cold", "warm"):
+            start = time.perf_counter()
+            decoded_bytes = 0
+            for begin in range(0, n, args.batch_size):
+                batch = range(begin, min(begin + args.batch_size, n))
+                frames = store.get_frames(args.camera, batch, kind=args.kind)
+                decoded_bytes += sum(f.nbytes for f in frames)
+            elapsed = time.perf_counter() - start
+            print(
+                f"{label}: {n} frames in {elapsed:.3f}s "
+                f"({n / max(elapsed, 1e-9):.1f} frames/s, "
+                f"{decoded_bytes / max(elapsed, 1e-9) / 1e6:.1f} MB/s decoded)"
+            )
+        print(
+            f"cache: {store.cache_bytes / 1e6:.1f} MB held, "
+            f"{store.hits} hits, {store.misses} misses"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,321 @@
+from metaflow import FlowSpec, kubernetes, Parameter, step
+import subprocess
+import os
+import shutil
+import csv
+import json
+
+DOCKER_IMAGE_GPU = (
+    "us-docker.pkg.dev/engineering-380817/bdai/dc/workflows/maple_test:metaflow_v3_gpu"
+)
+SESSION_CACHE = "/mnt/shared/session_cache"
+TASK_OUTPUT_ROOT = "/mnt/shared/batch_output"
+
+
+class MapleBatchFlow(FlowSpec):
+    """Preprocess and train several tasks from one query and a shared session cache"""
+
+    task_ids = Parameter(
+        "task_ids",
+        type=str,
+        default="",
+        help="Comma-separated task IDs to process",
+    )
+    task_pattern = Parameter(
+        "task_pattern",
+        type=str,
+        default="",
+        help="SQL LIKE pattern over task IDs (e.g. '11.22.24_%')",
+    )
+    query_ttl = Parameter(
+        "query_ttl",
+        type=float,
+        default=0,
+        help="Reuse a cached session list up to this many seconds old (0: always query)",
+    )
+    train = Parameter(
+        "train", type=bool, default=True, help="Train a policy for every task"
+    )
+
+    @step
+    def start(self):
+        requested = [t.strip() for t in self.task_ids.split(",") if t.strip()]
+        if not requested and not self.task_pattern:
+            raise ValueError("Pass --task_ids and/or --task_pattern")
+
+        # One (memoized) query for all tasks
+        from query_cache import resolve_sessions, task_query
+
+        print(f"Query: {task_query(requested, self.task_pattern or None)}")
+        query_result = resolve_sessions(
+            requested, self.task_pattern or None, ttl_seconds=self.query_ttl
+        )
+
+        # A session matched by several task filters is processed once
+        self.session_ids = query_result.session_ids
+        self.requested_tasks = requested
+        print(f"Sessions found: {len(self.session_ids)}")
+
+        self.next(self.process_session, foreach="session_ids")
+
+    @kubernetes(
+        image=DOCKER_IMAGE_GPU,
+        service_account="workflows-team-dc",
+        namespace="team-dc",
+        persistent_volume_claims={"metaflow-pvc": "/mnt/shared"},
+    )
+    @step
+    def process_session(self):
+        """Download and preprocess one session into the shared session cache"""
+        self.session_id = self.input
+        self.session_dir = os.path.join(SESSION_CACHE, self.session_id)
+        info_path = os.path.join(self.session_dir, "session.json")
+
+        if os.path.isfile(info_path):
+            print(f"Session {self.session_id} served from cache")
+            self.cache_hit = True
+        else:
+            self.cache_hit = False
+            self._preprocess_session(info_path)
+
+        with open(info_path, "r") as f:
+            self.session_info = json.load(f)
+        self.next(self.join_sessions)
+
+    def _preprocess_session(self, info_path):
+        from fake_platform import get_download
+        from tempfile import TemporaryDirectory
+        from validate_data import check_demo
+
+        download = get_download()
+
+        # Build into a staging directory so a crashed branch never leaves a
+        # half-written entry that later runs would treat as cached
+        staging = f"{self.session_dir}.partial"
+        shutil.rmtree(staging, ignore_errors=True)
+        for subdir in ["videos", "hdf5", "logs"]:
+            os.makedirs(os.path.join(staging, subdir), exist_ok=True)
+
+        with TemporaryDirectory() as tmpdir:
+            download(self.session_id, data_local_path=tmpdir, skip_confirmation=True)
+
+            task_dir = next(
+                d for d in os.listdir(tmpdir) if os.path.isdir(os.path.join(tmpdir, d))
+            )
+            task_path = os.path.join(tmpdir, task_dir)
+            exp_dir = next(
+                d
+                for d in os.listdir(task_path)
+                if os.path.isdir(os.path.join(task_path, d))
+            )
+            exp_path = os.path.join(task_path, exp_dir)
+
+            dc_json = next(f for f in os.listdir(exp_path) if f.endswith(".json"))
+            shutil.copy2(
+                os.path.join(exp_path, dc_json), os.path.join(staging, "metadata.json")
+            )
+            with open(os.path.join(exp_path, dc_json), "r") as f:
+                task_id = _task_id_from_metadata(json.load(f), default=task_dir)
+
+            source_hdf5 = os.path.join(exp_path, "hdf5")
+            demo_number = next(
+                d
+                for d in sorted(os.listdir(source_hdf5))
+                if d.startswith("demo_") and os.path.isdir(os.path.join(source_hdf5, d))
+            )
+            shutil.copytree(
+                os.path.join(source_hdf5, demo_number),
+                os.path.join(staging, "hdf5", demo_number),
+            )
+            demo_metadata = os.path.join(source_hdf5, f"{demo_number}_metadata.json")
+            if os.path.isfile(demo_metadata):
+                shutil.copy2(demo_metadata, os.path.join(staging, "hdf5"))
+
+            os.makedirs(os.path.join(staging, "logs", demo_number), exist_ok=True)
+            source_logs = os.path.join(exp_path, "logs")
+            if os.path.isdir(source_logs):
+                for log_file in os.listdir(source_logs):
+                    if log_file.endswith(".log"):
+                        shutil.copy2(
+                            os.path.join(source_logs, log_file),
+                            os.path.join(staging, "logs", demo_number, log_file),
+                        )
+
+            mcap_files = [
+                os.path.join(root, f)
+                for root, _, files in os.walk(tmpdir)
+                for f in files
+                if f.endswith(".mcap")
+            ]
+            if not mcap_files:
+                raise Exception("No mcap file found after download")
+            os.makedirs(os.path.join(staging, "videos", demo_number), exist_ok=True)
+            subprocess.run(
+                [
+                    "video_ripper_cli",
+                    "--image-topic",
+                    "/camera/camera1/color/image_raw",
+                    mcap_files[0],
+                    os.path.join(staging, "videos", demo_number, "video.mp4"),
+                ],
+                check=True,
+            )
+
+        check_demo(os.path.join(staging, "hdf5", demo_number))
+
+        with open(os.path.join(staging, "session.json"), "w") as f:
+            json.dump(
+                {
+                    "session_id": self.session_id,
+                    "task_id": task_id,
+                    "demo_number": demo_number,
+                },
+                f,
+                indent=2,
+            )
+        shutil.rmtree(self.session_dir, ignore_errors=True)
+        os.rename(staging, self.session_dir)
+        print(f"Cached session {self.session_id} ({task_id}, {demo_number})")
+
+    @step
+    def join_sessions(self, inputs):
+        """Group cached sessions by task"""
+        sessions_by_task = {}
+        for input_obj in inputs:
+            info = dict(input_obj.session_info, session_dir=input_obj.session_dir)
+            sessions_by_task.setdefault(info["task_id"], []).append(info)
+
+        requested = inputs[0].requested_tasks
+        missing = [t for t in requested if t not in sessions_by_task]
+        if missing:
+            print(f"WARNING: no sessions found for tasks: {missing}")
+
+        self.sessions_by_task = sessions_by_task
+        self.cache_hits = sum(1 for input_obj in inputs if input_obj.cache_hit)
+        self.tasks = sorted(sessions_by_task)
+        print(
+            f"{len(inputs)} sessions ({self.cache_hits} from cache) "
+            f"across {len(self.tasks)} tasks"
+        )
+        self.next(self.build_task, foreach="tasks")
+
+    @kubernetes(
+        image=DOCKER_IMAGE_GPU,
+        service_account="workflows-team-dc",
+        namespace="team-dc",
+        gpu=1,
+        cpu=16,
+        node_selector={"profile": "gpu-a100-ssd"},
+        persistent_volume_claims={"metaflow-pvc": "/mnt/shared"},
+    )
+    @step
+    def build_task(self):
+        """Assemble one task's output from the session cache, convert, train, upload"""
+        from blob_store import link_or_copy
+        from upload_engine import upload_tree
+
+        self.task_id = self.input
+        sessions = self.sessions_by_task[self.task_id]
+        self.output_dir = os.path.join(TASK_OUTPUT_ROOT, self.task_id, "output")
+        shutil.rmtree(self.output_dir, ignore_errors=True)
+
+        # Cached files are never modified, so link instead of copying
+        demo_mapping = []
+        for info in sessions:
+            for root, _, files in os.walk(info["session_dir"]):
+                rel_root = os.path.relpath(root, info["session_dir"])
+                os.makedirs(os.path.join(self.output_dir, rel_root), exist_ok=True)
+                for name in files:
+                    if name == "session.json":
+                        continue
+                    link_or_copy(
+                        os.path.join(root, name),
+                        os.path.join(self.output_dir, rel_root, name),
+                    )
+            demo_mapping.append([info["demo_number"], info["session_id"]])
+
+        with open(os.path.join(self.output_dir, "demo.csv"), "w", newline="") as f:
+            writer = csv.writer(f)
+            for mapping in sorted(demo_mapping, key=lambda x: x[0]):
+                writer.writerow(mapping)
+
+        metadata_path = os.path.join(self.output_dir, "metadata.json")
+        with open(metadata_path, "r") as f:
+            metadata = json.load(f)
+        metadata["raw"] = False
+        # Replace rather than write through the link into the cache
+        os.remove(metadata_path)
+        with open(metadata_path, "w") as f:
+            json.dump(metadata, f, indent=2)
+
+        dataset_path = os.path.join(self.output_dir, "training_data.hdf5")
+        subprocess.run(
+            [
+                "python",
+                "/workspaces/bdai/projects/maple/scripts/equidiff/equidiff_data_conversion.py",
+                "--source",
+                f"{self.output_dir}/hdf5",
+                "--output",
+                dataset_path,
+                "--point-cloud",
+                "--collected-data",
+                "--force",
+            ],
+            check=True,
+        )
+
+        self.dst = f"gs://project-maple-main-storage/data/HIL_test/{self.task_id}"
+        self.checkpoint_lineage = []
+        if self.train:
+            from checkpoint_watcher import CheckpointWatcher
+
+            watcher = CheckpointWatcher(
+                "/workspaces/bdai/data", f"{self.dst}/checkpoints"
+            ).start()
+            try:
+                os.environ["WANDB_API_KEY"] = "e654b8d65b121602aede3733bba28ba9610407c7"
+                subprocess.run(
+                    [
+                        "python",
+                        "/workspaces/bdai/projects/maple/src/equidiff/train.py",
+                        "--config-name=equi_pointcloud_real",
+                        f"dataset_path={dataset_path}",
+                        "training.num_epochs=1000",
+                        "dataloader.batch_size=192",
+                        "dataloader.num_workers=16",
+                    ],
+                    check=True,
+                )
+            finally:
+                self.checkpoint_lineage = watcher.finish()
+
+        self.upload_report = upload_tree(self.output_dir, self.dst).to_dict()
+        self.next(self.join_tasks)
+
+    @step
+    def join_tasks(self, inputs):
+        self.task_results = {
+            input_obj.task_id: {
+                "destination": input_obj.dst,
+                "upload_report": input_obj.upload_report,
+            }
+            for input_obj in inputs
+        }
+        self.next(self.end)
+
+    @step
+    def end(self):
+        print(f"Processed tasks: {sorted(self.task_results)}")
+
+
+def _task_id_from_metadata(metadata, default):
+    """Read $.extra_json.task_id from a session's DC json, as the query does"""
+    extra = metadata.get("extra_json", {})
+    if isinstance(extra, str):
+        extra = json.loads(extra)
+    extra = extra.get("extra_json", extra)
+    return extra.get("task_id", default)
+
+
+if __name__ == "__main__":
+    MapleBatchFlow()
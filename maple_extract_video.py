@@ -6,6 +6,12 @@ import shutil
 DOCKER_IMAGE_GPU = (
     "us-docker.pkg.dev/engineering-380817/bdai/dc/workflows/maple_test:metaflow_v2_gpu"
 )
+# Compared against measured usage by resource_sampler; see the resource_usage artifact.
+# The default serial and hdf5 modes use one CPU. Segmented encoding runs one
+# encoder per CPU of the pod, so raise cpu here for runs that opt into it
+START_RESOURCES = {"cpu": 1}
+# Previews only read the demo HDF5s (hdf5/<demo>/*.hdf5), never the bag
+PREVIEW_FILES = ["*hdf5/*.hdf5"]
 
 
 class MapleVideoExtract(FlowSpec):
@@ -15,25 +21,46 @@ class MapleVideoExtract(FlowSpec):
     task_id = Parameter(
         "query_task_id", type=str, help="The task ID to upload to", required=True
     )
+    video_mode = Parameter(
+        "video_mode",
+        type=str,
+        default="serial",
+        help=(
+            "'serial' is one pass, 'segmented' encodes time segments in parallel "
+            "(falling back to one pass when it cannot), "
+            "'hdf5' renders previews from the demo HDF5 camera datasets"
+        ),
+    )
 
     @kubernetes(
         image=DOCKER_IMAGE_GPU,
         service_account="workflows-team-dc",
         namespace="team-dc",
-        cpu=1,
+        # Preview renders are cached on the shared volume across runs
+        persistent_volume_claims={"metaflow-pvc": "/mnt/shared"},
+        **START_RESOURCES,
     )
     @step
     def start(self):
         """Process all sessions and organize into a single output structure"""
+        from resource_sampler import ResourceSampler
+
+        sampler = ResourceSampler(interval=5).start()
         print(f"Starting Video Extraction: {self.session_id}")
+        if self.video_mode not in ("segmented", "serial", "hdf5"):
+            raise ValueError(f"Unknown video_mode: {self.video_mode}")
 
         # Create base output directory with required structure
         self.output_dir = "output"
         os.makedirs(os.path.join(self.output_dir), exist_ok=True)
 
-        from bdai_cli.data_platform.download import download
+        from fake_platform import get_download
         from tempfile import TemporaryDirectory
 
+        download = get_download(
+            include=PREVIEW_FILES if self.video_mode == "hdf5" else None
+        )
+
         print(f"Processing session: {self.session_id}")
         try:
             with TemporaryDirectory() as tmpdir:
@@ -42,21 +69,25 @@ class MapleVideoExtract(FlowSpec):
                     str(self.session_id), data_local_path=tmpdir, skip_confirmation=True
                 )
 
-                # Find MCAP file
-                mcap_files = []
-                for root, _, files in os.walk(tmpdir):
-                    mcap_files.extend(
-                        [os.path.join(root, f) for f in files if f.endswith(".mcap")]
-                    )
+                self.download_path = tmpdir
+                if self.video_mode == "hdf5":
+                    # The demo HDF5 already holds the sampled camera frames
+                    self._render_preview()
+                else:
+                    # Find MCAP file
+                    mcap_files = []
+                    for root, _, files in os.walk(tmpdir):
+                        mcap_files.extend(
+                            [os.path.join(root, f) for f in files if f.endswith(".mcap")]
+                        )
 
-                if not mcap_files:
-                    raise Exception("No mcap file found after download")
+                    if not mcap_files:
+                        raise Exception("No mcap file found after download")
 
-                self.mcap_file = mcap_files[0]
-                self.download_path = tmpdir
+                    self.mcap_file = mcap_files[0]
 
-                # Extract video and copy all data files
-                self._extract_video()
+                    # Extract video and copy all data files
+                    self._extract_video()
 
         except Exception as e:
             print(f"Error processing session {self.session_id}: {str(e)}")
@@ -66,15 +97,9 @@ class MapleVideoExtract(FlowSpec):
         # self.dst = f"gs://bdai-common-storage/lsantos/{self.task_id}/videos/"
         self.dst = f"gs://project-maple-main-storage/data/HIL_test/{self.task_id}/videos/"
 
-        cmd = [
-            "gcloud",
-            "storage",
-            "cp",
-            "-r",
-            self.video_output,
-            self.dst,
-        ]
-        subprocess.run(cmd, check=True)
+        from upload_engine import upload_tree
+
+        self.upload_report = upload_tree(self.video_output, self.dst).to_dict()
         print(f"Data uploaded to {self.dst}")
 
         print("\nProcessing complete")
@@ -82,6 +107,13 @@ class MapleVideoExtract(FlowSpec):
         print("output/")
         self._print_directory_tree("output")
 
+        sampler.stop()
+        self.resource_usage = sampler.report(START_RESOURCES)
+        recommendation = self.resource_usage["recommendation"]
+        print(f"Recommended resources: {recommendation['decorator']}")
+        for note in recommendation["notes"]:
+            print(f"  {note}")
+
         self.next(self.end)
 
     @step
@@ -98,10 +130,40 @@ class MapleVideoExtract(FlowSpec):
             for f in files:
                 print(f"{subindent}{f}")
 
+    def _render_preview(self):
+        hdf5_files = []
+        for root, _, files in os.walk(self.download_path):
+            if os.path.basename(os.path.dirname(root)) == "hdf5":
+                hdf5_files.extend(
+                    [os.path.join(root, f) for f in files if f.endswith(".hdf5")]
+                )
+        if not hdf5_files:
+            raise Exception("No demo hdf5 file found after download")
+
+        from preview_render import render_preview
+
+        self.video_output = os.path.join(self.output_dir, "previews")
+        self.preview_results = []
+        for hdf5_file in sorted(hdf5_files):
+            demo = os.path.splitext(os.path.basename(hdf5_file))[0]
+            result = render_preview(hdf5_file, os.path.join(self.video_output, demo))
+            self.preview_results.append(result.to_dict())
+            state = "cached" if result.cached else "rendered"
+            print(f"Preview for {demo} {state} in {result.seconds:.1f}s")
+
     def _extract_video(self):
         image_topic = "/camera/camera1/color/image_raw"
         self.video_output = os.path.join(self.output_dir, "output_behavior.mp4")
         print(f"Extracting video to: {self.video_output}")
+        if self.video_mode == "segmented":
+            from video_segments import extract_video_segmented
+
+            report = extract_video_segmented(
+                self.mcap_file, self.video_output, image_topic
+            )
+            self.video_report = report.to_dict()
+            print(report.summary())
+            return
         subprocess.run(
             [
                 "video_ripper_cli",
@@ -12,30 +12,25 @@ class MCAPAnalysisFlow(FlowSpec):
         help="The task ID to query (e.g. '11.22.24_green_cube_on_tray')",
         required=True,
     )
+    query_ttl = Parameter(
+        "query_ttl",
+        type=float,
+        default=0,
+        help="Reuse a cached session list up to this many seconds old (0: always query)",
+    )
 
     @step
     def start(self):
         print(f"Starting query for task: {self.task_id}")
 
-        # import dataplatform querying class
-        from bdai_tensors.data_platform_location_provider import (
-            DataPlatformLocationProvider,
-        )
-
-        # Construct the SQL query
-        query = f'WHERE JSON_EXTRACT_SCALAR(extra_json, "$.extra_json.task_id") = "{self.task_id}"'
+        # Query for all sessions (memoized; see query_cache.py)
+        from query_cache import resolve_sessions
 
-        # Query for all sessions using query parameter
-        location_provider = DataPlatformLocationProvider(
-            user_input=query,
-            session_only=True,
-        )
-
-        locations = location_provider()
-        print(f"Locations of sessions: {locations}")
+        query_result = resolve_sessions([self.task_id], ttl_seconds=self.query_ttl)
+        print(f"Locations of sessions: {query_result.locations}")
 
         # Save the list of session IDs
-        self.session_ids = location_provider.resolved_keys
+        self.session_ids = query_result.session_ids
         print(f"Sessions found: {self.session_ids}")
 
         # Fan out to process each session
@@ -65,9 +60,11 @@ class MCAPAnalysisFlow(FlowSpec):
 
         # Download and process session
         try:
-            from bdai_cli.data_platform.download import download
+            from fake_platform import get_download
             from tempfile import TemporaryDirectory
 
+            download = get_download()
+
             with TemporaryDirectory() as tmpdir:
                 print(f"Created temporary directory: {tmpdir}")
                 download(session_id, data_local_path=tmpdir, skip_confirmation=True)
@@ -94,12 +91,12 @@ class MCAPAnalysisFlow(FlowSpec):
                 self._copy_data_files()
                 print("Data files copying complete")
 
-                # Debug: Print final directory structure
-                print("\nFinal directory structure:")
-                for root, dirs, files in os.walk(self.output_dir):
-                    print(f"\nDirectory: {root}")
-                    print(f"Subdirectories: {dirs}")
-                    print(f"Files: {files}")
+                # Record what this session produced so merge_data can skip it
+                # on later runs
+                from session_merge import summarize_tree, write_session_manifest
+
+                write_session_manifest(self.output_dir)
+                print(summarize_tree(self.output_dir))
 
         except Exception as e:
             print(f"Error processing session {session_id}: {str(e)}")
@@ -121,25 +118,18 @@ class MCAPAnalysisFlow(FlowSpec):
             "metadata_json",
             "mcap_file",
             "download_path",
+            "sync_skew",
         ]
 
-        # Update paths to look in PVC
-        for input_obj in inputs:
-            pvc_path = os.path.basename(
-                input_obj.output_dir
-            )  # Get just the session ID part
-            pvc_output_dir = os.path.join("/mnt/shared", pvc_path)
-            print(f"Processing input with PVC output_dir: {pvc_output_dir}")
-            if os.path.exists(pvc_output_dir):
-                print(f"Contents of {pvc_output_dir}: {os.listdir(pvc_output_dir)}")
-            else:
-                print(f"Directory {pvc_output_dir} does not exist!")
-
         # Update session_dirs to use PVC paths
         self.session_dirs = [
             os.path.join("/mnt/shared", os.path.basename(input_obj.output_dir))
             for input_obj in inputs
         ]
+        missing = [d for d in self.session_dirs if not os.path.exists(d)]
+        print(f"Joined {len(self.session_dirs)} sessions ({len(missing)} missing)")
+        for session_dir in missing[:10]:
+            print(f"Directory {session_dir} does not exist!")
 
         # Create merged output directory
         self.merged_dir = "merged_output"
@@ -154,71 +144,21 @@ class MCAPAnalysisFlow(FlowSpec):
     def merge_data(self):
         """Merge all session data into final structure"""
         print("Starting data merge process")
-        print(f"Received session_dirs: {self.session_dirs}")  # Debug print
-
-        # Create base directories
-        base_dirs = ["hdf5", "logs", "videos"]
-        for dir_name in base_dirs:
-            dir_path = os.path.join(self.merged_dir, dir_name)
-            os.makedirs(dir_path, exist_ok=True)
-            print(f"Created directory: {dir_path}")  # Debug print
-
-        # Debug: Print contents of all session directories
-        for session_dir in self.session_dirs:
-            print(f"\nInspecting session directory: {session_dir}")
-            if os.path.exists(session_dir):
-                for root, dirs, files in os.walk(session_dir):
-                    print(f"\nDirectory: {root}")
-                    print(f"Subdirectories: {dirs}")
-                    print(f"Files: {files}")
-            else:
-                print(f"WARNING: Directory {session_dir} does not exist!")
-
-        # Merge session data
-        for session_dir in self.session_dirs:
-            if not os.path.exists(session_dir):
-                print(f"WARNING: Session directory {session_dir} does not exist")
-                continue
-
-            # Get demo dirs from hdf5 directory
-            hdf5_path = os.path.join(session_dir, "hdf5")
-            if not os.path.exists(hdf5_path):
-                print(f"WARNING: HDF5 directory does not exist in {session_dir}")
-                continue
-
-            demo_dirs = [
-                d
-                for d in os.listdir(hdf5_path)
-                if os.path.isdir(os.path.join(hdf5_path, d)) and d.startswith("demo_")
-            ]
-            print(
-                f"Found demo directories in {session_dir}: {demo_dirs}"
-            )  # Debug print
-
-            for demo_dir in demo_dirs:
-                print(f"Processing {demo_dir} from {session_dir}")
-
-                # Copy all directories maintaining structure
-                for base_dir in base_dirs:
-                    src = os.path.join(session_dir, base_dir, demo_dir)
-                    dst = os.path.join(self.merged_dir, base_dir, demo_dir)
-                    if os.path.exists(src):
-                        print(f"Copying from {src} to {dst}")  # Debug print
-                        shutil.copytree(src, dst, dirs_exist_ok=True)
-                    else:
-                        print(f"WARNING: Source directory does not exist: {src}")
-
-        # Create empty training.hdf5 (placeholder)
-        training_file = os.path.join(self.merged_dir, "hdf5", "training.hdf5")
-        open(training_file, "a").close()
-        print(f"Created empty training file: {training_file}")
-
-        # Final debug print of merged directory structure
-        print("\nFinal merged directory structure:")
-        for root, dirs, files in os.walk(self.merged_dir):
-            print(f"\nDirectory: {root}")
-            print(f"Subdirectories: {dirs}")
-            print(f"Files: {files}")
+        print(f"Received {len(self.session_dirs)} session directories")
+
+        # Only demos that are new or changed since the last run are copied, and
+        # they are copied concurrently (see session_merge.py)
+        from session_merge import merge_sessions, summarize_tree
+
+        report = merge_sessions(self.session_dirs, self.merged_dir)
+        self.merge_report = report.to_dict()
+        print(report.summary())
+        for conflict in report.conflicts:
+            print(f"WARNING: demo name conflict {conflict}")
+        for session_dir in report.missing_sessions:
+            print(f"WARNING: Session directory {session_dir} does not exist")
+        print(f"Training view: {report.training_view}")
+        print(summarize_tree(self.merged_dir))
 
         print(f"Merge complete. Final structure in {self.merged_dir}")
 
@@ -285,6 +225,18 @@ class MCAPAnalysisFlow(FlowSpec):
             dirs_exist_ok=True,
         )
 
+        # Index the demo's streams against the bag while it is still here; the
+        # index is a diagnostic, so a bag the reader cannot parse only logs
+        from timestamp_index import index_demo_dir
+
+        try:
+            self.sync_skew = index_demo_dir(
+                os.path.join(self.output_dir, "hdf5", demo_number), self.mcap_file
+            )
+        except Exception as e:
+            print(f"Error indexing timestamps: {str(e)}")
+            self.sync_skew = {}
+
         # Copy demo metadata json if it exists
         demo_metadata = f"{demo_number}_metadata.json"
         metadata_source = os.path.join(source_hdf5, demo_metadata)
@@ -4,91 +4,70 @@ import os
 import shutil
 import csv
 import json
-import yaml
-import time
 
 # DOCKER_IMAGE_GPU = "us-docker.pkg.dev/engineering-380817/bdai/dc/workflows/maple_test@sha256:7bb0bf81a606da6a566f1fbe5f9e5c7d13a85d1dad57c57215d4ce06e60c6638"
 DOCKER_IMAGE_GPU = (
     "us-docker.pkg.dev/engineering-380817/bdai/dc/workflows/maple_test:metaflow_v3_gpu"
 )
+# Compared against measured usage by resource_sampler; see the resource_usage artifact
+START_RESOURCES = {"gpu": 1, "cpu": 16}
 
 
 class MapleWorkflowLinear(FlowSpec):
     task_id = Parameter(
         "query_task_id", type=str, help="The task ID to query", required=True
     )
+    query_ttl = Parameter(
+        "query_ttl",
+        type=float,
+        default=0,
+        help="Reuse a cached session list up to this many seconds old (0: always query)",
+    )
+    max_concurrent_sessions = Parameter(
+        "max_concurrent_sessions",
+        type=int,
+        default=4,
+        help="Sessions downloaded and processed at once, if they fit on disk",
+    )
 
     @kubernetes(
         image=DOCKER_IMAGE_GPU,
         service_account="workflows-team-dc",
         namespace="team-dc",
-        gpu=1,
-        cpu=16,
         node_selector={"profile": "gpu-a100-ssd"},  # Specify GPU type
+        # Only for the schedule history, which must outlive the pod
+        persistent_volume_claims={"metaflow-pvc": "/mnt/shared"},
+        **START_RESOURCES,
     )
     @step
     def start(self):
         """Process all sessions and organize into a single output structure"""
-        import torch
+        from resource_sampler import ResourceSampler
 
-        # Check if video_ripper_cli is available
-        result = subprocess.run(
-            ["which", "video_ripper_cli"], capture_output=True, text=True
-        )
-        if result.returncode != 0:
-            raise RuntimeError(
-                "video_ripper_cli not found in PATH. Please ensure it's properly installed."
-            )
+        sampler = ResourceSampler(interval=10).start()
+
+        # Environment checks (video_ripper_cli, git, torch/CUDA, pytorch3d,
+        # nvidia-smi) run in the background during the query and first download;
+        # image-determined results are cached on the PVC, keyed by the
+        # MAPLE_IMAGE_DIGEST the Dockerfiles bake in; see preflight.py
+        from preflight import Preflight, default_checks
 
-        print("Checking git status")
-        cmd = [
-            "git",
-            "log",
-            "-1",
-            "--pretty=format:commit %H%nAuthor: %an <%ae>%nDate:   %ad",
-        ]
         os.chdir("/workspaces/bdai")
-        result = subprocess.run(cmd, check=True, capture_output=True, text=True)
-        print(result.stdout)
-
-        # Check CUDA availability
-        print("\nCUDA Setup:")
-        print(f"CUDA available: {torch.cuda.is_available()}")
-        if torch.cuda.is_available():
-            print(f"CUDA device count: {torch.cuda.device_count()}")
-            print(f"Current CUDA device: {torch.cuda.current_device()}")
-            print(f"Device name: {torch.cuda.get_device_name()}")
-
-        # Verify pytorch3d import
-        print("\nTesting pytorch3d import...")
-        try:
-            import pytorch3d
+        preflight = Preflight(default_checks(), image=DOCKER_IMAGE_GPU).start()
 
-            print(f"pytorch3d version: {pytorch3d.__version__}")
-        except Exception as e:
-            print(f"Error importing pytorch3d: {e}")
+        print(f"Starting query for task: {self.task_id}")
 
-        # Run nvidia-smi if available
-        print("\nGPU Info:")
-        try:
-            subprocess.run(["nvidia-smi"], check=True)
-        except Exception as e:
-            print(f"Error running nvidia-smi: {e}")
+        # Per-stage timing, I/O and memory, stored as an artifact and a report
+        from stage_metrics import REPORT_NAME, StageRecorder
 
-        print(f"Starting query for task: {self.task_id}")
+        metrics = StageRecorder()
 
-        # Import and query data platform
-        from bdai_tensors.data_platform_location_provider import (
-            DataPlatformLocationProvider,
-        )
+        # Query data platform (memoized; see query_cache.py)
+        from query_cache import resolve_sessions
 
-        query = f'WHERE JSON_EXTRACT_SCALAR(extra_json, "$.extra_json.task_id") = "{self.task_id}"'
-        location_provider = DataPlatformLocationProvider(
-            user_input=query,
-            session_only=True,
-        )
-        locations = location_provider()
-        session_ids = location_provider.resolved_keys
+        with metrics.stage("query"):
+            query_result = resolve_sessions([self.task_id], ttl_seconds=self.query_ttl)
+        session_ids = query_result.session_ids
         print(f"Sessions found: {session_ids}")
 
         # Create base output directory with required structure
@@ -96,24 +75,63 @@ class MapleWorkflowLinear(FlowSpec):
         for subdir in ["videos", "hdf5", "logs"]:
             os.makedirs(os.path.join(self.output_dir, subdir), exist_ok=True)
 
-        from bdai_cli.data_platform.download import download
-        from bdai_cli.data_platform.upload import upload
-        from tempfile import TemporaryDirectory
+        from fake_platform import get_download
+        from scratch_manager import ScratchManager, size_hint
+        from session_scheduler import CostModel, SessionScheduler
+        from validate_data import check_demo, load_expectations
+
+        download = get_download()
+
+        # Load the validation gate's expectations before any download
+        expectations = load_expectations()
+
+        # Sessions are processed concurrently, but only as many as fit on the
+        # scratch disk at once; scratch shares the output filesystem so outputs
+        # are hard-linked out of it (see scratch_manager.py)
+        scratch = ScratchManager("scratch", max_concurrent=self.max_concurrent_sessions)
+        size_hints = {
+            sid: size_hint(query_result.locations.get(sid)) for sid in session_ids
+        }
+        plan = scratch.plan(size_hints)
+        print(f"Scratch plan: {plan}")
+        if not plan["largest_fits"]:
+            raise RuntimeError(
+                f"Largest session needs ~{plan['largest_estimate_bytes'] / 1e9:.1f} GB "
+                f"but only {plan['budget_bytes'] / 1e9:.1f} GB of scratch is free"
+            )
 
         # Create/open demo.csv to store mapping
         demo_csv_path = os.path.join(self.output_dir, "demo.csv")
-        demo_mapping = []
 
-        for session_id in session_ids:
+        from timestamp_index import index_demo_dir
+
+        sync_skew = {}
+
+        # Longest sessions go out first so a big one never starts last and
+        # leaves the other workers idle (see session_scheduler.py); the cost
+        # history is kept on the PVC
+        cost_model = CostModel.load()
+        scheduler = SessionScheduler(cost_model, scratch.max_concurrent)
+
+        def process_session(session_id):
             print(f"Processing session: {session_id}")
             try:
-                with TemporaryDirectory() as tmpdir:
-                    # Download session data
-                    download(session_id, data_local_path=tmpdir, skip_confirmation=True)
+                with scratch.admit(session_id, size_hints[session_id]) as lease:
+                    # Blocked time says nothing about the session's own cost
+                    scheduler.add_wait(session_id, lease.waited_seconds)
+                    download_path = os.path.join(lease.scratch_dir, "download")
+                    os.makedirs(download_path, exist_ok=True)
+                    with metrics.stage("download", session_id=session_id):
+                        download(
+                            session_id,
+                            data_local_path=download_path,
+                            skip_confirmation=True,
+                        )
+                    lease.record_source(download_path)
 
                     # Find MCAP file
                     mcap_files = []
-                    for root, _, files in os.walk(tmpdir):
+                    for root, _, files in os.walk(download_path):
                         mcap_files.extend(
                             [
                                 os.path.join(root, f)
@@ -125,12 +143,11 @@ class MapleWorkflowLinear(FlowSpec):
                     if not mcap_files:
                         raise Exception("No mcap file found after download")
 
-                    self.mcap_file = mcap_files[0]
-                    self.download_path = tmpdir
+                    mcap_file = mcap_files[0]
 
                     # Get demo number before processing
                     source_hdf5 = None
-                    for root, dirs, _ in os.walk(tmpdir):
+                    for root, dirs, _ in os.walk(download_path):
                         if "hdf5" in dirs:
                             source_hdf5 = os.path.join(root, "hdf5")
                             break
@@ -149,17 +166,60 @@ class MapleWorkflowLinear(FlowSpec):
                     if not demo_number:
                         raise Exception("Could not find demo_X directory in hdf5")
 
-                    # Add to mapping
-                    demo_mapping.append([demo_number, session_id])
-
-                    # Extract video and copy all data files
-                    self._extract_video()
-                    self._copy_data_files()
+                    # Video extraction needs video_ripper_cli; this only blocks
+                    # if the checks are still running
+                    if not preflight.done:
+                        with metrics.stage("preflight_wait") as waited:
+                            preflight.wait()
+                        scheduler.add_wait(session_id, waited.wall_seconds)
+
+                    # Extract video, then drop the bag: it is the largest file
+                    # and nothing else reads it
+                    video_output = os.path.join(lease.scratch_dir, "temp_video.mp4")
+                    with metrics.stage("extract_video", session_id=session_id):
+                        self._extract_video(mcap_file, video_output)
+                    lease.update()
+
+                    # Timestamp index sidecars need the bag's per-topic times;
+                    # they are linked into the output with the demo. They are
+                    # diagnostics, so a bag the reader cannot parse only logs
+                    try:
+                        with metrics.stage("timestamp_index", session_id=session_id):
+                            sync_skew[session_id] = index_demo_dir(
+                                os.path.join(source_hdf5, demo_number), mcap_file
+                            )
+                    except Exception as e:
+                        print(f"Error indexing timestamps of {session_id}: {str(e)}")
+                    os.remove(mcap_file)
+
+                    with metrics.stage("copy_data", session_id=session_id):
+                        self._copy_data_files(download_path, video_output)
+
+                    # Fail fast on broken data, before conversion and training
+                    with metrics.stage("validate", session_id=session_id):
+                        check_demo(
+                            os.path.join(self.output_dir, "hdf5", demo_number),
+                            expectations=expectations,
+                        )
+                return [demo_number, session_id]
 
             except Exception as e:
                 print(f"Error processing session {session_id}: {str(e)}")
                 raise
 
+        demo_mapping = scheduler.run(process_session, session_ids, size_hints)
+        self.schedule_report = scheduler.report()
+        print(scheduler.summary())
+        cost_model.add_schedule_report(self.schedule_report)
+        cost_model.save()
+
+        self.scratch_report = scratch.report()
+        self.sync_skew = sync_skew
+        print(scratch.summary())
+        preflight.wait()
+        print(preflight.summary())
+        self.preflight = preflight.report()
+
         # Write demo mapping to CSV
         with open(demo_csv_path, "w", newline="") as f:
             writer = csv.writer(f)
@@ -169,25 +229,38 @@ class MapleWorkflowLinear(FlowSpec):
 
         print("Running equidiff data conversion...")
         try:
-            subprocess.run(
-                [
-                    "python",
-                    "/workspaces/bdai/projects/maple/scripts/equidiff/equidiff_data_conversion.py",
-                    "--source",
-                    f"{self.output_dir}/hdf5",
-                    "--output",
-                    f"{self.output_dir}/training_data.hdf5",
-                    "--point-cloud",
-                    "--collected-data",
-                    "--force",
-                ],
-                check=True,
-            )
+            with metrics.stage("convert"):
+                subprocess.run(
+                    [
+                        "python",
+                        "/workspaces/bdai/projects/maple/scripts/equidiff/equidiff_data_conversion.py",
+                        "--source",
+                        f"{self.output_dir}/hdf5",
+                        "--output",
+                        f"{self.output_dir}/training_data.hdf5",
+                        "--point-cloud",
+                        "--collected-data",
+                        "--force",
+                    ],
+                    check=True,
+                )
             print("Data conversion completed successfully")
         except subprocess.CalledProcessError as e:
             print(f"Error during data conversion: {str(e)}")
             raise
 
+        dataset_path = os.path.join(self.output_dir, "training_data.hdf5")
+
+        # Normalizer statistics ship next to the dataset so training can skip
+        # its own pass over it
+        from normalizer_stats import write_stats_sidecar
+
+        try:
+            with metrics.stage("stats"):
+                write_stats_sidecar(dataset_path)
+        except Exception as e:
+            print(f"Error computing normalizer statistics: {str(e)}")
+
         # Update metadata.json to set raw=false
         metadata_path = os.path.join(self.output_dir, "metadata.json")
         with open(metadata_path, "r") as f:
@@ -196,55 +269,76 @@ class MapleWorkflowLinear(FlowSpec):
         with open(metadata_path, "w") as f:
             json.dump(metadata, f, indent=2)
 
+        # self.dst = f"gs://bdai-common-storage/lsantos/{self.task_id}"
+        self.dst = f"gs://project-maple-main-storage/data/HIL_test/{self.task_id}"
+
+        # Store identical files once; done before the upload starts hashing
+        # the tree, and training writes nothing into output_dir
+        from blob_store import dedup_tree
+
+        try:
+            with metrics.stage("dedup"):
+                dedup_report = dedup_tree(self.output_dir)
+            self.dedup_report = dedup_report.to_dict()
+            print(dedup_report.summary())
+        except Exception as e:
+            print(f"Error deduplicating output: {str(e)}")
+
+        # Ship the preprocessed outputs while training runs
+        from background_upload import BackgroundUploader
+        from upload_engine import upload_tree
+
+        uploader = BackgroundUploader(self.output_dir, self.dst).start()
+
         os.environ["WANDB_API_KEY"] = "e654b8d65b121602aede3733bba28ba9610407c7"
         print("\nStarting Training")
         cmd = [
             "python",
             "/workspaces/bdai/projects/maple/src/equidiff/train.py",
             "--config-name=equi_pointcloud_real",
-            f"dataset_path={os.path.join(self.output_dir, 'training_data.hdf5')}",
+            f"dataset_path={dataset_path}",
             "training.num_epochs=1000",
             "dataloader.batch_size=192",
             "dataloader.num_workers=16",
         ]
-        subprocess.run(cmd, check=True)
+        # Upload checkpoints as training writes them
+        from checkpoint_watcher import CheckpointWatcher
 
-        # Create checkpoints directory in output
-        os.makedirs(os.path.join(self.output_dir, "checkpoints"), exist_ok=True)
+        watcher = CheckpointWatcher(
+            "/workspaces/bdai/data", f"{self.dst}/checkpoints"
+        ).start()
 
-        # Search in /metaflow for latest.ckpt
         try:
-            result = subprocess.run(
-                ["find", "/workspaces/bdai/data", "-name", "latest.ckpt"],
-                capture_output=True,
-                text=True,
-                check=True,
-            )
-            checkpoint_path = result.stdout.strip()
-            if checkpoint_path:
-                print(f"\nFound checkpoint at: {checkpoint_path}")
-                shutil.copy2(
-                    checkpoint_path,
-                    os.path.join(self.output_dir, "checkpoints/latest.ckpt"),
-                )
-                print("Checkpoint copied successfully")
-        except Exception as e:
-            print(f"Error handling checkpoint: {str(e)}")
+            with metrics.stage("train"):
+                subprocess.run(cmd, check=True)
+        finally:
+            try:
+                with metrics.stage("checkpoint_upload"):
+                    self.checkpoint_lineage = watcher.finish()
+                latest = watcher.latest
+                if latest:
+                    print(f"\nLatest checkpoint uploaded to: {latest['destination']}")
+            except Exception as e:
+                print(f"Error handling checkpoint: {str(e)}")
 
-        print("\nUploading processed data...")
-        # self.dst = f"gs://bdai-common-storage/lsantos/{self.task_id}"
-        self.dst = f"gs://project-maple-main-storage/data/HIL_test/{self.task_id}"
+            # Only what the background uploader has not shipped yet is left
+            print("\nUploading processed data...")
+            with metrics.stage("upload"):
+                self.upload_report = uploader.finish()
+            print(f"Data uploaded to {self.dst}")
 
-        cmd = [
-            "gcloud",
-            "storage",
-            "cp",
-            "-r",
-            self.output_dir,
-            self.dst,
-        ]
-        subprocess.run(cmd, check=True)
-        print(f"Data uploaded to {self.dst}")
+            # Recorded last so the report covers the upload; shipped on its own
+            self.stage_metrics = metrics.to_dict()
+            print(metrics.summary())
+            try:
+                metrics.write_json(
+                    os.path.join(self.output_dir, REPORT_NAME),
+                    flow="MapleWorkflowLinear",
+                    task_id=self.task_id,
+                )
+                upload_tree(self.output_dir, self.dst, keys=[REPORT_NAME])
+            except Exception as e:
+                print(f"Error uploading stage metrics: {str(e)}")
 
         print("\nProcessing complete")
         print("\nFinal Directory Structure:")
@@ -255,6 +349,13 @@ class MapleWorkflowLinear(FlowSpec):
         with open(os.path.join(self.output_dir, "demo.csv"), "r") as f:
             print(f.read())
 
+        sampler.stop()
+        self.resource_usage = sampler.report(START_RESOURCES)
+        recommendation = self.resource_usage["recommendation"]
+        print(f"Recommended resources: {recommendation['decorator']}")
+        for note in recommendation["notes"]:
+            print(f"  {note}")
+
         self.next(self.end)
 
     @step
@@ -271,25 +372,25 @@ class MapleWorkflowLinear(FlowSpec):
             for f in files:
                 print(f"{subindent}{f}")
 
-    def _extract_video(self):
+    def _extract_video(self, mcap_file, video_output):
         image_topic = "/camera/camera1/color/image_raw"
-        # Store in a temporary location first
-        self.video_output = os.path.join(self.output_dir, "temp_video.mp4")
-        print(f"Extracting video to: {self.video_output}")
+        print(f"Extracting video to: {video_output}")
         subprocess.run(
             [
                 "video_ripper_cli",
                 "--image-topic",
                 image_topic,
-                self.mcap_file,
-                self.video_output,
+                mcap_file,
+                video_output,
             ],
             check=True,
         )
 
-    def _copy_data_files(self):
+    def _copy_data_files(self, download_path, video_output):
+        from blob_store import link_or_copy
+
         def find_directory(dir_name):
-            for root, dirs, _ in os.walk(self.download_path):
+            for root, dirs, _ in os.walk(download_path):
                 if dir_name in dirs:
                     return os.path.join(root, dir_name)
             return None
@@ -321,10 +422,12 @@ class MapleWorkflowLinear(FlowSpec):
         os.makedirs(os.path.join(self.output_dir, "logs", demo_number), exist_ok=True)
         os.makedirs(os.path.join(self.output_dir, "videos", demo_number), exist_ok=True)
 
-        # Copy HDF5 files maintaining structure
+        # Copy HDF5 files maintaining structure (hard-linked out of scratch when
+        # on the same filesystem, so they take no extra space)
         shutil.copytree(
             os.path.join(source_hdf5, demo_number),
             os.path.join(self.output_dir, "hdf5", demo_number),
+            copy_function=link_or_copy,
             dirs_exist_ok=True,
         )
 
@@ -341,24 +444,26 @@ class MapleWorkflowLinear(FlowSpec):
         if source_logs:
             for log_file in os.listdir(source_logs):
                 if log_file.endswith(".log"):
-                    shutil.copy2(
+                    link_or_copy(
                         os.path.join(source_logs, log_file),
                         os.path.join(self.output_dir, "logs", demo_number, log_file),
                     )
 
         # Move video to correct demo structure
-        if hasattr(self, "video_output") and os.path.exists(self.video_output):
+        if os.path.exists(video_output):
             new_video_path = os.path.join(
                 self.output_dir, "videos", demo_number, "video.mp4"
             )
-            shutil.move(self.video_output, new_video_path)
-            self.video_output = new_video_path
+            shutil.move(video_output, new_video_path)
 
-        # Find and copy JSON file from the parent directory
+        # Find and copy JSON file from the parent directory; sessions run
+        # concurrently, so replace it atomically
         for file in os.listdir(parent_dir):
             if file.endswith(".json"):
                 self.metadata_json = os.path.join(self.output_dir, "metadata.json")
-                shutil.copy2(os.path.join(parent_dir, file), self.metadata_json)
+                tmp_path = f"{self.metadata_json}.{demo_number}.tmp"
+                shutil.copy2(os.path.join(parent_dir, file), tmp_path)
+                os.replace(tmp_path, self.metadata_json)
                 break
         else:
             print("Warning: Could not find JSON file in the expected location")
@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+
+import struct
+from typing import Iterator, Tuple
+
+MCAP_MAGIC = b"\x89MCAP0\r\n"
+OP_HEADER = 0x01
+OP_FOOTER = 0x02
+OP_SCHEMA = 0x03
+OP_CHANNEL = 0x04
+OP_MESSAGE = 0x05
+OP_CHUNK = 0x06
+OP_DATA_END = 0x0F
+
+
+def _decompress(compression: str, data: bytes, size: int) -> bytes:
+    if compression == "":
+        return data
+    if compression == "zstd":
+        import zstandard
+
+        return zstandard.ZstdDecompressor().decompress(data, max_output_size=size)
+    if compression == "lz4":
+        import lz4.frame
+
+        return lz4.frame.decompress(data)
+    raise ValueError(f"Unsupported MCAP chunk compression: {compression}")
+
+
+def _parse_records(data: bytes) -> Iterator[Tuple[int, bytes]]:
+    offset = 0
+    while offset + 9 <= len(data):
+        opcode, length = struct.unpack_from("<BQ", data, offset)
+        offset += 9
+        yield opcode, data[offset : offset + length]
+        offset += length
+
+
+def read_string(body: bytes, offset: int) -> Tuple[str, int]:
+    """The length-prefixed string at ``offset`` and the offset just past it."""
+    (length,) = struct.unpack_from("<I", body, offset)
+    offset += 4
+    return body[offset : offset + length].decode(), offset + length
+
+
+def iter_records(path: str) -> Iterator[Tuple[int, bytes]]:
+    """
+    Yield ``(opcode, body)`` for every data-section record of an MCAP file.
+
+    Chunks are expanded in place (uncompressed, or zstd/lz4 when those packages
+    are installed); reading stops at the data end record, so summary sections
+    are never parsed.
+    """
+    with open(path, "rb") as f:
+        if f.read(len(MCAP_MAGIC)) != MCAP_MAGIC:
+            raise ValueError(f"{path} is not an MCAP file")
+        while True:
+            prefix = f.read(9)
+            if len(prefix) < 9:
+                return
+            opcode, length = struct.unpack("<BQ", prefix)
+            body = f.read(length)
+            if opcode in (OP_DATA_END, OP_FOOTER):
+                return
+            if opcode != OP_CHUNK:
+                yield opcode, body
+                continue
+            uncompressed_size = struct.unpack_from("<Q", body, 16)[0]
+            compression, offset = read_string(body, 28)
+            (records_length,) = struct.unpack_from("<Q", body, offset)
+            records = body[offset + 8 : offset + 8 + records_length]
+            yield from _parse_records(
+                _decompress(compression, records, uncompressed_size)
+            )
@@ -0,0 +1,250 @@
+#!/usr/bin/env python3
+
+import argparse
+import json
+import os
+import time
+from typing import Dict, List, Optional
+
+import h5py
+import numpy as np
+
+from content_hash import file_digest, stat_key
+from episode_buffer import demo_names, episode_keys
+
+SIDECAR_SUFFIX = ".stats.json"
+QUANTILES = [0.0, 0.01, 0.02, 0.05, 0.5, 0.95, 0.98, 0.99, 1.0]
+CHUNK_ROWS = 4096
+RESERVOIR_SIZE = 100_000
+
+
+class RunningStats:
+    """
+    Streaming per-feature statistics over the last axis of a key.
+
+    Mean and variance are merged chunk by chunk with the parallel Welford
+    update, min/max are exact and quantiles come from a fixed-size uniform
+    reservoir of rows.
+
+    Args:
+        reservoir_size (int): Rows kept for quantile estimation
+        seed (int): Seed for the reservoir sampler
+    """
+
+    def __init__(self, reservoir_size: int = RESERVOIR_SIZE, seed: int = 0):
+        self.count = 0
+        self.mean = None
+        self.m2 = None
+        self.min = None
+        self.max = None
+        self._reservoir_size = reservoir_size
+        self._reservoir = None
+        self._filled = 0
+        self._seen = 0
+        self._rng = np.random.default_rng(seed)
+
+    def update(self, chunk: np.ndarray) -> None:
+        """Fold a ``(..., features)`` chunk into the running statistics."""
+        rows = np.asarray(chunk, dtype=np.float64).reshape(-1, chunk.shape[-1])
+        n = len(rows)
+        if n == 0:
+            return
+
+        chunk_mean = rows.mean(axis=0)
+        chunk_m2 = ((rows - chunk_mean) ** 2).sum(axis=0)
+        if self.count == 0:
+            self.mean, self.m2 = chunk_mean, chunk_m2
+            self.min, self.max = rows.min(axis=0), rows.max(axis=0)
+        else:
+            total = self.count + n
+            delta = chunk_mean - self.mean
+            self.mean = self.mean + delta * n / total
+            self.m2 = self.m2 + chunk_m2 + delta**2 * self.count * n / total
+            self.min = np.minimum(self.min, rows.min(axis=0))
+            self.max = np.maximum(self.max, rows.max(axis=0))
+        self._sample(rows)
+        self.count += n
+
+    def _sample(self, rows: np.ndarray) -> None:
+        if self._reservoir is None:
+            self._reservoir = np.empty((self._reservoir_size, rows.shape[1]))
+        free = self._reservoir_size - self._filled
+        if free > 0:
+            take = rows[:free]
+            self._reservoir[self._filled : self._filled + len(take)] = take
+            self._filled += len(take)
+            self._seen += len(take)
+            rows = rows[free:]
+        if len(rows) == 0:
+            return
+        # Vectorized Algorithm R: the i-th row seen picks a slot uniformly in
+        # [0, i) and replaces it when that slot is inside the reservoir
+        positions = self._seen + np.arange(1, len(rows) + 1)
+        slots = (self._rng.random(len(rows)) * positions).astype(np.int64)
+        keep = slots < self._reservoir_size
+        self._reservoir[slots[keep]] = rows[keep]
+        self._seen += len(rows)
+
+    def result(self) -> Dict[str, List[float]]:
+        """Return the statistics as JSON-ready lists."""
+        if self.count == 0:
+            return {"count": 0}
+        var = self.m2 / max(self.count - 1, 1)
+        sample = self._reservoir[: self._filled]
+        return {
+            "count": int(self.count),
+            "mean": self.mean.tolist(),
+            "std": np.sqrt(var).tolist(),
+            "min": self.min.tolist(),
+            "max": self.max.tolist(),
+            "quantiles": {
+                str(q): v.tolist()
+                for q, v in zip(QUANTILES, np.quantile(sample, QUANTILES, axis=0))
+            },
+        }
+
+
+def compute_stats(
+    hdf5_path: str, keys: Optional[List[str]] = None, chunk_rows: int = CHUNK_ROWS
+) -> Dict[str, Dict]:
+    """
+    Compute normalizer statistics for a converted dataset in one chunked pass.
+
+    Image keys (``uint8``) are skipped by default because the normalizer maps
+    them with a fixed range.
+
+    Args:
+        hdf5_path (str): Converted dataset (``training_data.hdf5``)
+        keys (Optional[List[str]]): Keys to process (default all non-image keys)
+        chunk_rows (int): Steps read per chunk
+
+    Returns:
+        Dict[str, Dict]: Statistics per key
+    """
+    with h5py.File(hdf5_path, "r") as f:
+        data = f["data"]
+        demos = demo_names(data)
+        if not demos:
+            raise ValueError(f"No demo_* groups found in {hdf5_path}")
+        if keys is None:
+            first = data[demos[0]]
+            keys = [k for k in episode_keys(first) if first[k].dtype.kind in "fi"]
+
+        stats = {key: RunningStats() for key in keys}
+        for demo in demos:
+            for key in keys:
+                dataset = data[demo][key]
+                for start in range(0, len(dataset), chunk_rows):
+                    chunk = dataset[start : start + chunk_rows]
+                    if chunk.ndim == 1:
+                        chunk = chunk[:, None]
+                    stats[key].update(chunk)
+    return {key: s.result() for key, s in stats.items()}
+
+
+def sidecar_path(hdf5_path: str) -> str:
+    return hdf5_path + SIDECAR_SUFFIX
+
+
+def write_stats_sidecar(hdf5_path: str, keys: Optional[List[str]] = None) -> str:
+    """
+    Compute statistics for a dataset and store them next to it.
+
+    The sidecar records the dataset's SHA-256 and its size/mtime so that
+    :func:`load_stats_sidecar` can validate it without rehashing.
+
+    Args:
+        hdf5_path (str): Converted dataset
+        keys (Optional[List[str]]): Keys to process
+
+    Returns:
+        str: Path of the written sidecar
+    """
+    start = time.perf_counter()
+    stats = compute_stats(hdf5_path, keys)
+    size, mtime_ns = stat_key(hdf5_path)
+    sidecar = {
+        "content_hash": file_digest(hdf5_path),
+        "size": size,
+        "mtime_ns": mtime_ns,
+        "quantile_levels": QUANTILES,
+        "stats": stats,
+    }
+    path = sidecar_path(hdf5_path)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(sidecar, f)
+    os.replace(tmp_path, path)
+    print(
+        f"Wrote normalizer stats for {len(stats)} keys to {path} "
+        f"in {time.perf_counter() - start:.1f}s"
+    )
+    return path
+
+
+def load_stats_sidecar(hdf5_path: str, verify: bool = False) -> Optional[Dict[str, Dict]]:
+    """
+    Load cached statistics for a dataset if they still match its contents.
+
+    A matching size and mtime is accepted as-is; otherwise (or with
+    ``verify``) the file is rehashed and compared with the recorded hash.
+
+    Args:
+        hdf5_path (str): Converted dataset
+        verify (bool): Always compare the full content hash
+
+    Returns:
+        Optional[Dict[str, Dict]]: Statistics per key, or None if missing or stale
+    """
+    path = sidecar_path(hdf5_path)
+    if not os.path.isfile(path):
+        return None
+    with open(path, "r") as f:
+        sidecar = json.load(f)
+
+    size, mtime_ns = stat_key(hdf5_path)
+    unchanged = sidecar.get("size") == size and sidecar.get("mtime_ns") == mtime_ns
+    if verify or not unchanged:
+        if size != sidecar.get("size"):
+            return None
+        if file_digest(hdf5_path) != sidecar.get("content_hash"):
+            return None
+    return sidecar["stats"]
+
+
+def parse_arguments() -> argparse.Namespace:
+    """
+    Parse command line arguments.
+
+    Returns:
+        argparse.Namespace: Parsed command line arguments
+    """
+    parser = argparse.ArgumentParser(
+        description="Compute or load the normalizer statistics sidecar of a dataset",
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+    )
+    parser.add_argument("dataset", type=str, help="Converted training_data.hdf5")
+    parser.add_argument("--keys", nargs="+", default=None, help="Keys to process")
+    parser.add_argument(
+        "--check", action="store_true", help="Only report whether a valid sidecar exists"
+    )
+    return parser.parse_args()
+
+
+def main() -> None:
+    """Write the sidecar, or with --check time loading an existing one."""
+    args = parse_arguments()
+    if args.check:
+        start = time.perf_counter()
+        stats = load_stats_sidecar(args.dataset)
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        if stats is None:
+            print(f"No valid stats sidecar for {args.dataset}")
+        else:
+            print(f"Loaded stats for {sorted(stats)} in {elapsed_ms:.1f} ms")
+        return
+    write_stats_sidecar(args.dataset, args.keys)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,368 @@
+#!/usr/bin/env python3
+
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import asdict, dataclass, field
+from typing import Callable, Dict, List, Optional
+
+from training_sweep import cache_root
+
+CACHE_DIR_ENV = "MAPLE_PREFLIGHT_CACHE"
+IMAGE_ENV = "MAPLE_IMAGE_DIGEST"
+GIT_FORMAT = "commit %H%nAuthor: %an <%ae>%nDate:   %ad"
+
+
+@dataclass
+class Check:
+    """
+    One environment check.
+
+    ``fn`` returns a dict of facts or raises. ``cacheable`` checks depend only on
+    the container image, so their results are reused across runs of the same
+    image; the rest (e.g. which GPUs the node has) run every time.
+    """
+
+    name: str
+    fn: Callable[[], Dict]
+    required: bool = False
+    cacheable: bool = True
+
+
+@dataclass
+class CheckResult:
+    name: str
+    ok: bool
+    required: bool = False
+    cached: bool = False
+    seconds: float = 0.0
+    info: Dict = field(default_factory=dict)
+    error: Optional[str] = None
+
+
+def executable_check(name: str, required: bool = True) -> Check:
+    """Check that ``name`` is on ``PATH``."""
+
+    def fn() -> Dict:
+        path = shutil.which(name)
+        if path is None:
+            raise FileNotFoundError(
+                f"{name} not found in PATH. Please ensure it's properly installed."
+            )
+        return {"path": path}
+
+    return Check(name, fn, required=required)
+
+
+def git_check(repo: str) -> Check:
+    """Record the checked-out commit of ``repo`` (not cached: it is a mount)."""
+
+    def fn() -> Dict:
+        result = subprocess.run(
+            ["git", "-C", repo, "log", "-1", f"--pretty=format:{GIT_FORMAT}"],
+            check=True,
+            capture_output=True,
+            text=True,
+        )
+        return {"log": result.stdout}
+
+    return Check("git", fn, cacheable=False)
+
+
+def module_check(module: str) -> Check:
+    """Import ``module`` and record its version."""
+
+    def fn() -> Dict:
+        imported = __import__(module)
+        return {"version": str(getattr(imported, "__version__", "unknown"))}
+
+    return Check(module, fn)
+
+
+def torch_check() -> Check:
+    """Import torch (the slowest import of a step) and record its CUDA build."""
+
+    def fn() -> Dict:
+        import torch
+
+        return {"version": torch.__version__, "cuda_build": torch.version.cuda}
+
+    return Check("torch", fn)
+
+
+def gpu_check() -> Check:
+    """List this node's GPUs with ``nvidia-smi`` (not cached: nodes differ)."""
+
+    def fn() -> Dict:
+        result = subprocess.run(
+            [
+                "nvidia-smi",
+                "--query-gpu=name,driver_version,memory.total",
+                "--format=csv,noheader",
+            ],
+            check=True,
+            capture_output=True,
+            text=True,
+        )
+        devices = [line.strip() for line in result.stdout.splitlines() if line.strip()]
+        return {"device_count": len(devices), "devices": devices}
+
+    return Check("gpu", fn, cacheable=False)
+
+
+def default_checks(repo: str = "/workspaces/bdai") -> List[Check]:
+    """The checks ``MapleWorkflowLinear`` runs before processing sessions."""
+    return [
+        executable_check("video_ripper_cli"),
+        git_check(repo),
+        torch_check(),
+        module_check("pytorch3d"),
+        gpu_check(),
+    ]
+
+
+def image_key(image: Optional[str] = None) -> Optional[str]:
+    """
+    Identify the container image for caching.
+
+    ``$MAPLE_IMAGE_DIGEST`` (set at image build time) wins; otherwise only an
+    ``@sha256:`` image reference is accepted. A tag can be re-pushed, so with
+    neither there is no key and nothing is cached. The Python build is always
+    mixed in.
+    """
+    identity = os.environ.get(IMAGE_ENV)
+    if not identity and image and "@sha256:" in image:
+        identity = image
+    if not identity:
+        return None
+    key = json.dumps([identity, sys.version, sys.executable])
+    return hashlib.sha1(key.encode()).hexdigest()[:20]
+
+
+def process_age_seconds() -> Optional[float]:
+    """Seconds since this process started (interpreter, imports, flow startup)."""
+    try:
+        with open("/proc/self/stat", "r") as f:
+            # Fields after the parenthesised command; starttime is field 22
+            fields = f.read().rsplit(")", 1)[1].split()
+        with open("/proc/uptime", "r") as f:
+            uptime = float(f.read().split()[0])
+    except OSError:
+        return None
+    return uptime - int(fields[19]) / os.sysconf("SC_CLK_TCK")
+
+
+class Preflight:
+    """
+    Run environment checks concurrently with the start of a step's real work.
+
+    Call :meth:`start` first thing in a step, do the work that does not depend
+    on the checks (query, first download), then :meth:`wait` before the first
+    thing that does. Results of cacheable checks that passed are stored per
+    image, so later runs of the same image skip them, including the imports
+    they would trigger. Without an image digest (see :func:`image_key`) every
+    check runs and nothing is stored.
+
+    Args:
+        checks (List[Check]): Checks to run
+        image (Optional[str]): Container image reference used for the cache key
+        cache_dir (Optional[str]): Result cache (``$MAPLE_PREFLIGHT_CACHE``, else
+            under :func:`training_sweep.cache_root`, the PVC when mounted)
+        use_cache (bool): Read cached results (results are written regardless)
+    """
+
+    def __init__(
+        self,
+        checks: List[Check],
+        image: Optional[str] = None,
+        cache_dir: Optional[str] = None,
+        use_cache: bool = True,
+    ):
+        self.checks = checks
+        self.cache_dir = cache_dir or os.environ.get(
+            CACHE_DIR_ENV, os.path.join(cache_root(), "maple_preflight")
+        )
+        key = image_key(image)
+        self.cache_path = (
+            os.path.join(self.cache_dir, f"{key}.json") if key is not None else None
+        )
+        self.use_cache = use_cache
+        self.results: Dict[str, CheckResult] = {}
+        self.process_age_at_start: Optional[float] = None
+        self.blocked_seconds = 0.0
+        self.wall_seconds = 0.0
+        self._futures: Dict[str, Future] = {}
+        self._pool: Optional[ThreadPoolExecutor] = None
+        self._started = 0.0
+        self._lock = threading.Lock()
+        self.done = False
+
+    def _load_cache(self) -> Dict[str, Dict]:
+        if (
+            not self.use_cache
+            or self.cache_path is None
+            or not os.path.isfile(self.cache_path)
+        ):
+            return {}
+        try:
+            with open(self.cache_path, "r") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _run(self, check: Check) -> CheckResult:
+        start = time.perf_counter()
+        try:
+            info = check.fn()
+            result = CheckResult(check.name, True, check.required, info=info)
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+            result = CheckResult(check.name, False, check.required, error=error)
+        result.seconds = time.perf_counter() - start
+        return result
+
+    def start(self) -> "Preflight":
+        """Start every check that has no cached result in a background thread."""
+        self.process_age_at_start = process_age_seconds()
+        self._started = time.perf_counter()
+        cached = self._load_cache()
+        pending = []
+        for check in self.checks:
+            if check.cacheable and check.name in cached:
+                self.results[check.name] = CheckResult(
+                    **dict(cached[check.name], cached=True, seconds=0.0)
+                )
+            else:
+                pending.append(check)
+        if pending:
+            self._pool = ThreadPoolExecutor(
+                max_workers=len(pending), thread_name_prefix="preflight"
+            )
+            for check in pending:
+                self._futures[check.name] = self._pool.submit(self._run, check)
+        return self
+
+    def wait(self) -> Dict[str, CheckResult]:
+        """
+        Block until every check has finished.
+
+        Returns:
+            Dict[str, CheckResult]: Results by check name
+
+        Raises:
+            RuntimeError: If a required check failed
+        """
+        with self._lock:
+            if not self.done:
+                waited = time.perf_counter()
+                for name, future in self._futures.items():
+                    self.results[name] = future.result()
+                order = [c.name for c in self.checks if c.name in self.results]
+                self.results = {name: self.results[name] for name in order}
+                if self._pool is not None:
+                    self._pool.shutdown(wait=True)
+                self.blocked_seconds = time.perf_counter() - waited
+                self.wall_seconds = time.perf_counter() - self._started
+                self.done = True
+                self._save_cache()
+        failed = [r for r in self.results.values() if r.required and not r.ok]
+        if failed:
+            raise RuntimeError("; ".join(r.error or r.name for r in failed))
+        return self.results
+
+    def _save_cache(self) -> None:
+        if self.cache_path is None:
+            return
+        cacheable = {check.name for check in self.checks if check.cacheable}
+        entries = {
+            name: dict(asdict(result), cached=False)
+            for name, result in self.results.items()
+            if name in cacheable and result.ok
+        }
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            with open(self.cache_path + ".tmp", "w") as f:
+                json.dump(entries, f, indent=2)
+            os.replace(self.cache_path + ".tmp", self.cache_path)
+        except OSError as e:
+            print(f"Warning: could not write preflight cache: {e}")
+
+    def report(self) -> Dict:
+        """Results plus startup timing; waits for the checks first."""
+        try:
+            self.wait()
+        except RuntimeError:
+            pass
+        return {
+            "process_age_at_start_seconds": self.process_age_at_start,
+            "wall_seconds": self.wall_seconds,
+            "blocked_seconds": self.blocked_seconds,
+            "checks": {name: asdict(result) for name, result in self.results.items()},
+        }
+
+    def summary(self) -> str:
+        lines = []
+        if self.process_age_at_start is not None:
+            lines.append(
+                f"Process started {self.process_age_at_start:.1f}s before preflight"
+            )
+        lines.append(
+            f"Preflight: {self.wall_seconds:.1f}s total, step blocked "
+            f"{self.blocked_seconds:.1f}s waiting for it"
+        )
+        for result in self.results.values():
+            state = "ok" if result.ok else "FAILED"
+            source = "cached" if result.cached else f"{result.seconds:.2f}s"
+            detail = result.error or ", ".join(
+                f"{k}={v}" for k, v in result.info.items() if k != "log"
+            )
+            lines.append(f"  {result.name:18s} {state:6s} {source:>7s} {detail}")
+            if "log" in result.info:
+                lines.extend(f"    {line}" for line in result.info["log"].splitlines())
+        return "\n".join(lines)
+
+
+def parse_arguments() -> argparse.Namespace:
+    """
+    Parse command line arguments.
+
+    Returns:
+        argparse.Namespace: Parsed command line arguments
+    """
+    parser = argparse.ArgumentParser(
+        description="Run the flow preflight checks and report their timing",
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+    )
+    parser.add_argument(
+        "--repo", type=str, default="/workspaces/bdai", help="Git checkout"
+    )
+    parser.add_argument("--image", type=str, default=None, help="Image reference")
+    parser.add_argument("--cache-dir", type=str, default=None, help="Result cache")
+    parser.add_argument("--no-cache", action="store_true", help="Ignore cached results")
+    return parser.parse_args()
+
+
+def main() -> None:
+    """Run the default checks and print the summary; exit 1 if a required one fails."""
+    args = parse_arguments()
+    preflight = Preflight(
+        default_checks(args.repo), args.image, args.cache_dir, not args.no_cache
+    ).start()
+    try:
+        preflight.wait()
+    except RuntimeError as e:
+        print(preflight.summary())
+        print(f"Preflight failed: {e}")
+        sys.exit(1)
+    print(preflight.summary())
+
+
+if __name__ == "__main__":
+    main()
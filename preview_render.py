@@ -0,0 +1,330 @@
+#!/usr/bin/env python3
+
+import argparse
+import hashlib
+import json
+import math
+import os
+import shutil
+import struct
+import subprocess
+import time
+import zlib
+from dataclasses import asdict, dataclass, field
+from typing import Dict, List, Optional, Sequence
+
+import h5py
+import numpy as np
+
+from blob_store import link_or_copy
+from content_hash import file_digest
+from frame_cache import FrameStore
+from training_sweep import cache_root
+
+CACHE_DIR_ENV = "MAPLE_PREVIEW_CACHE"
+DEFAULT_FPS = 5.0
+RESULT_NAME = "preview.json"
+
+
+def write_png(path: str, image: np.ndarray) -> None:
+    """Write an RGB or grayscale uint8 image as PNG using only zlib."""
+    image = np.ascontiguousarray(image, dtype=np.uint8)
+    height, width = image.shape[:2]
+    color_type = 2 if image.ndim == 3 else 0
+    rows = image.reshape(height, -1)
+    raw = np.hstack([np.zeros((height, 1), dtype=np.uint8), rows]).tobytes()
+
+    def chunk(tag: bytes, data: bytes) -> bytes:
+        crc = zlib.crc32(tag + data) & 0xFFFFFFFF
+        return struct.pack(">I", len(data)) + tag + data + struct.pack(">I", crc)
+
+    with open(path, "wb") as f:
+        f.write(b"\x89PNG\r\n\x1a\n")
+        header = struct.pack(">IIBBBBB", width, height, 8, color_type, 0, 0, 0)
+        f.write(chunk(b"IHDR", header))
+        f.write(chunk(b"IDAT", zlib.compress(raw, 6)))
+        f.write(chunk(b"IEND", b""))
+
+
+def _to_rgb(frame: np.ndarray) -> np.ndarray:
+    if frame.ndim == 2:
+        frame = np.repeat(frame[..., None], 3, axis=2)
+    if frame.dtype != np.uint8:
+        scale = 255.0 / max(float(frame.max()), 1.0)
+        frame = (frame.astype(np.float32) * scale).astype(np.uint8)
+    return frame[..., :3]
+
+
+def _fit(frame: np.ndarray, height: int, width: int) -> np.ndarray:
+    """Pad (or crop) a frame to exactly ``height`` x ``width``."""
+    out = np.zeros((height, width, 3), dtype=np.uint8)
+    h, w = min(height, frame.shape[0]), min(width, frame.shape[1])
+    out[:h, :w] = frame[:h, :w]
+    return out
+
+
+def tile(frames: Sequence[np.ndarray], columns: Optional[int] = None) -> np.ndarray:
+    """Arrange same-sized RGB frames in a grid, row-major."""
+    columns = columns or math.ceil(math.sqrt(len(frames)))
+    rows = math.ceil(len(frames) / columns)
+    height, width = frames[0].shape[:2]
+    grid = np.zeros((rows * height, columns * width, 3), dtype=np.uint8)
+    for i, frame in enumerate(frames):
+        r, c = divmod(i, columns)
+        grid[r * height : (r + 1) * height, c * width : (c + 1) * width] = frame
+    return grid
+
+
+def _frame_rate(f: h5py.File) -> float:
+    if "timestamps" in f and len(f["timestamps"]) > 1:
+        period_ns = float(np.median(np.diff(f["timestamps"][:])))
+        if period_ns > 0:
+            return 1e9 / period_ns
+    return DEFAULT_FPS
+
+
+class _Encoder:
+    """An ffmpeg process encoding rgb24 frames piped on stdin to H.264."""
+
+    def __init__(self, path: str, height: int, width: int, fps: float, crf: int):
+        self.path = path
+        self.process = subprocess.Popen(
+            [
+                "ffmpeg", "-y", "-loglevel", "error",
+                "-f", "rawvideo", "-pix_fmt", "rgb24", "-s", f"{width}x{height}",
+                "-r", f"{fps:.3f}", "-i", "-",
+                "-c:v", "libx264", "-preset", "veryfast", "-crf", str(crf),
+                "-pix_fmt", "yuv420p", "-movflags", "+faststart", path,
+            ],
+            stdin=subprocess.PIPE,
+        )
+
+    def write(self, frame: np.ndarray) -> None:
+        self.process.stdin.write(np.ascontiguousarray(frame).tobytes())
+
+    def close(self) -> None:
+        self.process.stdin.close()
+        if self.process.wait() != 0:
+            raise subprocess.CalledProcessError(self.process.returncode, "ffmpeg")
+
+
+@dataclass
+class PreviewResult:
+    source: str
+    content_hash: str
+    layout: str
+    cameras: List[str]
+    frames: int = 0
+    fps: float = DEFAULT_FPS
+    videos: List[str] = field(default_factory=list)
+    thumbnails: List[str] = field(default_factory=list)
+    cached: bool = False
+    seconds: float = 0.0
+
+    def to_dict(self) -> Dict:
+        return asdict(self)
+
+
+def _render(
+    hdf5_path: str,
+    out_dir: str,
+    layout: str,
+    cameras: Optional[List[str]],
+    stride: int,
+    thumbnails: int,
+    batch_size: int,
+    crf: int,
+) -> PreviewResult:
+    os.makedirs(out_dir, exist_ok=True)
+    with h5py.File(hdf5_path, "r") as f, FrameStore(f, max_cache_bytes=0) as store:
+        cameras = cameras or store.cameras()
+        if not cameras:
+            raise ValueError(f"No camera*_rgb datasets in {hdf5_path}")
+        frames = min(store.num_frames(c) for c in cameras)
+        result = PreviewResult(
+            source=hdf5_path,
+            content_hash="",
+            layout=layout,
+            cameras=cameras,
+            frames=frames,
+            fps=_frame_rate(f),
+        )
+        first = {c: store.get_frames(c, [0])[0][::stride, ::stride] for c in cameras}
+        # Every tile gets the largest camera's size, rounded to even for yuv420p
+        height = max(frame.shape[0] for frame in first.values())
+        width = max(frame.shape[1] for frame in first.values())
+        height, width = height + height % 2, width + width % 2
+
+        if layout == "tiled":
+            columns = math.ceil(math.sqrt(len(cameras)))
+            rows = math.ceil(len(cameras) / columns)
+            names = ["tiled.mp4"]
+            sizes = [(rows * height, columns * width)]
+        else:
+            names = [f"{c}.mp4" for c in cameras]
+            sizes = [(height, width)] * len(cameras)
+        if shutil.which("ffmpeg") is None:
+            raise RuntimeError("ffmpeg is required to encode preview videos")
+        encoders = [
+            _Encoder(os.path.join(out_dir, name), h, w, result.fps, crf)
+            for name, (h, w) in zip(names, sizes)
+        ]
+
+        thumb_indices = set(
+            np.linspace(0, frames - 1, num=min(thumbnails, frames)).astype(int).tolist()
+        )
+        thumbs: Dict[str, List[np.ndarray]] = {c: [] for c in cameras}
+        try:
+            for begin in range(0, frames, batch_size):
+                indices = list(range(begin, min(begin + batch_size, frames)))
+                batch = {
+                    c: [
+                        _fit(_to_rgb(frame[::stride, ::stride]), height, width)
+                        for frame in store.get_frames(c, indices)
+                    ]
+                    for c in cameras
+                }
+                for offset, index in enumerate(indices):
+                    per_camera = [batch[c][offset] for c in cameras]
+                    if layout == "tiled":
+                        encoders[0].write(tile(per_camera, columns))
+                    else:
+                        for encoder, frame in zip(encoders, per_camera):
+                            encoder.write(frame)
+                    if index in thumb_indices:
+                        for c, frame in zip(cameras, per_camera):
+                            thumbs[c].append(frame)
+        finally:
+            for encoder in encoders:
+                encoder.close()
+        result.videos = [encoder.path for encoder in encoders]
+
+    for camera, strip in thumbs.items():
+        if strip:
+            path = os.path.join(out_dir, f"{camera}_thumbnails.png")
+            write_png(path, np.hstack(strip))
+            result.thumbnails.append(path)
+    return result
+
+
+def render_preview(
+    hdf5_path: str,
+    output_dir: str,
+    layout: str = "tiled",
+    cameras: Optional[List[str]] = None,
+    stride: int = 1,
+    thumbnails: int = 8,
+    batch_size: int = 32,
+    crf: int = 23,
+    cache_dir: Optional[str] = None,
+) -> PreviewResult:
+    """
+    Render review videos and thumbnail strips from a demo HDF5's camera datasets.
+
+    Frames are streamed from ``camera*_rgb`` in batches through
+    :class:`frame_cache.FrameStore` and piped to ffmpeg, so no MCAP bag is
+    needed. Renders are cached under the file's SHA-256 and the render options;
+    a repeat request links the cached files into ``output_dir``.
+
+    Args:
+        hdf5_path (str): Demo HDF5 file
+        output_dir (str): Where the videos and ``<camera>_thumbnails.png`` go
+        layout (str): ``tiled`` (one grid video) or ``per_camera``
+        cameras (Optional[List[str]]): Camera names; all cameras by default
+        stride (int): Keep every ``stride``-th pixel to shrink the preview
+        thumbnails (int): Evenly spaced frames per thumbnail strip
+        batch_size (int): Frames decoded per batch
+        crf (int): x264 quality, lower is better
+        cache_dir (Optional[str]): Render cache (``$MAPLE_PREVIEW_CACHE``, else on the
+            shared volume when mounted, else ``~/.cache``)
+
+    Returns:
+        PreviewResult: Paths of the videos and thumbnails in ``output_dir``
+    """
+    if layout not in ("tiled", "per_camera"):
+        raise ValueError(f"Unknown layout: {layout}")
+    start = time.perf_counter()
+    cache_dir = cache_dir or os.environ.get(
+        CACHE_DIR_ENV, os.path.join(cache_root(), "maple_preview")
+    )
+    digest = file_digest(hdf5_path)
+    options = json.dumps([layout, cameras, stride, thumbnails, crf])
+    key = f"{digest[:20]}_{hashlib.sha1(options.encode()).hexdigest()[:8]}"
+    entry_dir = os.path.join(cache_dir, key)
+    result_path = os.path.join(entry_dir, RESULT_NAME)
+
+    if os.path.isfile(result_path):
+        with open(result_path, "r") as f:
+            result = PreviewResult(**json.load(f))
+        result.cached = True
+    else:
+        tmp_dir = f"{entry_dir}.tmp{os.getpid()}"
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        result = _render(
+            hdf5_path, tmp_dir, layout, cameras, stride, thumbnails, batch_size, crf
+        )
+        result.content_hash = digest
+        result.videos = [os.path.basename(p) for p in result.videos]
+        result.thumbnails = [os.path.basename(p) for p in result.thumbnails]
+        with open(os.path.join(tmp_dir, RESULT_NAME), "w") as f:
+            json.dump(result.to_dict(), f, indent=2)
+        try:
+            os.replace(tmp_dir, entry_dir)
+        except OSError:
+            # Another process rendered the same entry first
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    os.makedirs(output_dir, exist_ok=True)
+    result.source = hdf5_path
+    result.videos = [os.path.join(output_dir, name) for name in result.videos]
+    result.thumbnails = [os.path.join(output_dir, name) for name in result.thumbnails]
+    for path in result.videos + result.thumbnails:
+        link_or_copy(os.path.join(entry_dir, os.path.basename(path)), path)
+    result.seconds = time.perf_counter() - start
+    return result
+
+
+def parse_arguments() -> argparse.Namespace:
+    """
+    Parse command line arguments.
+
+    Returns:
+        argparse.Namespace: Parsed command line arguments
+    """
+    parser = argparse.ArgumentParser(
+        description="Render preview videos and thumbnails from demo HDF5 files",
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+    )
+    parser.add_argument("files", nargs="+", help="Demo HDF5 files")
+    parser.add_argument("--output", type=str, default="previews", help="Output directory")
+    parser.add_argument("--layout", choices=["tiled", "per_camera"], default="tiled")
+    parser.add_argument("--cameras", nargs="*", default=None, help="Camera names")
+    parser.add_argument("--stride", type=int, default=1, help="Pixel decimation")
+    parser.add_argument("--thumbnails", type=int, default=8, help="Frames per strip")
+    parser.add_argument("--cache-dir", type=str, default=None, help="Render cache")
+    return parser.parse_args()
+
+
+def main() -> None:
+    """Render each file into ``<output>/<file stem>/``."""
+    args = parse_arguments()
+    for path in args.files:
+        stem = os.path.splitext(os.path.basename(path))[0]
+        result = render_preview(
+            path,
+            os.path.join(args.output, stem),
+            layout=args.layout,
+            cameras=args.cameras,
+            stride=args.stride,
+            thumbnails=args.thumbnails,
+            cache_dir=args.cache_dir,
+        )
+        state = "cached" if result.cached else "rendered"
+        print(
+            f"{path}: {state} {result.frames} frames x {len(result.cameras)} cameras "
+            f"in {result.seconds:.2f}s -> {', '.join(result.videos)}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,344 @@
+#!/usr/bin/env python3
+
+import argparse
+import fnmatch
+import hashlib
+import json
+import os
+import sqlite3
+import time
+from dataclasses import asdict, dataclass, field
+from typing import Dict, List, Optional, Sequence
+
+CACHE_DIR_ENV = "MAPLE_QUERY_CACHE"
+BACKEND_ENV = "MAPLE_QUERY_BACKEND"
+TTL_ENV = "MAPLE_QUERY_TTL"
+DEFAULT_TTL_SECONDS = 6 * 3600
+TASK_FIELD = 'JSON_EXTRACT_SCALAR(extra_json, "$.extra_json.task_id")'
+
+
+@dataclass
+class QueryResult:
+    session_ids: List[str]
+    locations: Dict = field(default_factory=dict)
+    task_by_session: Dict[str, str] = field(default_factory=dict)
+    cached: bool = False
+    resolved_at: float = 0.0
+
+
+def task_query(task_ids: Sequence[str] = (), pattern: Optional[str] = None) -> str:
+    """
+    Build the data-platform ``WHERE`` clause for a set of task IDs.
+
+    Args:
+        task_ids (Sequence[str]): Exact task IDs
+        pattern (Optional[str]): SQL ``LIKE`` pattern over task IDs
+
+    Returns:
+        str: Query suitable for ``DataPlatformLocationProvider(user_input=...)``
+    """
+    clauses = []
+    if len(task_ids) == 1:
+        clauses.append(f'{TASK_FIELD} = "{task_ids[0]}"')
+    elif task_ids:
+        quoted = ", ".join(f'"{t}"' for t in task_ids)
+        clauses.append(f"{TASK_FIELD} IN ({quoted})")
+    if pattern:
+        clauses.append(f'{TASK_FIELD} LIKE "{pattern}"')
+    if not clauses:
+        raise ValueError("At least one task ID or pattern is required")
+    return "WHERE " + " OR ".join(clauses)
+
+
+def _jsonable(value):
+    if isinstance(value, dict):
+        return {str(k): _jsonable(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple, set)):
+        return [_jsonable(v) for v in value]
+    if isinstance(value, (str, int, float, bool)) or value is None:
+        return value
+    return str(value)
+
+
+class DataPlatformBackend:
+    """Live queries through ``DataPlatformLocationProvider``."""
+
+    name = "data_platform"
+
+    def __init__(self):
+        from fake_platform import active_platform
+
+        # $MAPLE_FAKE_PLATFORM swaps in the local stand-in, cached separately
+        self.platform = active_platform()
+        if self.platform is not None:
+            self.name = f"fake:{self.platform.root}"
+
+    def resolve(self, task_ids: Sequence[str], pattern: Optional[str]) -> QueryResult:
+        if self.platform is not None:
+            provider_class = self.platform.location_provider
+        else:
+            from bdai_tensors.data_platform_location_provider import (
+                DataPlatformLocationProvider as provider_class,
+            )
+
+        location_provider = provider_class(
+            user_input=task_query(task_ids, pattern),
+            session_only=True,
+        )
+        locations = location_provider()
+        session_ids = list(dict.fromkeys(location_provider.resolved_keys))
+        task_by_session = {}
+        if len(task_ids) == 1 and not pattern:
+            task_by_session = {s: task_ids[0] for s in session_ids}
+        return QueryResult(session_ids, _jsonable(locations), task_by_session)
+
+
+class JsonBackend:
+    """
+    Offline stand-in reading sessions from a JSON file.
+
+    The file holds ``{"sessions": [{"session_id", "task_id", "location", ...}]}``;
+    any extra keys (e.g. ``size_bytes``) are passed through as the location.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.name = f"json:{os.path.abspath(path)}"
+
+    def _rows(self) -> List[Dict]:
+        with open(self.path, "r") as f:
+            return json.load(f)["sessions"]
+
+    def resolve(self, task_ids: Sequence[str], pattern: Optional[str]) -> QueryResult:
+        glob = _like_to_glob(pattern) if pattern else None
+        rows = [
+            row
+            for row in self._rows()
+            if row["task_id"] in task_ids
+            or (glob and fnmatch.fnmatchcase(row["task_id"], glob))
+        ]
+        return _result_from_rows(rows)
+
+
+class SQLiteBackend:
+    """Offline stand-in backed by a SQLite ``sessions(session_id, task_id, ...)`` table."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.name = f"sqlite:{os.path.abspath(path)}"
+
+    def resolve(self, task_ids: Sequence[str], pattern: Optional[str]) -> QueryResult:
+        clauses, params = [], []
+        if task_ids:
+            clauses.append(f"task_id IN ({', '.join('?' for _ in task_ids)})")
+            params.extend(task_ids)
+        if pattern:
+            clauses.append("task_id LIKE ?")
+            params.append(pattern)
+        with sqlite3.connect(self.path) as conn:
+            conn.row_factory = sqlite3.Row
+            sql = f"SELECT * FROM sessions WHERE {' OR '.join(clauses)} ORDER BY rowid"
+            rows = conn.execute(sql, params).fetchall()
+        return _result_from_rows([dict(row) for row in rows])
+
+
+def _like_to_glob(pattern: str) -> str:
+    escaped = pattern.replace("*", "[*]").replace("?", "[?]")
+    return escaped.replace("%", "*").replace("_", "?")
+
+
+def _result_from_rows(rows: List[Dict]) -> QueryResult:
+    session_ids = list(dict.fromkeys(row["session_id"] for row in rows))
+    locations = {
+        row["session_id"]: {
+            k: v for k, v in row.items() if k not in ("session_id", "task_id")
+        }
+        for row in rows
+    }
+    task_by_session = {row["session_id"]: row["task_id"] for row in rows}
+    return QueryResult(session_ids, locations, task_by_session)
+
+
+def get_backend(spec: Optional[str] = None):
+    """
+    Return the backend named by ``spec`` or ``$MAPLE_QUERY_BACKEND``.
+
+    ``data_platform`` (default) queries the live service; a ``.json`` path or
+    a ``.sqlite``/``.db`` path selects the corresponding offline stand-in.
+    """
+    spec = spec or os.environ.get(BACKEND_ENV, DataPlatformBackend.name)
+    if spec == DataPlatformBackend.name:
+        return DataPlatformBackend()
+    if spec.endswith(".json"):
+        return JsonBackend(spec)
+    if spec.endswith((".sqlite", ".db")):
+        return SQLiteBackend(spec)
+    raise ValueError(f"Unknown query backend: {spec}")
+
+
+class QueryCache:
+    """
+    On-disk memo of task query results with a TTL.
+
+    Args:
+        backend: Object with ``name`` and ``resolve(task_ids, pattern)``
+        cache_dir (Optional[str]): Where cached results are stored
+        ttl_seconds (Optional[float]): Maximum age of a reused result
+    """
+
+    def __init__(
+        self,
+        backend=None,
+        cache_dir: Optional[str] = None,
+        ttl_seconds: Optional[float] = None,
+    ):
+        self.backend = backend or get_backend()
+        self.cache_dir = cache_dir or os.environ.get(
+            CACHE_DIR_ENV, os.path.join(os.path.expanduser("~"), ".cache", "maple_query")
+        )
+        if ttl_seconds is None:
+            ttl_seconds = float(os.environ.get(TTL_ENV, DEFAULT_TTL_SECONDS))
+        self.ttl_seconds = ttl_seconds
+
+    def _path(self, task_ids: Sequence[str], pattern: Optional[str]) -> str:
+        key = json.dumps([self.backend.name, sorted(task_ids), pattern or ""])
+        digest = hashlib.sha1(key.encode()).hexdigest()[:20]
+        return os.path.join(self.cache_dir, f"{digest}.json")
+
+    def resolve(
+        self,
+        task_ids: Sequence[str] = (),
+        pattern: Optional[str] = None,
+        refresh: bool = False,
+    ) -> QueryResult:
+        """
+        Return the sessions for ``task_ids``/``pattern``, from cache when fresh.
+
+        Args:
+            task_ids (Sequence[str]): Exact task IDs
+            pattern (Optional[str]): SQL ``LIKE`` pattern over task IDs
+            refresh (bool): Ignore any cached result
+
+        Returns:
+            QueryResult: Session IDs, locations and (when known) their tasks
+        """
+        task_ids = list(task_ids)
+        path = self._path(task_ids, pattern)
+        if not refresh and os.path.isfile(path):
+            with open(path, "r") as f:
+                entry = json.load(f)
+            if time.time() - entry["resolved_at"] <= self.ttl_seconds:
+                entry["cached"] = True
+                return QueryResult(**entry)
+
+        result = self.backend.resolve(task_ids, pattern)
+        result.resolved_at = time.time()
+        os.makedirs(self.cache_dir, exist_ok=True)
+        with open(path + ".tmp", "w") as f:
+            json.dump(asdict(result), f)
+        os.replace(path + ".tmp", path)
+        return result
+
+    def invalidate(
+        self, task_ids: Optional[Sequence[str]] = None, pattern: Optional[str] = None
+    ) -> int:
+        """
+        Drop one cached query, or every cached query when nothing is given.
+
+        Returns:
+            int: Number of cache entries removed
+        """
+        if task_ids is None and pattern is None:
+            if not os.path.isdir(self.cache_dir):
+                return 0
+            names = [n for n in os.listdir(self.cache_dir) if n.endswith(".json")]
+            for name in names:
+                os.remove(os.path.join(self.cache_dir, name))
+            return len(names)
+        path = self._path(list(task_ids or []), pattern)
+        if os.path.isfile(path):
+            os.remove(path)
+            return 1
+        return 0
+
+
+def resolve_sessions(
+    task_ids: Sequence[str] = (),
+    pattern: Optional[str] = None,
+    refresh: bool = False,
+    ttl_seconds: Optional[float] = None,
+) -> QueryResult:
+    """
+    Resolve sessions through the configured backend and the default cache.
+
+    Flows pass their ``query_ttl`` parameter as ``ttl_seconds``; it defaults to
+    0 there, so a run only reuses a cached session list when asked to.
+    """
+    start = time.perf_counter()
+    cache = QueryCache(ttl_seconds=ttl_seconds)
+    result = cache.resolve(task_ids, pattern, refresh=refresh)
+    source = "cache" if result.cached else "query"
+    print(
+        f"Resolved {len(result.session_ids)} sessions from {source} "
+        f"in {(time.perf_counter() - start) * 1000:.0f} ms"
+    )
+    return result
+
+
+def export_json(result: QueryResult, path: str) -> None:
+    """Write a result as a :class:`JsonBackend` file, for fully offline runs."""
+    rows = []
+    for session_id in result.session_ids:
+        location = result.locations.get(session_id, {})
+        row = dict(location) if isinstance(location, dict) else {"location": location}
+        row["session_id"] = session_id
+        row["task_id"] = result.task_by_session.get(session_id, "")
+        rows.append(row)
+    with open(path, "w") as f:
+        json.dump({"sessions": rows}, f, indent=2)
+
+
+def parse_arguments() -> argparse.Namespace:
+    """
+    Parse command line arguments.
+
+    Returns:
+        argparse.Namespace: Parsed command line arguments
+    """
+    parser = argparse.ArgumentParser(
+        description="Resolve task IDs to sessions through the memoized query layer",
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+    )
+    parser.add_argument("--task-ids", type=str, default="", help="Comma-separated task IDs")
+    parser.add_argument("--pattern", type=str, default=None, help="SQL LIKE pattern")
+    parser.add_argument("--backend", type=str, default=None, help="Backend spec")
+    parser.add_argument("--refresh", action="store_true", help="Bypass the cache")
+    parser.add_argument(
+        "--invalidate", action="store_true", help="Drop cached results and exit"
+    )
+    parser.add_argument(
+        "--export-json", type=str, default=None, help="Save the result as a JSON stand-in"
+    )
+    return parser.parse_args()
+
+
+def main() -> None:
+    """Resolve (or invalidate) a task query from the command line."""
+    args = parse_arguments()
+    task_ids = [t.strip() for t in args.task_ids.split(",") if t.strip()]
+    cache = QueryCache(get_backend(args.backend))
+
+    if args.invalidate:
+        removed = cache.invalidate(task_ids or None, args.pattern)
+        print(f"Removed {removed} cached queries")
+        return
+
+    result = cache.resolve(task_ids, args.pattern, refresh=args.refresh)
+    print(json.dumps(asdict(result), indent=2))
+    if args.export_json:
+        export_json(result, args.export_json)
+        print(f"Wrote offline stand-in to {args.export_json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,468 @@
+#!/usr/bin/env python3
+
+import argparse
+import json
+import math
+import os
+import shutil
+import subprocess
+import threading
+import time
+from dataclasses import asdict, dataclass
+from typing import Callable, Dict, List, Optional
+
+CGROUP_ROOT = "/sys/fs/cgroup"
+CLOCK_TICKS = os.sysconf("SC_CLK_TCK") if hasattr(os, "sysconf") else 100
+PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+GPU_BUSY_PERCENT = 5.0
+MEMORY_STEP_MB = 512
+DISK_STEP_MB = 1024
+
+
+def _read(path: str) -> Optional[str]:
+    try:
+        with open(path, "r") as f:
+            return f.read().strip()
+    except OSError:
+        return None
+
+
+def _read_kv(path: str) -> Dict[str, int]:
+    text = _read(path) or ""
+    values = {}
+    for line in text.splitlines():
+        parts = line.split()
+        if len(parts) == 2 and parts[1].isdigit():
+            values[parts[0]] = int(parts[1])
+    return values
+
+
+def cpu_quota_cores() -> Optional[float]:
+    """CPU limit of this container from the cgroup quota, or None if unlimited."""
+    cpu_max = _read(os.path.join(CGROUP_ROOT, "cpu.max"))
+    if cpu_max:
+        quota, period = cpu_max.split()[:2]
+        return None if quota == "max" else int(quota) / int(period)
+    quota = _read(os.path.join(CGROUP_ROOT, "cpu", "cpu.cfs_quota_us"))
+    period = _read(os.path.join(CGROUP_ROOT, "cpu", "cpu.cfs_period_us"))
+    if quota and period and int(quota) > 0:
+        return int(quota) / int(period)
+    return None
+
+
+def available_cpus() -> int:
+    """Cores this process may actually use: the cgroup quota, affinity or count."""
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError:
+        cpus = os.cpu_count() or 1
+    quota = cpu_quota_cores()
+    if quota is not None:
+        cpus = min(cpus, max(1, math.floor(quota)))
+    return cpus
+
+
+def memory_limit_bytes() -> Optional[int]:
+    """Memory limit of this container, or None if unlimited."""
+    value = _read(os.path.join(CGROUP_ROOT, "memory.max"))
+    if value is None:
+        value = _read(os.path.join(CGROUP_ROOT, "memory", "memory.limit_in_bytes"))
+    if value is None or value == "max" or int(value) >= 1 << 60:
+        return None
+    return int(value)
+
+
+class _CgroupReader:
+    """CPU and working-set memory of the whole container (cgroup v2 or v1)."""
+
+    def __init__(self):
+        v2 = os.path.isfile(os.path.join(CGROUP_ROOT, "memory.current"))
+        self.version = 2 if v2 else 1
+        self.available = (
+            self.cpu_seconds() is not None and self.memory_bytes() is not None
+        )
+
+    def cpu_seconds(self) -> Optional[float]:
+        if self.version == 2:
+            usage = _read_kv(os.path.join(CGROUP_ROOT, "cpu.stat")).get("usage_usec")
+            return None if usage is None else usage / 1e6
+        usage = _read(os.path.join(CGROUP_ROOT, "cpuacct", "cpuacct.usage"))
+        return None if usage is None else int(usage) / 1e9
+
+    def memory_bytes(self) -> Optional[int]:
+        # Working set (usage minus inactive page cache), as the kubelet counts it
+        if self.version == 2:
+            usage = _read(os.path.join(CGROUP_ROOT, "memory.current"))
+            stat = _read_kv(os.path.join(CGROUP_ROOT, "memory.stat"))
+            inactive = stat.get("inactive_file", 0)
+        else:
+            usage = _read(os.path.join(CGROUP_ROOT, "memory", "memory.usage_in_bytes"))
+            stat = _read_kv(os.path.join(CGROUP_ROOT, "memory", "memory.stat"))
+            inactive = stat.get("total_inactive_file", 0)
+        if usage is None:
+            return None
+        return max(0, int(usage) - inactive)
+
+
+class _ProcessTreeReader:
+    """CPU and RSS of this process and its live descendants, from ``/proc``."""
+
+    def __init__(self, pid: int):
+        self.pid = pid
+        self._finished_cpu = 0.0
+        self._last_cpu: Dict[int, float] = {}
+
+    def _tree(self) -> List[int]:
+        children: Dict[int, List[int]] = {}
+        for name in os.listdir("/proc"):
+            if not name.isdigit():
+                continue
+            stat = _read(f"/proc/{name}/stat")
+            if stat is None:
+                continue
+            ppid = int(stat.rsplit(")", 1)[1].split()[1])
+            children.setdefault(ppid, []).append(int(name))
+        pids, stack = [], [self.pid]
+        while stack:
+            pid = stack.pop()
+            pids.append(pid)
+            stack.extend(children.get(pid, []))
+        return pids
+
+    def sample(self):
+        cpu, rss = {}, 0
+        for pid in self._tree():
+            stat = _read(f"/proc/{pid}/stat")
+            statm = _read(f"/proc/{pid}/statm")
+            if stat is None or statm is None:
+                continue
+            fields = stat.rsplit(")", 1)[1].split()
+            cpu[pid] = (int(fields[11]) + int(fields[12])) / CLOCK_TICKS
+            rss += int(statm.split()[1]) * PAGE_SIZE
+        # Keep the last CPU reading of processes that exited between samples
+        self._finished_cpu += sum(
+            t for pid, t in self._last_cpu.items() if pid not in cpu
+        )
+        self._last_cpu = cpu
+        return self._finished_cpu + sum(cpu.values()), rss
+
+
+def _read_kv_colon(path: str) -> Dict[str, int]:
+    text = _read(path) or ""
+    values = {}
+    for line in text.splitlines():
+        key, _, value = line.partition(":")
+        if value.strip().isdigit():
+            values[key] = int(value)
+    return values
+
+
+def _io_bytes() -> Optional[int]:
+    values = _read_kv_colon("/proc/self/io")
+    if not values:
+        return None
+    return values.get("read_bytes", 0) + values.get("write_bytes", 0)
+
+
+def nvidia_smi_reader() -> Optional[List[Dict]]:
+    """Per-GPU utilization and memory from ``nvidia-smi``, or None if unavailable."""
+    try:
+        result = subprocess.run(
+            [
+                "nvidia-smi",
+                "--query-gpu=utilization.gpu,memory.used,memory.total",
+                "--format=csv,noheader,nounits",
+            ],
+            capture_output=True,
+            text=True,
+            timeout=10,
+            check=True,
+        )
+    except (OSError, subprocess.SubprocessError):
+        return None
+    gpus = []
+    for line in result.stdout.strip().splitlines():
+        util, used, total = (float(v) for v in line.split(","))
+        gpus.append({"util_percent": util, "memory_mb": used, "memory_total_mb": total})
+    return gpus
+
+
+def stub_gpu_reader() -> Optional[List[Dict]]:
+    """GPU reader for machines without ``nvidia-smi``: reports no GPUs."""
+    return None
+
+
+def default_gpu_reader() -> Callable[[], Optional[List[Dict]]]:
+    return nvidia_smi_reader if shutil.which("nvidia-smi") else stub_gpu_reader
+
+
+@dataclass
+class ResourceSample:
+    t: float
+    cpu_cores: float
+    memory_mb: float
+    disk_used_mb: float
+    io_mb_s: Optional[float] = None
+    gpu_util_percent: Optional[List[float]] = None
+    gpu_memory_mb: Optional[List[float]] = None
+
+
+def _percentile(values: List[float], q: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, math.ceil(q / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def _round_up(value: float, step: float) -> float:
+    return max(step, math.ceil(value / step) * step)
+
+
+class ResourceSampler:
+    """
+    Background sampler of a step's CPU, memory, disk and GPU usage.
+
+    CPU and memory come from the container's cgroup when readable (what the
+    scheduler and OOM killer see) and otherwise from ``/proc`` for this
+    process and its descendants. GPU utilization comes from ``nvidia-smi``
+    and is left empty where it is not installed. Disk is the growth of used
+    space on the filesystem holding ``disk_path`` since the sampler started.
+    The timeline is halved in resolution whenever it reaches ``max_samples``.
+
+    Args:
+        interval (float): Seconds between samples
+        disk_path (str): Directory whose filesystem is the step's scratch space
+        gpu_reader (Optional[Callable]): Override for the GPU source
+        max_samples (int): Upper bound on the stored timeline
+    """
+
+    def __init__(
+        self,
+        interval: float = 5.0,
+        disk_path: str = ".",
+        gpu_reader: Optional[Callable[[], Optional[List[Dict]]]] = None,
+        max_samples: int = 2000,
+    ):
+        self.interval = interval
+        self.disk_path = os.path.abspath(disk_path)
+        self.max_samples = max_samples
+        self.samples: List[ResourceSample] = []
+        self._gpu_reader = gpu_reader or default_gpu_reader()
+        self._cgroup = _CgroupReader()
+        self._proc = _ProcessTreeReader(os.getpid())
+        self.source = (
+            f"cgroup v{self._cgroup.version}" if self._cgroup.available else "proc"
+        )
+        self._stride = 1
+        self._count = 0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._disk_start = 0
+        self._started_at = 0.0
+
+    def __enter__(self) -> "ResourceSampler":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+    def _cpu_and_memory(self):
+        if self._cgroup.available:
+            return self._cgroup.cpu_seconds(), self._cgroup.memory_bytes()
+        return self._proc.sample()
+
+    def start(self) -> "ResourceSampler":
+        self._started_at = time.monotonic()
+        self._disk_start = shutil.disk_usage(self.disk_path).used
+        self._thread = threading.Thread(
+            target=self._run, name="resource-sampler", daemon=True
+        )
+        self._thread.start()
+        return self
+
+    def _run(self) -> None:
+        last_t = time.monotonic()
+        last_cpu, _ = self._cpu_and_memory()
+        last_io = _io_bytes()
+        while not self._stop.wait(self.interval):
+            try:
+                now = time.monotonic()
+                cpu, memory = self._cpu_and_memory()
+                io = _io_bytes()
+                gpus = self._gpu_reader()
+                elapsed = max(now - last_t, 1e-9)
+                disk_used = shutil.disk_usage(self.disk_path).used - self._disk_start
+                sample = ResourceSample(
+                    t=now - self._started_at,
+                    cpu_cores=max(0.0, (cpu - last_cpu) / elapsed),
+                    memory_mb=memory / 1e6,
+                    disk_used_mb=disk_used / 1e6,
+                )
+                if io is not None and last_io is not None:
+                    sample.io_mb_s = (io - last_io) / 1e6 / elapsed
+                if gpus:
+                    sample.gpu_util_percent = [g["util_percent"] for g in gpus]
+                    sample.gpu_memory_mb = [g["memory_mb"] for g in gpus]
+                last_t, last_cpu, last_io = now, cpu, io
+                self._append(sample)
+            except Exception as e:
+                # Sampling must never take the step down with it
+                print(f"[resources] sample failed: {e}")
+
+    def _append(self, sample: ResourceSample) -> None:
+        self._count += 1
+        if self._count % self._stride:
+            return
+        self.samples.append(sample)
+        if len(self.samples) >= self.max_samples:
+            self.samples = self.samples[::2]
+            self._stride *= 2
+
+    def stop(self) -> List[ResourceSample]:
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+        return self.samples
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        series = {
+            "cpu_cores": [s.cpu_cores for s in self.samples],
+            "memory_mb": [s.memory_mb for s in self.samples],
+            "disk_used_mb": [s.disk_used_mb for s in self.samples],
+            "io_mb_s": [s.io_mb_s for s in self.samples if s.io_mb_s is not None],
+            "gpu_util_percent": [
+                max(s.gpu_util_percent) for s in self.samples if s.gpu_util_percent
+            ],
+        }
+        return {
+            name: {
+                "mean": sum(values) / len(values) if values else 0.0,
+                "p50": _percentile(values, 50),
+                "p90": _percentile(values, 90),
+                "max": max(values) if values else 0.0,
+            }
+            for name, values in series.items()
+        }
+
+    def recommend(self, current: Optional[Dict] = None) -> Dict:
+        """
+        Suggest ``@kubernetes`` settings from the recorded usage.
+
+        CPU is requested at the 90th percentile of cores in use (so bursts may
+        borrow idle node capacity) and limited at the peak. Memory is requested
+        and limited at 1.25x the peak working set, since exceeding a memory
+        limit kills the pod. A GPU is kept only if one was busy in at least
+        one sample.
+
+        Args:
+            current (Optional[Dict]): The step's present ``cpu``/``memory``/``gpu``
+
+        Returns:
+            Dict: ``request``, ``limit``, ``decorator`` text, ``notes`` and ``current``
+        """
+        stats = self.stats()
+        cpu_request = _round_up(stats["cpu_cores"]["p90"] * 1.1, 0.5)
+        cpu_limit = max(cpu_request, _round_up(stats["cpu_cores"]["max"], 1))
+        memory = int(_round_up(stats["memory_mb"]["max"] * 1.25, MEMORY_STEP_MB))
+        disk = int(_round_up(stats["disk_used_mb"]["max"] * 1.5, DISK_STEP_MB))
+
+        gpu_samples = [s.gpu_util_percent for s in self.samples if s.gpu_util_percent]
+        gpus_busy = None
+        if gpu_samples:
+            gpus_busy = max(
+                sum(u > GPU_BUSY_PERCENT for u in util) for util in gpu_samples
+            )
+
+        notes = []
+        current = current or {}
+        if not self.samples:
+            notes.append("no samples recorded; the step was shorter than the interval")
+        if gpus_busy is None:
+            notes.append("GPU usage unknown (no nvidia-smi); keeping the current gpu")
+            gpu = current.get("gpu", 0)
+        else:
+            gpu = gpus_busy
+            if current.get("gpu") and not gpus_busy:
+                notes.append(f"requested {current['gpu']} GPU(s) but none was ever busy")
+        if current.get("cpu") and cpu_request < current["cpu"] / 2:
+            notes.append(
+                f"cpu={current['cpu']} requested but p90 usage was "
+                f"{stats['cpu_cores']['p90']:.1f} cores"
+            )
+        peak_memory = stats["memory_mb"]["max"]
+        if current.get("memory") and peak_memory > 0.9 * current["memory"]:
+            notes.append("peak memory within 10% of the current request: OOM risk")
+
+        args = [f"cpu={cpu_request:g}", f"memory={memory}", f"disk={disk}"]
+        if gpu:
+            args.append(f"gpu={gpu}")
+        return {
+            "request": {"cpu": cpu_request, "memory": memory, "disk": disk, "gpu": gpu},
+            "limit": {"cpu": cpu_limit, "memory": memory},
+            "decorator": f"@kubernetes({', '.join(args)})",
+            "notes": notes,
+            "current": current,
+        }
+
+    def report(self, current: Optional[Dict] = None) -> Dict:
+        """Timeline, statistics and recommendation, ready to store as an artifact."""
+        memory_limit = memory_limit_bytes()
+        return {
+            "source": self.source,
+            "interval": self.interval * self._stride,
+            "cpu_quota_cores": cpu_quota_cores(),
+            "memory_limit_mb": memory_limit / 1e6 if memory_limit else None,
+            "stats": self.stats(),
+            "recommendation": self.recommend(current),
+            "timeline": [asdict(s) for s in self.samples],
+        }
+
+
+def parse_arguments() -> argparse.Namespace:
+    """
+    Parse command line arguments.
+
+    Returns:
+        argparse.Namespace: Parsed command line arguments
+    """
+    parser = argparse.ArgumentParser(
+        description="Sample a command's resources and recommend @kubernetes settings",
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+    )
+    parser.add_argument("command", nargs=argparse.REMAINDER, help="Command to run")
+    parser.add_argument("--interval", type=float, default=1.0, help="Sample period (s)")
+    parser.add_argument("--cpu", type=float, default=None, help="Current cpu request")
+    parser.add_argument("--memory", type=int, default=None, help="Current memory (MB)")
+    parser.add_argument("--gpu", type=int, default=None, help="Current gpu count")
+    parser.add_argument("--output", type=str, default=None, help="Report JSON path")
+    return parser.parse_args()
+
+
+def main() -> None:
+    """Run a command under the sampler and print the recommendation."""
+    args = parse_arguments()
+    if not args.command:
+        raise SystemExit("Pass the command to sample after the options")
+    current = {
+        key: value
+        for key, value in (("cpu", args.cpu), ("memory", args.memory), ("gpu", args.gpu))
+        if value
+    }
+    with ResourceSampler(interval=args.interval) as sampler:
+        returncode = subprocess.run(args.command).returncode
+    report = sampler.report(current)
+    recommendation = report["recommendation"]
+    print(json.dumps(report["stats"], indent=2))
+    print(f"Recommended: {recommendation['decorator']}")
+    for note in recommendation["notes"]:
+        print(f"  note: {note}")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    raise SystemExit(returncode)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,282 @@
+#!/usr/bin/env python3
+
+import argparse
+import contextlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+from dataclasses import asdict, dataclass, field
+from typing import Dict, List, Optional
+
+DEFAULT_RESERVE_BYTES = 2 * 1024**3
+# Peak session footprint relative to its download (bag + HDF5 + extracted
+# video), used until a finished session calibrates it
+DEFAULT_EXPANSION = 1.5
+CALIBRATION_MARGIN = 1.1
+
+
+class DiskBudgetError(RuntimeError):
+    """A session can never fit in the disk budget, even on its own."""
+
+
+def tree_bytes(path: str) -> int:
+    """Bytes allocated under ``path``; hard-linked files are counted once."""
+    total, seen = 0, set()
+    for dirpath, _, names in os.walk(path):
+        for name in names:
+            try:
+                st = os.lstat(os.path.join(dirpath, name))
+            except FileNotFoundError:
+                continue
+            if (st.st_dev, st.st_ino) in seen:
+                continue
+            seen.add((st.st_dev, st.st_ino))
+            total += st.st_blocks * 512
+    return total
+
+
+def size_hint(location) -> Optional[int]:
+    """The session size a query location advertises, if any."""
+    if isinstance(location, dict) and location.get("size_bytes"):
+        return int(location["size_bytes"])
+    return None
+
+
+@dataclass
+class Lease:
+    session_id: str
+    scratch_dir: str
+    estimate: Optional[int]
+    admitted_at: float
+    waited_seconds: float = 0.0
+    source_bytes: Optional[int] = None
+    current_bytes: int = 0
+    peak_bytes: int = 0
+    released_at: Optional[float] = None
+
+    def record_source(self, path: str) -> int:
+        """Record the downloaded size; it calibrates later estimates."""
+        self.source_bytes = tree_bytes(path)
+        self.update()
+        return self.source_bytes
+
+    def update(self) -> int:
+        """Measure the scratch directory and track this session's peak."""
+        self.current_bytes = tree_bytes(self.scratch_dir)
+        self.peak_bytes = max(self.peak_bytes, self.current_bytes)
+        return self.current_bytes
+
+
+@dataclass
+class _History:
+    leases: List[Dict] = field(default_factory=list)
+    max_concurrent_seen: int = 0
+    min_free_bytes: Optional[int] = None
+
+
+class ScratchManager:
+    """
+    Admit sessions for processing only while their scratch footprint fits on disk.
+
+    Each admitted session gets a private scratch directory under ``root`` and
+    an estimated peak footprint: its advertised size (``size_bytes`` from the
+    query) or the mean downloaded size seen so far, times an expansion factor
+    learned from finished sessions. A session is admitted when fewer than
+    ``max_concurrent`` are active and its estimate fits in the free space minus
+    ``reserve_bytes`` minus what admitted sessions may still write. Until a size
+    is known, sessions run one at a time so the first download calibrates the
+    rest. Scratch directories are removed on release.
+
+    Args:
+        root (str): Scratch parent; put it on the output filesystem so outputs
+            can be hard-linked out of scratch instead of copied
+        reserve_bytes (int): Free space never handed out
+        max_concurrent (int): Upper bound on active sessions
+        expansion (float): Initial peak footprint / download size
+        poll_seconds (float): How often a waiting session re-checks free space
+    """
+
+    def __init__(
+        self,
+        root: str,
+        reserve_bytes: int = DEFAULT_RESERVE_BYTES,
+        max_concurrent: int = 4,
+        expansion: float = DEFAULT_EXPANSION,
+        poll_seconds: float = 2.0,
+    ):
+        self.root = os.path.abspath(root)
+        os.makedirs(self.root, exist_ok=True)
+        self.reserve_bytes = reserve_bytes
+        self.max_concurrent = max(1, max_concurrent)
+        self.expansion = expansion
+        self.poll_seconds = poll_seconds
+        self.active: Dict[str, Lease] = {}
+        self.free_at_start = self.free_bytes()
+        self._sources: List[int] = []
+        self._history = _History()
+        self._cond = threading.Condition()
+
+    def free_bytes(self) -> int:
+        return shutil.disk_usage(self.root).free
+
+    def estimate(self, hint: Optional[int] = None) -> Optional[int]:
+        """Expected peak bytes for a session of ``hint`` bytes (None if unknown)."""
+        source = hint
+        if not source and self._sources:
+            source = sum(self._sources) // len(self._sources)
+        return int(source * self.expansion) if source else None
+
+    def _outstanding(self) -> int:
+        # Bytes admitted sessions may still write; what they wrote is already
+        # missing from the free space
+        return sum(
+            max(0, (lease.estimate or 0) - lease.current_bytes)
+            for lease in self.active.values()
+        )
+
+    def plan(self, hints: Dict[str, Optional[int]]) -> Dict:
+        """
+        Compare the whole task's estimated footprint with the disk before starting.
+
+        Returns:
+            Dict: Free and budgeted bytes, the largest session estimate, whether
+            it fits at all, and how many average sessions fit at once
+        """
+        estimates = [e for e in (self.estimate(h) for h in hints.values()) if e]
+        budget = self.free_bytes() - self.reserve_bytes
+        largest = max(estimates) if estimates else None
+        mean = sum(estimates) / len(estimates) if estimates else None
+        return {
+            "sessions": len(hints),
+            "sessions_with_size": len(estimates),
+            "free_bytes": self.free_bytes(),
+            "budget_bytes": budget,
+            "total_estimate_bytes": sum(estimates),
+            "largest_estimate_bytes": largest,
+            "largest_fits": largest is None or largest <= budget,
+            "concurrent_capacity": (
+                min(self.max_concurrent, max(0, int(budget // mean))) if mean else None
+            ),
+        }
+
+    @contextlib.contextmanager
+    def admit(self, session_id: str, hint: Optional[int] = None):
+        """
+        Block until ``session_id`` fits, then yield its :class:`Lease`.
+
+        Raises:
+            DiskBudgetError: If the session does not fit even with nothing else
+                running
+        """
+        requested = time.perf_counter()
+        with self._cond:
+            while True:
+                estimate = self.estimate(hint)
+                budget = self.free_bytes() - self.reserve_bytes - self._outstanding()
+                if not self.active and estimate is not None and estimate > budget:
+                    raise DiskBudgetError(
+                        f"{session_id} needs ~{estimate / 1e9:.1f} GB of scratch but "
+                        f"only {budget / 1e9:.1f} GB is free under {self.root}"
+                    )
+                if len(self.active) < self.max_concurrent and (
+                    (estimate is None and not self.active)
+                    or (estimate is not None and estimate <= budget)
+                ):
+                    break
+                self._cond.wait(timeout=self.poll_seconds)
+            lease = Lease(
+                session_id=session_id,
+                scratch_dir=tempfile.mkdtemp(prefix=f"{session_id}_", dir=self.root),
+                estimate=estimate,
+                admitted_at=time.time(),
+                waited_seconds=time.perf_counter() - requested,
+            )
+            self.active[session_id] = lease
+            self._history.max_concurrent_seen = max(
+                self._history.max_concurrent_seen, len(self.active)
+            )
+        try:
+            yield lease
+        finally:
+            self._release(lease)
+
+    def _release(self, lease: Lease) -> None:
+        lease.update()
+        shutil.rmtree(lease.scratch_dir, ignore_errors=True)
+        lease.released_at = time.time()
+        with self._cond:
+            self.active.pop(lease.session_id, None)
+            if lease.source_bytes:
+                self._sources.append(lease.source_bytes)
+                observed = lease.peak_bytes / lease.source_bytes * CALIBRATION_MARGIN
+                self.expansion = max(self.expansion, observed)
+            free = self.free_bytes()
+            lowest = self._history.min_free_bytes
+            self._history.min_free_bytes = free if lowest is None else min(lowest, free)
+            self._history.leases.append(asdict(lease))
+            self._cond.notify_all()
+
+    def report(self) -> Dict:
+        """Per-session estimates, peaks and admission waits, plus disk extremes."""
+        return {
+            "root": self.root,
+            "free_at_start_bytes": self.free_at_start,
+            "free_now_bytes": self.free_bytes(),
+            "min_free_bytes": self._history.min_free_bytes,
+            "reserve_bytes": self.reserve_bytes,
+            "expansion": self.expansion,
+            "max_concurrent": self.max_concurrent,
+            "max_concurrent_seen": self._history.max_concurrent_seen,
+            "sessions": self._history.leases,
+        }
+
+    def summary(self) -> str:
+        leases = self._history.leases
+        waited = sum(lease["waited_seconds"] for lease in leases)
+        peak = max((lease["peak_bytes"] for lease in leases), default=0)
+        return (
+            f"Scratch: {len(leases)} sessions, up to {self._history.max_concurrent_seen} "
+            f"at once, largest peak {peak / 1e9:.2f} GB, {waited:.1f}s waiting for "
+            f"disk; expansion {self.expansion:.2f}, "
+            f"{(self._history.min_free_bytes or self.free_bytes()) / 1e9:.1f} GB min free"
+        )
+
+
+def parse_arguments() -> argparse.Namespace:
+    """
+    Parse command line arguments.
+
+    Returns:
+        argparse.Namespace: Parsed command line arguments
+    """
+    parser = argparse.ArgumentParser(
+        description="Check whether a task's sessions fit the local scratch disk",
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+    )
+    parser.add_argument("task_ids", nargs="+", help="Task IDs to plan")
+    parser.add_argument("--root", type=str, default="scratch", help="Scratch directory")
+    parser.add_argument(
+        "--reserve-gb", type=float, default=DEFAULT_RESERVE_BYTES / 1024**3
+    )
+    parser.add_argument("--max-concurrent", type=int, default=4, help="Session limit")
+    return parser.parse_args()
+
+
+def main() -> None:
+    """Print the admission plan for the sessions of the given tasks."""
+    args = parse_arguments()
+    from query_cache import resolve_sessions
+
+    result = resolve_sessions(args.task_ids)
+    manager = ScratchManager(
+        args.root, int(args.reserve_gb * 1024**3), args.max_concurrent
+    )
+    hints = {sid: size_hint(result.locations.get(sid)) for sid in result.session_ids}
+    print(json.dumps(manager.plan(hints), indent=2))
+
+
+if __name__ == "__main__":
+    main()
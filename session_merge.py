@@ -0,0 +1,353 @@
+#!/usr/bin/env python3
+
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+import h5py
+
+from blob_store import link_or_copy
+from content_hash import file_digest
+from timestamp_index import SIDECAR_SUFFIX
+
+SESSION_MANIFEST = "session_manifest.json"
+MERGE_MANIFEST = ".merge_manifest.json"
+TRAINING_VIEW = "training.hdf5"
+BASE_DIRS = ("hdf5", "logs", "videos")
+HDF5_SUFFIXES = (".hdf5", ".h5")
+# Rebuilt on every run with fresh provenance (e.g. the HDF5's mtime); the
+# files they are derived from are fingerprinted instead
+DERIVED_SUFFIXES = (SIDECAR_SUFFIX,)
+
+
+def _demo_names(session_dir: str) -> List[str]:
+    hdf5_path = os.path.join(session_dir, "hdf5")
+    if not os.path.isdir(hdf5_path):
+        return []
+    return sorted(
+        d
+        for d in os.listdir(hdf5_path)
+        if d.startswith("demo_") and os.path.isdir(os.path.join(hdf5_path, d))
+    )
+
+
+def _list_files(root: str) -> Dict[str, List]:
+    files = {}
+    for dirpath, _, names in os.walk(root):
+        for name in names:
+            if name == SESSION_MANIFEST:
+                continue
+            path = os.path.join(dirpath, name)
+            rel = os.path.relpath(path, root).replace(os.sep, "/")
+            files[rel] = [os.path.getsize(path), file_digest(path)]
+    return files
+
+
+def write_session_manifest(session_dir: str) -> Dict:
+    """
+    Record a processed session's demos and files (size, SHA-256) for the merge step.
+
+    Files are identified by content because every run rewrites them, so
+    their mtimes always change.
+
+    Args:
+        session_dir (str): Session output directory with ``hdf5/``, ``logs/``, ``videos/``
+
+    Returns:
+        Dict: The manifest, also written to ``<session_dir>/session_manifest.json``
+    """
+    manifest = {
+        "demos": _demo_names(session_dir),
+        "files": _list_files(session_dir),
+        "created_at": time.time(),
+    }
+    path = os.path.join(session_dir, SESSION_MANIFEST)
+    with open(path + ".tmp", "w") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(path + ".tmp", path)
+    return manifest
+
+
+def load_session_manifest(session_dir: str) -> Dict:
+    """Read a session's manifest, building it in memory for older sessions."""
+    path = os.path.join(session_dir, SESSION_MANIFEST)
+    if os.path.isfile(path):
+        with open(path, "r") as f:
+            return json.load(f)
+    return {"demos": _demo_names(session_dir), "files": _list_files(session_dir)}
+
+
+def _demo_files(manifest: Dict, demo: str) -> Dict[str, List]:
+    prefixes = tuple(f"{base}/{demo}/" for base in BASE_DIRS)
+    metadata = f"hdf5/{demo}_metadata.json"
+    return {
+        rel: state
+        for rel, state in manifest["files"].items()
+        if rel.startswith(prefixes) or rel == metadata
+    }
+
+
+def _fingerprint(files: Dict[str, List]) -> str:
+    stable = {
+        rel: state for rel, state in files.items() if not rel.endswith(DERIVED_SUFFIXES)
+    }
+    return hashlib.sha1(json.dumps(stable, sort_keys=True).encode()).hexdigest()
+
+
+def _remove_demo(merged_dir: str, demo: str) -> None:
+    # Everything _demo_files can select for this demo, so a re-merge whose
+    # file set shrank does not leave the old files behind
+    for base in BASE_DIRS:
+        shutil.rmtree(os.path.join(merged_dir, base, demo), ignore_errors=True)
+    metadata = os.path.join(merged_dir, "hdf5", f"{demo}_metadata.json")
+    if os.path.exists(metadata):
+        os.remove(metadata)
+
+
+def _demo_sort_key(demo: str) -> Tuple[int, int, str]:
+    # demo_<n> sorts numerically; any other name sorts after them by name
+    suffix = demo.rsplit("_", 1)[-1]
+    return (0, int(suffix), demo) if suffix.isdigit() else (1, 0, demo)
+
+
+@dataclass
+class MergeReport:
+    merged_dir: str
+    sessions_total: int = 0
+    demos_total: int = 0
+    demos_merged: int = 0
+    demos_skipped: int = 0
+    files_copied: int = 0
+    bytes_copied: int = 0
+    missing_sessions: List[str] = field(default_factory=list)
+    conflicts: List[str] = field(default_factory=list)
+    training_view: Optional[str] = None
+    training_view_steps: int = 0
+    seconds: float = 0.0
+
+    def to_dict(self) -> Dict:
+        return asdict(self)
+
+    def summary(self) -> str:
+        text = (
+            f"Merged {self.demos_merged}/{self.demos_total} demos from "
+            f"{self.sessions_total} sessions into {self.merged_dir} "
+            f"({self.files_copied} files, {self.bytes_copied / 1e6:.1f} MB) in "
+            f"{self.seconds:.1f}s; {self.demos_skipped} unchanged demos skipped"
+        )
+        if self.missing_sessions:
+            text += f"; {len(self.missing_sessions)} session dirs missing"
+        if self.conflicts:
+            text += f"; {len(self.conflicts)} demo name conflicts"
+        return text
+
+
+def _demo_steps(demo_dir: str) -> int:
+    for name in sorted(os.listdir(demo_dir)):
+        if name.endswith(HDF5_SUFFIXES):
+            with h5py.File(os.path.join(demo_dir, name), "r") as f:
+                if "timestamps" in f:
+                    return len(f["timestamps"])
+    return 0
+
+
+def build_training_view(merged_dir: str, merged: Dict[str, Dict]) -> str:
+    """
+    Write ``hdf5/training.hdf5`` linking every merged demo without copying it.
+
+    ``data/<demo>`` is an HDF5 external link to the root of the demo's file,
+    with paths relative to the view so the merged directory can be moved.
+    ``data`` carries ``num_demos``, ``total`` steps and ``demo_lengths`` (JSON).
+    """
+    hdf5_root = os.path.join(merged_dir, "hdf5")
+    path = os.path.join(hdf5_root, TRAINING_VIEW)
+    lengths = {}
+    with h5py.File(path + ".tmp", "w") as f:
+        data = f.create_group("data")
+        for demo in sorted(merged, key=_demo_sort_key):
+            demo_dir = os.path.join(hdf5_root, demo)
+            if not merged[demo].get("fingerprint") or not os.path.isdir(demo_dir):
+                continue
+            files = sorted(n for n in os.listdir(demo_dir) if n.endswith(HDF5_SUFFIXES))
+            if not files:
+                continue
+            data[demo] = h5py.ExternalLink(f"{demo}/{files[0]}", "/")
+            lengths[demo] = merged[demo].get("steps", 0)
+        data.attrs["num_demos"] = len(lengths)
+        data.attrs["total"] = sum(lengths.values())
+        data.attrs["demo_lengths"] = json.dumps(lengths)
+    os.replace(path + ".tmp", path)
+    return path
+
+
+def merge_sessions(
+    session_dirs: List[str], merged_dir: str, workers: int = 8
+) -> MergeReport:
+    """
+    Merge per-session outputs into one tree, copying only new or changed demos.
+
+    ``<merged_dir>/.merge_manifest.json`` remembers which session each demo came
+    from and the fingerprint (file sizes and hashes) it had, so a rerun skips
+    every demo already merged and only pays for new sessions. A demo name
+    claimed by several sessions is reported as a conflict; its previous owner
+    keeps it if still listed, otherwise the first claimant in ``session_dirs``
+    order, so the outcome does not depend on timing. Demos are copied
+    concurrently, each after removing whatever was merged for it before.
+
+    Args:
+        session_dirs (List[str]): Session output directories
+        merged_dir (str): Destination tree (created if missing)
+        workers (int): Demos copied concurrently
+
+    Returns:
+        MergeReport: Counts of merged and skipped demos plus the training view
+    """
+    start = time.perf_counter()
+    for base in BASE_DIRS:
+        os.makedirs(os.path.join(merged_dir, base), exist_ok=True)
+    manifest_path = os.path.join(merged_dir, MERGE_MANIFEST)
+    merged: Dict[str, Dict] = {}
+    if os.path.isfile(manifest_path):
+        with open(manifest_path, "r") as f:
+            merged = json.load(f)
+
+    report = MergeReport(merged_dir=merged_dir, sessions_total=len(session_dirs))
+    present = [d for d in session_dirs if os.path.isdir(d)]
+    report.missing_sessions = [d for d in session_dirs if not os.path.isdir(d)]
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        manifests = dict(zip(present, pool.map(load_session_manifest, present)))
+
+    # Decide every demo's owner up front, in session order
+    claims: Dict[str, List[str]] = {}
+    for session_dir in present:
+        for demo in manifests[session_dir]["demos"]:
+            claims.setdefault(demo, []).append(session_dir)
+    pending = []
+    for session_dir in present:
+        for demo in manifests[session_dir]["demos"]:
+            report.demos_total += 1
+            previous = merged.get(demo)
+            owners = claims[demo]
+            owner = owners[0]
+            if previous and previous["session_dir"] in owners:
+                owner = previous["session_dir"]
+            if session_dir != owner:
+                report.conflicts.append(f"{demo}: {session_dir} (kept {owner})")
+                continue
+            files = _demo_files(manifests[session_dir], demo)
+            fingerprint = _fingerprint(files)
+            if (
+                previous
+                and previous["session_dir"] == owner
+                and previous["fingerprint"] == fingerprint
+            ):
+                report.demos_skipped += 1
+                continue
+            # A failed copy leaves no fingerprint, so the next run retries it
+            merged[demo] = {"session_dir": session_dir, "fingerprint": None}
+            pending.append((session_dir, demo, files, fingerprint))
+
+    lock = threading.Lock()
+
+    def merge_one(session_dir: str, demo: str, files: Dict, fingerprint: str) -> None:
+        _remove_demo(merged_dir, demo)
+        copied = 0
+        for rel, (size, _) in files.items():
+            dst = os.path.join(merged_dir, *rel.split("/"))
+            os.makedirs(os.path.dirname(dst), exist_ok=True)
+            link_or_copy(os.path.join(session_dir, *rel.split("/")), dst)
+            copied += size
+        demo_dir = os.path.join(merged_dir, "hdf5", demo)
+        steps = _demo_steps(demo_dir) if os.path.isdir(demo_dir) else 0
+        with lock:
+            merged[demo] = {
+                "session_dir": session_dir,
+                "fingerprint": fingerprint,
+                "steps": steps,
+                "merged_at": time.time(),
+            }
+            report.demos_merged += 1
+            report.files_copied += len(files)
+            report.bytes_copied += copied
+
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            for future in [pool.submit(merge_one, *job) for job in pending]:
+                future.result()
+    finally:
+        with open(manifest_path + ".tmp", "w") as f:
+            json.dump(merged, f, indent=2)
+        os.replace(manifest_path + ".tmp", manifest_path)
+
+    report.training_view = build_training_view(merged_dir, merged)
+    report.training_view_steps = sum(entry.get("steps", 0) for entry in merged.values())
+    report.seconds = time.perf_counter() - start
+    return report
+
+
+def summarize_tree(root: str, max_entries: int = 10) -> str:
+    """
+    Describe a directory in a bounded number of lines.
+
+    Lists file counts and sizes per top-level entry (at most ``max_entries``,
+    largest first) instead of every file.
+    """
+    if not os.path.isdir(root):
+        return f"{root}: does not exist"
+    totals: Dict[str, List[int]] = {}
+    for dirpath, _, names in os.walk(root):
+        rel = os.path.relpath(dirpath, root)
+        top = "." if rel == "." else rel.split(os.sep)[0]
+        for name in names:
+            key = name if top == "." else top
+            entry = totals.setdefault(key, [0, 0])
+            entry[0] += 1
+            entry[1] += os.path.getsize(os.path.join(dirpath, name))
+    files = sum(count for count, _ in totals.values())
+    size = sum(num_bytes for _, num_bytes in totals.values())
+    lines = [f"{root}: {files} files, {size / 1e6:.1f} MB"]
+    ordered = sorted(totals.items(), key=lambda item: -item[1][1])
+    for name, (count, num_bytes) in ordered[:max_entries]:
+        lines.append(f"  {name}: {count} files, {num_bytes / 1e6:.1f} MB")
+    if len(ordered) > max_entries:
+        lines.append(f"  ... {len(ordered) - max_entries} more entries")
+    return "\n".join(lines)
+
+
+def parse_arguments() -> argparse.Namespace:
+    """
+    Parse command line arguments.
+
+    Returns:
+        argparse.Namespace: Parsed command line arguments
+    """
+    parser = argparse.ArgumentParser(
+        description="Incrementally merge session output directories",
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+    )
+    parser.add_argument("sessions", nargs="+", help="Session output directories")
+    parser.add_argument("--output", type=str, default="merged_output", help="Merged tree")
+    parser.add_argument("--workers", type=int, default=8, help="Concurrent demo copies")
+    return parser.parse_args()
+
+
+def main() -> None:
+    """Merge the given sessions and print the report."""
+    args = parse_arguments()
+    report = merge_sessions(args.sessions, args.output, args.workers)
+    print(report.summary())
+    for conflict in report.conflicts:
+        print(f"  conflict: {conflict}")
+    print(summarize_tree(args.output))
+
+
+if __name__ == "__main__":
+    main()
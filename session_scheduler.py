@@ -0,0 +1,351 @@
+#!/usr/bin/env python3
+
+import argparse
+import heapq
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass, field
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from scratch_manager import size_hint
+from training_sweep import cache_root
+
+HISTORY_ENV = "MAPLE_SCHEDULE_HISTORY"
+# Placeholder rate until a finished run calibrates it; only the predicted
+# makespan depends on it, the longest-first order does not
+DEFAULT_SECONDS_PER_GB = 60.0
+
+
+def _history_path() -> str:
+    return os.environ.get(
+        HISTORY_ENV, os.path.join(cache_root(), "maple_schedule", "history.json")
+    )
+
+
+class CostModel:
+    """
+    Estimated preprocessing seconds per session.
+
+    A session seen before costs what it took last time. Otherwise its size
+    (``size_bytes`` from the query location) is priced at the seconds per byte
+    observed over past sessions. Without a size it costs the mean estimate of
+    the others. Durations come from earlier schedule reports and from
+    ``stage_metrics.json`` records tagged with ``session_id``.
+
+    Args:
+        seconds_by_session (Optional[Dict[str, float]]): Known durations
+        sized_runs (Optional[List[Tuple[int, float]]]): ``(bytes, seconds)`` pairs
+        path (Optional[str]): History file (``$MAPLE_SCHEDULE_HISTORY``, else on
+            the shared volume, else under ``~/.cache``)
+    """
+
+    def __init__(
+        self,
+        seconds_by_session: Optional[Dict[str, float]] = None,
+        sized_runs: Optional[List[Tuple[int, float]]] = None,
+        path: Optional[str] = None,
+    ):
+        self.seconds_by_session = dict(seconds_by_session or {})
+        self.sized_runs = [tuple(run) for run in sized_runs or []]
+        self.path = path or _history_path()
+
+    @classmethod
+    def load(cls, path: Optional[str] = None) -> "CostModel":
+        """Read the history file; a missing or unreadable one is an empty model."""
+        path = path or _history_path()
+        try:
+            with open(path, "r") as f:
+                history = json.load(f)
+        except (OSError, ValueError):
+            history = {}
+        return cls(history.get("seconds_by_session"), history.get("sized_runs"), path)
+
+    def save(self) -> None:
+        history = {
+            "seconds_by_session": self.seconds_by_session,
+            # Only recent runs, so the rate follows the current pipeline
+            "sized_runs": self.sized_runs[-500:],
+        }
+        try:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            with open(self.path + ".tmp", "w") as f:
+                json.dump(history, f, indent=2)
+            os.replace(self.path + ".tmp", self.path)
+        except OSError as e:
+            print(f"Warning: could not write schedule history: {e}")
+
+    @property
+    def seconds_per_byte(self) -> Optional[float]:
+        sized = [(b, s) for b, s in self.sized_runs if b > 0]
+        if not sized:
+            return None
+        return sum(s for _, s in sized) / sum(b for b, _ in sized)
+
+    def add_stage_report(self, report: Dict) -> int:
+        """
+        Learn session durations from a ``stage_metrics.json`` report.
+
+        Returns:
+            int: Sessions learned
+        """
+        totals: Dict[str, float] = {}
+        for record in report.get("stages", []):
+            session_id = record.get("tags", {}).get("session_id")
+            if session_id:
+                totals[session_id] = totals.get(session_id, 0.0) + record["wall_seconds"]
+        self.seconds_by_session.update(totals)
+        return len(totals)
+
+    def add_schedule_report(self, report: Dict) -> None:
+        """Learn from the sessions a :class:`SessionScheduler` run completed."""
+        for entry in report["sessions"]:
+            if entry["actual_seconds"] is None or entry["error"]:
+                continue
+            self.seconds_by_session[entry["session_id"]] = entry["actual_seconds"]
+            if entry["size_bytes"]:
+                self.sized_runs.append((entry["size_bytes"], entry["actual_seconds"]))
+
+    def estimate(
+        self, sizes: Dict[str, Optional[int]]
+    ) -> Dict[str, Tuple[float, str]]:
+        """
+        Estimate every session's seconds.
+
+        Returns:
+            Dict[str, Tuple[float, str]]: ``(seconds, source)`` per session, where
+            source is ``history``, ``size``, ``size_default_rate`` or ``mean``
+        """
+        rate = self.seconds_per_byte
+        estimates: Dict[str, Tuple[float, str]] = {}
+        for session_id, size in sizes.items():
+            if session_id in self.seconds_by_session:
+                estimates[session_id] = (self.seconds_by_session[session_id], "history")
+            elif size and rate is not None:
+                estimates[session_id] = (size * rate, "size")
+            elif size:
+                estimates[session_id] = (
+                    size / 1e9 * DEFAULT_SECONDS_PER_GB,
+                    "size_default_rate",
+                )
+        known = [seconds for seconds, _ in estimates.values()]
+        fallback = sum(known) / len(known) if known else DEFAULT_SECONDS_PER_GB
+        for session_id in sizes:
+            estimates.setdefault(session_id, (fallback, "mean"))
+        return estimates
+
+
+def simulate(order: Sequence[str], costs: Dict[str, float], workers: int) -> Dict:
+    """
+    Predict a run that hands ``order`` out to ``workers`` as workers free up.
+
+    Returns:
+        Dict: ``makespan`` and per-session ``start``/``finish`` offsets in seconds
+    """
+    free = [(0.0, worker) for worker in range(max(1, workers))]
+    starts, finishes = {}, {}
+    for session_id in order:
+        available, worker = heapq.heappop(free)
+        starts[session_id] = available
+        finishes[session_id] = available + costs[session_id]
+        heapq.heappush(free, (finishes[session_id], worker))
+    return {
+        "makespan": max(finishes.values(), default=0.0),
+        "start": starts,
+        "finish": finishes,
+    }
+
+
+@dataclass
+class ScheduledSession:
+    session_id: str
+    rank: int
+    size_bytes: Optional[int]
+    estimate_seconds: float
+    estimate_source: str
+    predicted_start: float
+    predicted_finish: float
+    actual_start: Optional[float] = None
+    actual_seconds: Optional[float] = None
+    waited_seconds: float = 0.0
+    error: Optional[str] = None
+
+
+@dataclass
+class ScheduleReport:
+    workers: int
+    predicted_makespan: float
+    arrival_order_makespan: float
+    actual_makespan: float = 0.0
+    sessions: List[ScheduledSession] = field(default_factory=list)
+
+    def to_dict(self) -> Dict:
+        return asdict(self)
+
+    def summary(self) -> str:
+        finished = [s for s in self.sessions if s.actual_seconds is not None]
+        estimated = sum(s.estimate_seconds for s in finished)
+        actual = sum(s.actual_seconds for s in finished)
+        lines = [
+            f"Schedule: {len(self.sessions)} sessions longest-first on "
+            f"{self.workers} workers; makespan predicted "
+            f"{self.predicted_makespan:.1f}s (arrival order "
+            f"{self.arrival_order_makespan:.1f}s), actual {self.actual_makespan:.1f}s",
+            f"  session time estimated {estimated:.1f}s, actual {actual:.1f}s "
+            f"(excluding {sum(s.waited_seconds for s in finished):.1f}s blocked)",
+        ]
+        for s in self.sessions[:10]:
+            actual_text = "-" if s.actual_seconds is None else f"{s.actual_seconds:.1f}s"
+            lines.append(
+                f"  {s.rank:3d} {s.session_id[:36]:36s} est {s.estimate_seconds:8.1f}s "
+                f"({s.estimate_source}), actual {actual_text}"
+            )
+        if len(self.sessions) > 10:
+            lines.append(f"  ... {len(self.sessions) - 10} more")
+        return "\n".join(lines)
+
+
+class SessionScheduler:
+    """
+    Run per-session work largest-estimated-first on a thread pool.
+
+    Sessions are submitted in descending estimated cost, so the pool's FIFO
+    queue hands the longest ones out first and short ones fill the tail
+    (longest-processing-time list scheduling). Results come back in the
+    caller's order, like ``pool.map``. Time ``fn`` reports with
+    :meth:`add_wait` (blocked on disk admission, shared checks) is left out
+    of the session's ``actual_seconds``, which is what later runs learn.
+
+    Args:
+        model (CostModel): Cost estimates
+        workers (int): Pool size
+    """
+
+    def __init__(self, model: CostModel, workers: int):
+        self.model = model
+        self.workers = max(1, workers)
+        self._report: Optional[ScheduleReport] = None
+        self._entries: Dict[str, ScheduledSession] = {}
+
+    def plan(
+        self, session_ids: Sequence[str], sizes: Optional[Dict[str, Optional[int]]] = None
+    ) -> ScheduleReport:
+        """Order the sessions and predict the makespan; nothing runs."""
+        sizes = {sid: (sizes or {}).get(sid) for sid in session_ids}
+        estimates = self.model.estimate(sizes)
+        costs = {sid: seconds for sid, (seconds, _) in estimates.items()}
+        arrival = list(dict.fromkeys(session_ids))
+        # Stable sort keeps the arrival order among equal estimates
+        order = sorted(arrival, key=lambda sid: -costs[sid])
+        predicted = simulate(order, costs, self.workers)
+        report = ScheduleReport(
+            workers=self.workers,
+            predicted_makespan=predicted["makespan"],
+            arrival_order_makespan=simulate(arrival, costs, self.workers)["makespan"],
+        )
+        for rank, session_id in enumerate(order):
+            report.sessions.append(
+                ScheduledSession(
+                    session_id=session_id,
+                    rank=rank,
+                    size_bytes=sizes[session_id],
+                    estimate_seconds=costs[session_id],
+                    estimate_source=estimates[session_id][1],
+                    predicted_start=predicted["start"][session_id],
+                    predicted_finish=predicted["finish"][session_id],
+                )
+            )
+        return report
+
+    def run(
+        self,
+        fn: Callable[[str], object],
+        session_ids: Sequence[str],
+        sizes: Optional[Dict[str, Optional[int]]] = None,
+    ) -> List:
+        """
+        Call ``fn(session_id)`` for every session, longest first.
+
+        Returns:
+            List: ``fn``'s results in the order of ``session_ids``
+
+        Raises:
+            Exception: The first failure, after every session has finished
+        """
+        report = self.plan(session_ids, sizes)
+        self._report = report
+        self._entries = entries = {entry.session_id: entry for entry in report.sessions}
+        started = time.perf_counter()
+
+        def timed(session_id: str):
+            entry = entries[session_id]
+            entry.actual_start = time.perf_counter() - started
+            try:
+                return fn(session_id)
+            except Exception as e:
+                entry.error = f"{type(e).__name__}: {e}"
+                raise
+            finally:
+                elapsed = time.perf_counter() - started - entry.actual_start
+                entry.actual_seconds = max(elapsed - entry.waited_seconds, 0.0)
+
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            futures = {
+                entry.session_id: pool.submit(timed, entry.session_id)
+                for entry in report.sessions
+            }
+            for future in futures.values():
+                future.exception()
+        report.actual_makespan = time.perf_counter() - started
+        return [futures[session_id].result() for session_id in session_ids]
+
+    def add_wait(self, session_id: str, seconds: float) -> None:
+        """From inside ``fn``: exclude ``seconds`` spent blocked from the session."""
+        self._entries[session_id].waited_seconds += seconds
+
+    def report(self) -> Dict:
+        return self._report.to_dict() if self._report else {}
+
+    def summary(self) -> str:
+        return self._report.summary() if self._report else "Schedule: nothing ran"
+
+
+def parse_arguments() -> argparse.Namespace:
+    """
+    Parse command line arguments.
+
+    Returns:
+        argparse.Namespace: Parsed command line arguments
+    """
+    parser = argparse.ArgumentParser(
+        description="Plan longest-first processing of a task's sessions",
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+    )
+    parser.add_argument("task_ids", nargs="+", help="Task IDs to plan")
+    parser.add_argument("--workers", type=int, default=4, help="Concurrent sessions")
+    parser.add_argument(
+        "--stage-report",
+        action="append",
+        default=[],
+        help="stage_metrics.json from an earlier run (repeatable)",
+    )
+    return parser.parse_args()
+
+
+def main() -> None:
+    """Print the longest-first order and predicted makespan for the given tasks."""
+    args = parse_arguments()
+    from query_cache import resolve_sessions
+
+    result = resolve_sessions(args.task_ids)
+    model = CostModel.load()
+    for path in args.stage_report:
+        with open(path, "r") as f:
+            print(f"Learned {model.add_stage_report(json.load(f))} sessions from {path}")
+    sizes = {sid: size_hint(result.locations.get(sid)) for sid in result.session_ids}
+    print(SessionScheduler(model, args.workers).plan(result.session_ids, sizes).summary())
+
+
+if __name__ == "__main__":
+    main()
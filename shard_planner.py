@@ -0,0 +1,396 @@
+#!/usr/bin/env python3
+
+import argparse
+import heapq
+import json
+import multiprocessing as mp
+import os
+import shutil
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional
+
+import h5py
+import numpy as np
+
+from episode_buffer import demo_names, episode_keys
+
+MANIFEST_FILE = "shards.json"
+FORMAT_VERSION = 1
+MODES = ("link", "copy")
+
+
+@dataclass
+class EpisodeInfo:
+    demo: str
+    frames: int
+    bytes: int
+
+
+def scan_episodes(hdf5_path: Path) -> List[EpisodeInfo]:
+    """Frame count and stored bytes (after compression) of every episode."""
+    episodes = []
+    with h5py.File(hdf5_path, "r") as f:
+        data = f["data"]
+        demos = demo_names(data)
+        if not demos:
+            raise ValueError(f"No demo_* groups found in {hdf5_path}")
+        keys = episode_keys(data[demos[0]])
+        for demo in demos:
+            group = data[demo]
+            stored = sum(group[key].id.get_storage_size() for key in keys if key in group)
+            episodes.append(EpisodeInfo(demo, len(group[keys[0]]), int(stored)))
+    return episodes
+
+
+def plan_shards(episodes: List[EpisodeInfo], num_shards: int) -> List[List[EpisodeInfo]]:
+    """
+    Partition episodes into ``num_shards`` shards balanced by frames and bytes.
+
+    Longest-processing-time greedy: episodes are taken largest first and each
+    goes to the shard with the least load so far, where an episode's load is
+    its share of all frames plus its share of all bytes. Within a shard the
+    original episode order is kept.
+
+    Returns:
+        List[List[EpisodeInfo]]: Episodes per shard
+    """
+    if num_shards < 1:
+        raise ValueError("num_shards must be at least 1")
+    if num_shards > len(episodes):
+        raise ValueError(f"{num_shards} shards for only {len(episodes)} episodes")
+    total_frames = max(sum(e.frames for e in episodes), 1)
+    total_bytes = max(sum(e.bytes for e in episodes), 1)
+
+    def load(episode: EpisodeInfo) -> float:
+        return episode.frames / total_frames + episode.bytes / total_bytes
+
+    position = {e.demo: i for i, e in enumerate(episodes)}
+    heap = [(0.0, shard) for shard in range(num_shards)]
+    shards: List[List[EpisodeInfo]] = [[] for _ in range(num_shards)]
+    for episode in sorted(episodes, key=load, reverse=True):
+        current, shard = heapq.heappop(heap)
+        shards[shard].append(episode)
+        heapq.heappush(heap, (current + load(episode), shard))
+    return [sorted(shard, key=lambda e: position[e.demo]) for shard in shards]
+
+
+def _imbalance(values: List[int]) -> float:
+    mean = sum(values) / len(values)
+    return max(values) / mean if mean else 1.0
+
+
+def write_shards(
+    hdf5_path: Path, output_dir: Path, num_shards: int, mode: str = "link"
+) -> Dict:
+    """
+    Write ``num_shards`` shard files of a converted dataset and their manifest.
+
+    ``link`` shards are small HDF5 files whose ``data/demo_N`` entries are
+    external links into the source (relative, so the pair can be moved
+    together); ``copy`` shards hold their episodes' datasets, copied chunk for
+    chunk without recompression, so they can live on another disk. Either way a
+    reader of one shard only touches its own episodes' chunks.
+
+    Args:
+        hdf5_path (Path): Converted dataset (``training_data.hdf5``)
+        output_dir (Path): Directory for ``shard_NNN.hdf5`` and ``shards.json``
+        num_shards (int): Number of shards
+        mode (str): ``link`` or ``copy``
+
+    Returns:
+        Dict: The manifest
+    """
+    if mode not in MODES:
+        raise ValueError(f"Unknown shard mode {mode!r}; use one of {MODES}")
+    hdf5_path = Path(hdf5_path)
+    output_dir = Path(output_dir)
+    shards = plan_shards(scan_episodes(hdf5_path), num_shards)
+
+    staging = output_dir.with_name(output_dir.name + ".partial")
+    shutil.rmtree(staging, ignore_errors=True)
+    staging.mkdir(parents=True)
+    # Links are resolved against the shard's own directory once it is in place
+    source_link = os.path.relpath(hdf5_path.resolve(), output_dir.resolve())
+
+    entries = []
+    with h5py.File(hdf5_path, "r") as src:
+        for index, episodes in enumerate(shards):
+            name = f"shard_{index:03d}.hdf5"
+            with h5py.File(staging / name, "w") as dst:
+                data = dst.create_group("data")
+                for key, value in src["data"].attrs.items():
+                    data.attrs[key] = value
+                for episode in episodes:
+                    if mode == "link":
+                        data[episode.demo] = h5py.ExternalLink(
+                            source_link, f"/data/{episode.demo}"
+                        )
+                    else:
+                        src.copy(src["data"][episode.demo], data, name=episode.demo)
+                data.attrs["total"] = sum(e.frames for e in episodes)
+                data.attrs["num_demos"] = len(episodes)
+            entries.append(
+                {
+                    "file": name,
+                    "demos": [e.demo for e in episodes],
+                    "frames": sum(e.frames for e in episodes),
+                    "bytes": sum(e.bytes for e in episodes),
+                }
+            )
+
+    manifest = {
+        "format_version": FORMAT_VERSION,
+        "source": source_link,
+        "mode": mode,
+        "num_shards": num_shards,
+        "frame_imbalance": _imbalance([s["frames"] for s in entries]),
+        "byte_imbalance": _imbalance([s["bytes"] for s in entries]),
+        "shards": entries,
+    }
+    with open(staging / MANIFEST_FILE, "w") as f:
+        json.dump(manifest, f, indent=2)
+    shutil.rmtree(output_dir, ignore_errors=True)
+    os.rename(staging, output_dir)
+    return manifest
+
+
+def load_manifest(directory: Path) -> Dict:
+    with open(Path(directory) / MANIFEST_FILE, "r") as f:
+        manifest = json.load(f)
+    if manifest.get("format_version") != FORMAT_VERSION:
+        raise ValueError(f"Unsupported shard format {manifest.get('format_version')}")
+    return manifest
+
+
+class ShardSampler:
+    """
+    Sampler and reader for one rank's shards of a :func:`write_shards` directory.
+
+    Rank ``r`` of ``world_size`` owns shards ``r, r + world_size, ...``;
+    ``world_size`` defaults to the number of shards, one shard per rank. Only
+    the owned shard files are opened, lazily, so each dataloader process or
+    GPU reads its own episodes and nothing else.
+
+    Args:
+        directory (Path): Shard directory with ``shards.json``
+        rank (int): This reader's rank
+        world_size (Optional[int]): Number of readers
+        seed (int): Shuffle seed; combined with the epoch
+    """
+
+    def __init__(
+        self,
+        directory: Path,
+        rank: int,
+        world_size: Optional[int] = None,
+        seed: int = 0,
+    ):
+        self.directory = Path(directory)
+        self.manifest = load_manifest(self.directory)
+        world_size = world_size or self.manifest["num_shards"]
+        if not 0 <= rank < world_size:
+            raise ValueError(f"rank {rank} outside world size {world_size}")
+        if world_size > self.manifest["num_shards"]:
+            raise ValueError(
+                f"{world_size} readers but only {self.manifest['num_shards']} shards"
+            )
+        self.shards = self.manifest["shards"][rank::world_size]
+        self.seed = seed
+        self.epoch = 0
+        self._files: Dict[str, h5py.File] = {}
+        self._groups: Dict[int, h5py.Group] = {}
+        self._episodes = [(s["file"], demo) for s in self.shards for demo in s["demos"]]
+        self.episode_ends = np.zeros(len(self._episodes), dtype=np.int64)
+        self._keys: Optional[List[str]] = None
+
+    def _file(self, name: str) -> h5py.File:
+        if name not in self._files:
+            self._files[name] = h5py.File(self.directory / name, "r")
+        return self._files[name]
+
+    def _group(self, episode: int) -> h5py.Group:
+        # Resolving an external link reopens the target, so keep the groups
+        if episode not in self._groups:
+            name, demo = self._episodes[episode]
+            self._groups[episode] = self._file(name)["data"][demo]
+        return self._groups[episode]
+
+    def _index(self) -> None:
+        if self._keys is not None:
+            return
+        self._keys = episode_keys(self._group(0)) if self._episodes else []
+        lengths = [len(self._group(i)[self._keys[0]]) for i in range(len(self._episodes))]
+        self.episode_ends = np.cumsum(lengths, dtype=np.int64)
+
+    @property
+    def keys(self) -> List[str]:
+        self._index()
+        return list(self._keys)
+
+    @property
+    def num_steps(self) -> int:
+        self._index()
+        return int(self.episode_ends[-1]) if len(self.episode_ends) else 0
+
+    def __len__(self) -> int:
+        return self.num_steps
+
+    def set_epoch(self, epoch: int) -> None:
+        self.epoch = epoch
+
+    def __iter__(self) -> Iterator[int]:
+        """This rank's step indices, shuffled per epoch."""
+        rng = np.random.default_rng((self.seed, self.epoch))
+        return iter(rng.permutation(self.num_steps).tolist())
+
+    def sample(
+        self, index: int, horizon: int, keys: Optional[List[str]] = None
+    ) -> Dict[str, np.ndarray]:
+        """
+        Return a ``horizon``-step window starting at a local step index.
+
+        Windows never cross an episode end; the last step is repeated instead,
+        as in :meth:`episode_buffer.SharedEpisodeBuffer.sample`.
+        """
+        self._index()
+        episode = int(np.searchsorted(self.episode_ends, index, side="right"))
+        start = int(self.episode_ends[episode - 1]) if episode > 0 else 0
+        local = index - start
+        group = self._group(episode)
+        result = {}
+        for key in keys or self._keys:
+            window = group[key][local : local + horizon]
+            if len(window) < horizon:
+                pad = np.repeat(window[-1:], horizon - len(window), axis=0)
+                window = np.concatenate([window, pad])
+            result[key] = window
+        return result
+
+    def close(self) -> None:
+        self._groups.clear()
+        for f in self._files.values():
+            f.close()
+        self._files.clear()
+
+
+def _sharded_worker(args) -> int:
+    directory, rank, world_size, samples, horizon = args
+    sampler = ShardSampler(directory, rank, world_size, seed=rank)
+    rng = np.random.default_rng(rank)
+    for index in rng.integers(0, sampler.num_steps, size=samples):
+        sampler.sample(int(index), horizon)
+    sampler.close()
+    return samples
+
+
+def _monolithic_worker(args) -> int:
+    hdf5_path, rank, samples, horizon = args
+    with h5py.File(hdf5_path, "r") as f:
+        data = f["data"]
+        demos = demo_names(data)
+        keys = episode_keys(data[demos[0]])
+        ends = np.cumsum([len(data[d][keys[0]]) for d in demos])
+        rng = np.random.default_rng(rank)
+        for index in rng.integers(0, int(ends[-1]), size=samples):
+            episode = int(np.searchsorted(ends, index, side="right"))
+            local = int(index) - (int(ends[episode - 1]) if episode > 0 else 0)
+            for key in keys:
+                data[demos[episode]][key][local : local + horizon]
+    return samples
+
+
+def benchmark(
+    directory: Path, max_readers: int, samples: int, horizon: int
+) -> List[Dict]:
+    """
+    Read throughput with 1..``max_readers`` processes, sharded vs one file.
+
+    Each reader gets ``samples // readers`` random windows. Sharded readers
+    draw only from the shards they own; monolithic readers draw from the whole
+    source, so every process touches every chunk.
+
+    Returns:
+        List[Dict]: Samples per second for each reader count and layout
+    """
+    directory = Path(directory)
+    manifest = load_manifest(directory)
+    source = str((directory / manifest["source"]).resolve())
+    max_readers = min(max_readers, manifest["num_shards"])
+    ctx = mp.get_context("spawn")
+    results = []
+    for readers in range(1, max_readers + 1):
+        per_reader = max(1, samples // readers)
+        row = {"readers": readers}
+        for layout, worker, jobs in (
+            (
+                "sharded",
+                _sharded_worker,
+                [
+                    (str(directory), r, readers, per_reader, horizon)
+                    for r in range(readers)
+                ],
+            ),
+            (
+                "monolithic",
+                _monolithic_worker,
+                [(source, r, per_reader, horizon) for r in range(readers)],
+            ),
+        ):
+            with ctx.Pool(readers) as pool:
+                start = time.perf_counter()
+                done = sum(pool.map(worker, jobs))
+                elapsed = time.perf_counter() - start
+            row[f"{layout}_samples_per_sec"] = done / max(elapsed, 1e-9)
+        results.append(row)
+    return results
+
+
+def parse_arguments() -> argparse.Namespace:
+    """
+    Parse command line arguments.
+
+    Returns:
+        argparse.Namespace: Parsed command line arguments
+    """
+    parser = argparse.ArgumentParser(
+        description="Split training_data.hdf5 into balanced episode shards",
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+    )
+    parser.add_argument("dataset", type=Path, help="Converted training_data.hdf5")
+    parser.add_argument("output", type=Path, help="Shard directory")
+    parser.add_argument("--shards", type=int, default=4, help="Number of shards")
+    parser.add_argument("--mode", choices=MODES, default="link", help="Shard file kind")
+    parser.add_argument(
+        "--benchmark", action="store_true", help="Time 1..N reader processes"
+    )
+    parser.add_argument("--samples", type=int, default=20000, help="Windows per run")
+    parser.add_argument("--horizon", type=int, default=16, help="Steps per window")
+    return parser.parse_args()
+
+
+def main() -> None:
+    """Write the shards, print their balance and optionally benchmark readers."""
+    args = parse_arguments()
+    manifest = write_shards(args.dataset, args.output, args.shards, args.mode)
+    for shard in manifest["shards"]:
+        print(
+            f"{shard['file']}: {len(shard['demos'])} episodes, {shard['frames']} frames, "
+            f"{shard['bytes'] / 1e6:.1f} MB"
+        )
+    print(
+        f"Imbalance (max / mean): frames {manifest['frame_imbalance']:.3f}, "
+        f"bytes {manifest['byte_imbalance']:.3f}"
+    )
+    if args.benchmark:
+        for row in benchmark(args.output, args.shards, args.samples, args.horizon):
+            print(
+                f"{row['readers']} reader(s): sharded "
+                f"{row['sharded_samples_per_sec']:.0f} samples/s, monolithic "
+                f"{row['monolithic_samples_per_sec']:.0f} samples/s"
+            )
+
+
+if __name__ == "__main__":
+    main()
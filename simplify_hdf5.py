@@ -4,12 +4,18 @@ import numpy as np
 from pathlib import Path
 
 
-def simplify_hdf5(input_path: str, output_path: str):
+def simplify_hdf5(input_path: str, output_path: str, encode_depth: bool = False):
     """
     Simplify HDF5 file by removing specific fields and adding new ones.
     Also rename fields by removing '_rgb' from camera data fields.
+    With ``encode_depth``, raw camera depth frames are stored with the
+    lossless depth codec (see depth_codec.py); FrameStore decodes either.
     """
+    if encode_depth:
+        from depth_codec import depth_dataset_keys, encode_dataset
+
     with h5py.File(input_path, "r") as src, h5py.File(output_path, "w") as dst:
+        depth_keys = depth_dataset_keys(src) if encode_depth else []
         # Fields to skip
         skip_fields = [
             "workspace_t_camera0_color_optical_frame",
@@ -26,6 +32,10 @@ def simplify_hdf5(input_path: str, output_path: str):
             new_key = key.replace("_rgb_", "_")
 
             # Copy the dataset
+            if key in depth_keys:
+                raw, encoded = encode_dataset(src[key], dst, new_key)
+                print(f"{key}: {raw / 1e6:.1f} MB -> {encoded / 1e6:.1f} MB")
+                continue
             dst.create_dataset(new_key, data=src[key])
 
         # Add new empty fields
@@ -52,6 +62,11 @@ def main():
         type=str,
         help="Output HDF5 file path (default: input file with _simplified suffix)",
     )
+    parser.add_argument(
+        "--encode-depth",
+        action="store_true",
+        help="Store camera depth frames with the lossless depth codec",
+    )
 
     args = parser.parse_args()
 
@@ -64,7 +79,7 @@ def main():
             input_path.parent / f"{input_path.stem}_simplified{input_path.suffix}"
         )
 
-    simplify_hdf5(args.input, output_path)
+    simplify_hdf5(args.input, output_path, args.encode_depth)
     print(f"Simplified HDF5 file saved to: {output_path}")
 
 
@@ -0,0 +1,318 @@
+#!/usr/bin/env python3
+
+import argparse
+import contextlib
+import functools
+import json
+import os
+import resource
+import sys
+import threading
+import time
+from dataclasses import asdict, dataclass, field
+from typing import Callable, Dict, List, Optional, Tuple
+
+REPORT_NAME = "stage_metrics.json"
+_IO_FIELDS = ("rchar", "wchar", "read_bytes", "write_bytes")
+
+
+def _read_proc_io(scope: str = "self") -> Optional[Dict[str, int]]:
+    # "self" includes reaped children, so subprocess stages are counted too;
+    # "thread-self" is the calling thread only (Linux >= 3.17)
+    try:
+        with open(f"/proc/{scope}/io", "r") as f:
+            values = dict(line.split(":", 1) for line in f if ":" in line)
+        return {key: int(values[key]) for key in _IO_FIELDS}
+    except (OSError, KeyError, ValueError):
+        return None
+
+
+def _read_hwm_kb() -> Optional[int]:
+    try:
+        with open("/proc/self/status", "r") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return None
+
+
+def _reset_hwm() -> bool:
+    # Writing 5 to clear_refs resets VmHWM to the current RSS (Linux >= 4.0)
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+        return True
+    except OSError:
+        return False
+
+
+def _maxrss_kb(who: int) -> int:
+    kb = resource.getrusage(who).ru_maxrss
+    return kb // 1024 if sys.platform == "darwin" else kb
+
+
+def _cpu_seconds(who: int) -> float:
+    usage = resource.getrusage(who)
+    return usage.ru_utime + usage.ru_stime
+
+
+# Linux only; elsewhere an overlapped stage's CPU time stays process-wide
+_RUSAGE_THREAD = getattr(resource, "RUSAGE_THREAD", resource.RUSAGE_SELF)
+
+
+@dataclass
+class StageRecord:
+    name: str
+    tags: Dict[str, str] = field(default_factory=dict)
+    depth: int = 0
+    started_at: float = 0.0
+    wall_seconds: float = 0.0
+    cpu_seconds: float = 0.0
+    child_cpu_seconds: Optional[float] = 0.0
+    read_bytes: Optional[int] = None
+    write_bytes: Optional[int] = None
+    read_chars: Optional[int] = None
+    write_chars: Optional[int] = None
+    peak_rss_mb: Optional[float] = 0.0
+    child_peak_rss_mb: Optional[float] = None
+    overlapped: bool = False
+    error: Optional[str] = None
+
+
+class StageRecorder:
+    """
+    Records wall time, CPU time, I/O bytes and peak RSS per pipeline stage.
+
+    Use :meth:`stage` as a context manager or :meth:`instrument` as a
+    decorator. Stages may nest within a thread; each nested record also counts
+    towards its parents. Counters are per process, so work done by helper
+    threads and subprocesses a stage starts is included.
+    ``read_bytes``/``write_bytes`` are storage I/O; ``read_chars``/
+    ``write_chars`` include page-cache hits and sockets.
+
+    A stage that is open at the same time as a stage in another thread is
+    marked ``overlapped``: its CPU time and I/O are then those of its own
+    thread only (Linux), and peak RSS and the children's figures, which
+    cannot be split between threads, are left out (``None``).
+
+    Peak RSS is reset at the start of every stage when the kernel allows it
+    and no other thread has a stage open, so it is the stage's own
+    high-water mark; otherwise it is the process's lifetime peak.
+    ``child_peak_rss_mb`` is set when a subprocess that finished during the
+    stage raised the children's high-water mark.
+    """
+
+    def __init__(self):
+        self.records: List[StageRecord] = []
+        # (record, thread ident) of every open stage, in opening order
+        self._open: List[Tuple[StageRecord, int]] = []
+        self._lock = threading.Lock()
+
+    def _update_peaks(self) -> None:
+        hwm_kb = _read_hwm_kb()
+        if hwm_kb is None:
+            hwm_kb = _maxrss_kb(resource.RUSAGE_SELF)
+        for record, _ in self._open:
+            if not record.overlapped:
+                record.peak_rss_mb = max(record.peak_rss_mb, hwm_kb / 1024)
+
+    @contextlib.contextmanager
+    def stage(self, name: str, **tags):
+        """Measure the enclosed block as stage ``name`` with optional string tags."""
+        record = StageRecord(
+            name=name,
+            tags={k: str(v) for k, v in tags.items()},
+            started_at=time.time(),
+        )
+        thread = threading.get_ident()
+        with self._lock:
+            self._update_peaks()
+            others = [r for r, ident in self._open if ident != thread]
+            record.depth = len(self._open) - len(others)
+            for other in others:
+                other.overlapped = True
+            record.overlapped = bool(others)
+            self._open.append((record, thread))
+            self.records.append(record)
+            if not others:
+                _reset_hwm()
+
+        io_start = {scope: _read_proc_io(scope) for scope in ("self", "thread-self")}
+        cpu_start = {
+            who: _cpu_seconds(who) for who in (resource.RUSAGE_SELF, _RUSAGE_THREAD)
+        }
+        child_cpu_start = _cpu_seconds(resource.RUSAGE_CHILDREN)
+        child_rss_start = _maxrss_kb(resource.RUSAGE_CHILDREN)
+        wall_start = time.perf_counter()
+        try:
+            yield record
+        except BaseException as e:
+            record.error = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            record.wall_seconds = time.perf_counter() - wall_start
+            with self._lock:
+                self._update_peaks()
+                self._open.remove((record, thread))
+                overlapped = record.overlapped
+            who = _RUSAGE_THREAD if overlapped else resource.RUSAGE_SELF
+            record.cpu_seconds = _cpu_seconds(who) - cpu_start[who]
+            scope = "thread-self" if overlapped else "self"
+            io_end = _read_proc_io(scope)
+            if io_start[scope] and io_end:
+                io = {key: io_end[key] - io_start[scope][key] for key in _IO_FIELDS}
+                record.read_bytes = io["read_bytes"]
+                record.write_bytes = io["write_bytes"]
+                record.read_chars = io["rchar"]
+                record.write_chars = io["wchar"]
+            if overlapped:
+                record.child_cpu_seconds = None
+                record.peak_rss_mb = None
+            else:
+                record.child_cpu_seconds = (
+                    _cpu_seconds(resource.RUSAGE_CHILDREN) - child_cpu_start
+                )
+                child_rss = _maxrss_kb(resource.RUSAGE_CHILDREN)
+                if child_rss > child_rss_start:
+                    record.child_peak_rss_mb = child_rss / 1024
+
+    def instrument(self, name: Optional[str] = None, **tags) -> Callable:
+        """Decorator form of :meth:`stage`; the stage name defaults to the function's."""
+
+        def decorator(fn):
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                with self.stage(name or fn.__name__, **tags):
+                    return fn(*args, **kwargs)
+
+            return wrapper
+
+        return decorator
+
+    def totals(self) -> Dict[str, Dict]:
+        """Sum the records of each stage name (peaks are maxima)."""
+        totals: Dict[str, Dict] = {}
+        for record in self.records:
+            entry = totals.setdefault(
+                record.name,
+                {
+                    "count": 0,
+                    "wall_seconds": 0.0,
+                    "cpu_seconds": 0.0,
+                    "child_cpu_seconds": 0.0,
+                    "read_bytes": 0,
+                    "write_bytes": 0,
+                    "peak_rss_mb": 0.0,
+                    "errors": 0,
+                },
+            )
+            entry["count"] += 1
+            entry["wall_seconds"] += record.wall_seconds
+            entry["cpu_seconds"] += record.cpu_seconds
+            entry["child_cpu_seconds"] += record.child_cpu_seconds or 0
+            entry["read_bytes"] += record.read_bytes or 0
+            entry["write_bytes"] += record.write_bytes or 0
+            entry["peak_rss_mb"] = max(
+                entry["peak_rss_mb"],
+                record.peak_rss_mb or 0,
+                record.child_peak_rss_mb or 0,
+            )
+            entry["errors"] += record.error is not None
+        return totals
+
+    def to_dict(self) -> Dict:
+        return {
+            "stages": [asdict(record) for record in self.records],
+            "totals": self.totals(),
+        }
+
+    def summary(self) -> str:
+        lines = [
+            f"{'stage':28s} {'n':>4s} {'wall s':>9s} {'cpu s':>9s} "
+            f"{'read MB':>9s} {'write MB':>9s} {'peak MB':>9s}"
+        ]
+        for name, entry in self.totals().items():
+            lines.append(
+                f"{name[:28]:28s} {entry['count']:4d} {entry['wall_seconds']:9.2f} "
+                f"{entry['cpu_seconds'] + entry['child_cpu_seconds']:9.2f} "
+                f"{entry['read_bytes'] / 1e6:9.1f} {entry['write_bytes'] / 1e6:9.1f} "
+                f"{entry['peak_rss_mb']:9.0f}"
+            )
+        return "\n".join(lines)
+
+    def write_json(self, path: str, **metadata) -> str:
+        """Write the records, totals and any ``metadata`` to ``path``."""
+        report = dict(metadata, created_at=time.time(), **self.to_dict())
+        with open(path + ".tmp", "w") as f:
+            json.dump(report, f, indent=2)
+        os.replace(path + ".tmp", path)
+        return path
+
+
+_default_recorder = StageRecorder()
+
+
+def default_recorder() -> StageRecorder:
+    """The process-wide recorder used by :func:`stage` and :func:`instrument`."""
+    return _default_recorder
+
+
+def stage(name: str, **tags):
+    return _default_recorder.stage(name, **tags)
+
+
+def instrument(name: Optional[str] = None, **tags) -> Callable:
+    return _default_recorder.instrument(name, **tags)
+
+
+def compare_reports(current: Dict, baseline: Dict) -> List[str]:
+    """Format per-stage wall-time changes between two saved reports."""
+    lines = []
+    for name, entry in current["totals"].items():
+        base = baseline.get("totals", {}).get(name)
+        if not base:
+            lines.append(f"{name:28s} new: {entry['wall_seconds']:.2f}s")
+            continue
+        ratio = entry["wall_seconds"] / max(base["wall_seconds"], 1e-9)
+        lines.append(
+            f"{name:28s} {base['wall_seconds']:9.2f}s -> "
+            f"{entry['wall_seconds']:9.2f}s ({ratio:5.2f}x)"
+        )
+    return lines
+
+
+def parse_arguments() -> argparse.Namespace:
+    """
+    Parse command line arguments.
+
+    Returns:
+        argparse.Namespace: Parsed command line arguments
+    """
+    parser = argparse.ArgumentParser(
+        description="Summarize or compare stage metrics reports",
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+    )
+    parser.add_argument("report", type=str, help=f"A {REPORT_NAME} from a run")
+    parser.add_argument("--baseline", type=str, default=None, help="Report to compare to")
+    return parser.parse_args()
+
+
+def main() -> None:
+    """Print a report's per-stage totals, or its change against a baseline."""
+    args = parse_arguments()
+    with open(args.report, "r") as f:
+        report = json.load(f)
+    if args.baseline:
+        with open(args.baseline, "r") as f:
+            baseline = json.load(f)
+        print("\n".join(compare_reports(report, baseline)))
+        return
+    recorder = StageRecorder()
+    recorder.records = [StageRecord(**record) for record in report["stages"]]
+    print(recorder.summary())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,376 @@
+#!/usr/bin/env python3
+
+import argparse
+import json
+import os
+import struct
+from dataclasses import asdict, dataclass
+from typing import Dict, List, Optional
+
+import h5py
+import numpy as np
+
+ROBOT_STATE_DIMS = {
+    "joint_states": 7,
+    "ee_pose": 7,
+    "ee_goal_pose": 7,
+    "gripper_cmd": 1,
+}
+SESSION_START_NS = 1_730_835_041_880_433_600
+
+MCAP_MAGIC = b"\x89MCAP0\r\n"
+OP_HEADER = 0x01
+OP_FOOTER = 0x02
+OP_SCHEMA = 0x03
+OP_CHANNEL = 0x04
+OP_MESSAGE = 0x05
+OP_DATA_END = 0x0F
+IMAGE_SCHEMA = (
+    "std_msgs/Header header\nuint32 height\nuint32 width\nstring encoding\n"
+    "uint8 is_bigendian\nuint32 step\nuint8[] data\n"
+    "================================================================================\n"
+    "MSG: std_msgs/Header\nbuiltin_interfaces/Time stamp\nstring frame_id\n"
+    "================================================================================\n"
+    "MSG: builtin_interfaces/Time\nint32 sec\nuint32 nanosec\n"
+)
+
+
+@dataclass
+class SessionSpec:
+    """Shape of one synthetic session."""
+
+    cameras: int = 3
+    height: int = 96
+    width: int = 128
+    duration_s: float = 10.0
+    frequency: float = 5.0
+    seed: int = 0
+
+    @property
+    def num_frames(self) -> int:
+        return max(1, int(round(self.duration_s * self.frequency)))
+
+
+# Named dataset sizes for generation and benchmarks; "large" is roughly one
+# real session per camera resolution-wise, kept short to bound memory
+SCALES = {
+    "tiny": {"sessions": 2, "spec": SessionSpec(height=48, width=64, duration_s=4.0)},
+    "small": {"sessions": 4, "spec": SessionSpec()},
+    "medium": {
+        "sessions": 8,
+        "spec": SessionSpec(height=240, width=320, duration_s=30.0),
+    },
+    "large": {
+        "sessions": 16,
+        "spec": SessionSpec(height=480, width=640, duration_s=20.0),
+    },
+}
+
+
+def scaled_spec(scale: str, **overrides) -> SessionSpec:
+    """Return the :data:`SCALES` spec for ``scale`` with non-None overrides applied."""
+    spec = asdict(SCALES[scale]["spec"])
+    spec.update({k: v for k, v in overrides.items() if v is not None})
+    return SessionSpec(**spec)
+
+
+def synthetic_frames(spec: SessionSpec, camera: int) -> Dict[str, np.ndarray]:
+    """
+    Generate RGB and depth frames for one camera.
+
+    Frames are a smooth gradient with a moving square, so they compress like
+    real footage rather than like noise.
+
+    Returns:
+        Dict[str, np.ndarray]: ``rgb`` (N, H, W, 3) uint8 and ``depth`` (N, H, W) uint16
+    """
+    rng = np.random.default_rng(spec.seed * 101 + camera)
+    n, h, w = spec.num_frames, spec.height, spec.width
+    yy, xx = np.mgrid[0:h, 0:w]
+    base = np.stack(
+        [xx * 255 // max(w - 1, 1), yy * 255 // max(h - 1, 1), (xx + yy) % 256],
+        axis=-1,
+    ).astype(np.uint8)
+    rgb = np.repeat(base[None], n, axis=0)
+    depth = np.repeat((600 + yy * 4 + xx).astype(np.uint16)[None], n, axis=0)
+
+    size = max(2, min(h, w) // 6)
+    x, y = rng.integers(0, w - size), rng.integers(0, h - size)
+    vx, vy = rng.choice([-3, -2, 2, 3], size=2)
+    for i in range(n):
+        rgb[i, y : y + size, x : x + size] = (255, 40, 40)
+        depth[i, y : y + size, x : x + size] = 450
+        x, y = x + vx, y + vy
+        if not 0 <= x <= w - size:
+            vx, x = -vx, int(np.clip(x, 0, w - size))
+        if not 0 <= y <= h - size:
+            vy, y = -vy, int(np.clip(y, 0, h - size))
+    noise = rng.integers(0, 3, size=depth.shape, dtype=np.uint16)
+    return {"rgb": rgb, "depth": depth + noise}
+
+
+def _frame_dataset(
+    group: h5py.Group, key: str, frames: np.ndarray, encode: bool = False
+) -> None:
+    if encode:
+        from depth_codec import encode_batch
+
+        payloads = encode_batch(frames)
+    else:
+        payloads = [frame.tobytes() for frame in frames]
+    blobs = np.empty(len(frames), dtype=object)
+    for i, payload in enumerate(payloads):
+        blobs[i] = np.frombuffer(payload, dtype=np.uint8)
+    dataset = group.create_dataset(key, data=blobs, dtype=h5py.vlen_dtype(np.uint8))
+    dataset.attrs["frame_shape"] = frames.shape[1:]
+    dataset.attrs["pixel_dtype"] = frames.dtype.str
+    if encode:
+        from depth_codec import CODEC_NAME
+
+        dataset.attrs["codec"] = CODEC_NAME
+
+
+def write_demo_hdf5(
+    path: str,
+    spec: SessionSpec,
+    frames: Optional[List[Dict]] = None,
+    encode_depth: bool = False,
+) -> None:
+    """
+    Write a demo HDF5 with the datasets a recorded demo has.
+
+    Args:
+        path (str): Output file
+        spec (SessionSpec): Session shape
+        frames (Optional[List[Dict]]): Per-camera :func:`synthetic_frames` output
+        encode_depth (bool): Store depth with the lossless :mod:`depth_codec`
+    """
+    rng = np.random.default_rng(spec.seed)
+    n = spec.num_frames
+    frames = frames or [synthetic_frames(spec, c) for c in range(spec.cameras)]
+    period_ns = int(1e9 / spec.frequency)
+    jitter = rng.integers(-period_ns // 50, period_ns // 50 + 1, size=n)
+    timestamps = SESSION_START_NS + np.arange(n, dtype=np.int64) * period_ns + jitter
+
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with h5py.File(path, "w") as f:
+        for camera, camera_frames in enumerate(frames):
+            _frame_dataset(f, f"camera{camera}_rgb", camera_frames["rgb"])
+            _frame_dataset(
+                f, f"camera{camera}_depth", camera_frames["depth"], encode_depth
+            )
+            f.create_dataset(
+                f"workspace_t_camera{camera}_color_optical_frame",
+                data=np.repeat(np.eye(4)[None], n, axis=0),
+            )
+        f.create_dataset("timestamps", data=timestamps)
+        for key, dim in ROBOT_STATE_DIMS.items():
+            walk = np.cumsum(rng.normal(0, 0.01, size=(n, dim)), axis=0)
+            f.create_dataset(key, data=walk)
+        f.create_dataset("base_t_robot", data=np.eye(4))
+
+
+class _CdrWriter:
+    """Little-endian CDR serializer for the handful of types an Image needs."""
+
+    def __init__(self):
+        self.buffer = bytearray(b"\x00\x01\x00\x00")
+
+    def _align(self, size: int) -> None:
+        self.buffer.extend(b"\x00" * (-(len(self.buffer) - 4) % size))
+
+    def uint8(self, value: int) -> None:
+        self.buffer.append(value)
+
+    def uint32(self, value: int) -> None:
+        self._align(4)
+        self.buffer.extend(struct.pack("<I", value))
+
+    def int32(self, value: int) -> None:
+        self._align(4)
+        self.buffer.extend(struct.pack("<i", value))
+
+    def string(self, value: str) -> None:
+        data = value.encode() + b"\x00"
+        self.uint32(len(data))
+        self.buffer.extend(data)
+
+    def bytes(self, value: bytes) -> None:
+        self.uint32(len(value))
+        self.buffer.extend(value)
+
+
+def _image_message(frame: np.ndarray, stamp_ns: int, frame_id: str) -> bytes:
+    cdr = _CdrWriter()
+    cdr.int32(stamp_ns // 1_000_000_000)
+    cdr.uint32(stamp_ns % 1_000_000_000)
+    cdr.string(frame_id)
+    cdr.uint32(frame.shape[0])
+    cdr.uint32(frame.shape[1])
+    cdr.string("rgb8")
+    cdr.uint8(0)
+    cdr.uint32(frame.shape[1] * 3)
+    cdr.bytes(frame.tobytes())
+    return bytes(cdr.buffer)
+
+
+def _record(opcode: int, body: bytes) -> bytes:
+    return struct.pack("<BQ", opcode, len(body)) + body
+
+
+def _mcap_string(value: str) -> bytes:
+    data = value.encode()
+    return struct.pack("<I", len(data)) + data
+
+
+def write_mcap(
+    path: str, spec: SessionSpec, frames: Optional[List[Dict]] = None
+) -> None:
+    """
+    Write an unindexed MCAP bag with a ``sensor_msgs/msg/Image`` topic per camera.
+
+    Topics are ``/camera/camera<i>/color/image_raw``, the topics the flows rip
+    video from. The file has no summary section, which readers accept by
+    scanning the data section.
+    """
+    frames = frames or [synthetic_frames(spec, c) for c in range(spec.cameras)]
+    period_ns = int(1e9 / spec.frequency)
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(MCAP_MAGIC)
+        profile = _mcap_string("ros2") + _mcap_string("maple-synthetic")
+        f.write(_record(OP_HEADER, profile))
+        f.write(
+            _record(
+                OP_SCHEMA,
+                struct.pack("<H", 1)
+                + _mcap_string("sensor_msgs/msg/Image")
+                + _mcap_string("ros2msg")
+                + _mcap_string(IMAGE_SCHEMA),
+            )
+        )
+        for camera in range(len(frames)):
+            f.write(
+                _record(
+                    OP_CHANNEL,
+                    struct.pack("<HH", camera + 1, 1)
+                    + _mcap_string(f"/camera/camera{camera}/color/image_raw")
+                    + _mcap_string("cdr")
+                    + struct.pack("<I", 0),
+                )
+            )
+        sequence = 0
+        for i in range(spec.num_frames):
+            stamp = SESSION_START_NS + i * period_ns
+            for camera, camera_frames in enumerate(frames):
+                payload = _image_message(
+                    camera_frames["rgb"][i], stamp, f"camera{camera}_color_optical_frame"
+                )
+                header = struct.pack("<HIQQ", camera + 1, sequence, stamp, stamp)
+                f.write(_record(OP_MESSAGE, header + payload))
+                sequence += 1
+        f.write(_record(OP_DATA_END, struct.pack("<I", 0)))
+        f.write(_record(OP_FOOTER, struct.pack("<QQI", 0, 0, 0)))
+        f.write(MCAP_MAGIC)
+
+
+def write_session(
+    root: str,
+    session_id: str,
+    task_id: str,
+    demo_index: int = 0,
+    spec: Optional[SessionSpec] = None,
+    encode_depth: bool = False,
+) -> str:
+    """
+    Write a session the way the data platform lays it out on download.
+
+    The layout is ``<root>/<task>/<exp>/`` holding the DC json, the MCAP bag,
+    ``hdf5/demo_N/demo_N.hdf5``, ``hdf5/demo_N_metadata.json`` and ``logs/``.
+
+    Returns:
+        str: The experiment directory
+    """
+    spec = spec or SessionSpec()
+    demo = f"demo_{demo_index}"
+    exp_dir = os.path.join(root, task_id, f"exp_{session_id}")
+    frames = [synthetic_frames(spec, c) for c in range(spec.cameras)]
+
+    write_demo_hdf5(
+        os.path.join(exp_dir, "hdf5", demo, f"{demo}.hdf5"), spec, frames, encode_depth
+    )
+    write_mcap(os.path.join(exp_dir, f"{session_id}.mcap"), spec, frames)
+
+    with open(os.path.join(exp_dir, "hdf5", f"{demo}_metadata.json"), "w") as f:
+        json.dump({"demo": demo, "num_frames": spec.num_frames}, f, indent=2)
+    with open(os.path.join(exp_dir, f"{session_id}.json"), "w") as f:
+        json.dump(
+            {
+                "session_id": session_id,
+                "raw": True,
+                "extra_json": {"extra_json": {"task_id": task_id}},
+                "synthetic": asdict(spec),
+            },
+            f,
+            indent=2,
+        )
+    os.makedirs(os.path.join(exp_dir, "logs"), exist_ok=True)
+    with open(os.path.join(exp_dir, "logs", "recorder.log"), "w") as f:
+        for i in range(spec.num_frames):
+            f.write(f"[recorder] wrote frame {i}\n")
+    return exp_dir
+
+
+def parse_arguments() -> argparse.Namespace:
+    """
+    Parse command line arguments.
+
+    Returns:
+        argparse.Namespace: Parsed command line arguments
+    """
+    parser = argparse.ArgumentParser(
+        description="Write a synthetic session in the data platform layout",
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+    )
+    parser.add_argument("output", type=str, help="Directory to write the session into")
+    parser.add_argument("--session-id", type=str, default="synthetic-0")
+    parser.add_argument("--task-id", type=str, default="synthetic_task")
+    parser.add_argument("--demo-index", type=int, default=0)
+    parser.add_argument(
+        "--scale", type=str, default="small", choices=sorted(SCALES), help="Size preset"
+    )
+    parser.add_argument("--cameras", type=int, default=None, help="Override the preset")
+    parser.add_argument("--height", type=int, default=None, help="Override the preset")
+    parser.add_argument("--width", type=int, default=None, help="Override the preset")
+    parser.add_argument("--duration", type=float, default=None, help="Seconds")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--encode-depth", action="store_true", help="Losslessly compress depth frames"
+    )
+    return parser.parse_args()
+
+
+def main() -> None:
+    """Write one synthetic session."""
+    args = parse_arguments()
+    spec = scaled_spec(
+        args.scale,
+        cameras=args.cameras,
+        height=args.height,
+        width=args.width,
+        duration_s=args.duration,
+        seed=args.seed,
+    )
+    exp_dir = write_session(
+        args.output,
+        args.session_id,
+        args.task_id,
+        args.demo_index,
+        spec,
+        args.encode_depth,
+    )
+    print(f"Wrote {spec.num_frames} frames x {spec.cameras} cameras to {exp_dir}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,18 @@
+import os
+import sys
+
+import pytest
+
+# The modules live at the repository root rather than in a package
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture(autouse=True)
+def isolated_caches(tmp_path, monkeypatch):
+    """Keep every per-user cache the modules write inside the test's tmp dir."""
+    cache_root = tmp_path / "cache"
+    monkeypatch.setenv("MAPLE_UPLOAD_HASH_CACHE", str(cache_root / "upload_hashes"))
+    monkeypatch.setenv("MAPLE_SCHEDULE_HISTORY", str(cache_root / "schedule.json"))
+    monkeypatch.setenv("MAPLE_PREFLIGHT_CACHE", str(cache_root / "preflight"))
+    monkeypatch.setenv("MAPLE_QUERY_CACHE", str(cache_root / "query"))
+    return cache_root
@@ -0,0 +1,77 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pytest
+
+from depth_codec import decode, decode_batch, encode_batch, is_encoded
+
+DTYPES = ["u1", "<u2", ">u2", "i2", "<u4", "i4", "i8", "<f4", ">f4", "f8"]
+
+
+def random_frame(rng, shape, dtype):
+    dtype = np.dtype(dtype)
+    if dtype.kind == "f":
+        frame = rng.normal(scale=1e3, size=shape).astype(dtype)
+        # NaN and infinities must survive bit-exactly too
+        frame.flat[:3] = [np.nan, np.inf, -np.inf][: frame.size]
+        return frame
+    info = np.iinfo(dtype)
+    native = dtype.newbyteorder("=")
+    frame = rng.integers(info.min, info.max, size=shape, dtype=native, endpoint=True)
+    return frame.astype(dtype)
+
+
+def assert_bit_exact(decoded, frame):
+    # Decoded frames are little-endian with channels folded into the row
+    rows = frame.reshape(frame.shape[0], -1) if frame.ndim > 1 else frame[None]
+    expected = rows.astype(frame.dtype.newbyteorder("<"))
+    assert decoded.dtype == expected.dtype
+    assert decoded.shape == expected.shape
+    assert decoded.tobytes() == expected.tobytes()
+
+
+@pytest.mark.parametrize("dtype", DTYPES)
+def test_round_trip_every_dtype(dtype):
+    rng = np.random.default_rng(0)
+    frame = random_frame(rng, (70, 33), dtype)
+    blob = encode_batch([frame], band_rows=16)[0]
+    assert is_encoded(blob)
+    assert_bit_exact(decode(blob), frame)
+
+
+def test_batch_keeps_order_across_shapes_and_dtypes():
+    rng = np.random.default_rng(1)
+    frames = [
+        random_frame(rng, (48, 64), "<u2"),
+        random_frame(rng, (10, 8, 3), "u1"),
+        random_frame(rng, (48, 64), "<u2"),
+        random_frame(rng, (5, 7), "<f4"),
+        random_frame(rng, (48, 64), "<u2"),
+    ]
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        blobs = encode_batch(frames, band_rows=7, pool=pool)
+        decoded = decode_batch(blobs, pool=pool)
+    for out, frame in zip(decoded, frames):
+        assert_bit_exact(out, frame)
+    # Batched and single decodes agree
+    assert all(decode(b).tobytes() == d.tobytes() for b, d in zip(blobs, decoded))
+
+
+@pytest.mark.parametrize("shape", [(0, 5), (0, 4, 3), (5, 0), (0,)])
+def test_empty_frames(shape):
+    frame = np.zeros(shape, dtype="<u2")
+    decoded = decode(encode_batch([frame])[0])
+    assert decoded.size == 0
+    assert decoded.dtype == frame.dtype
+
+
+def test_rejects_bad_input():
+    with pytest.raises(ValueError):
+        encode_batch([np.zeros((2, 2), dtype=bool)])
+    with pytest.raises(ValueError):
+        encode_batch([np.uint16(3)])
+    with pytest.raises(ValueError):
+        decode(np.zeros((2, 2), dtype="<u2").tobytes())
+    blob = encode_batch([np.arange(20, dtype="<u2").reshape(4, 5)])[0]
+    with pytest.raises(ValueError):
+        decode(blob[:-1])
@@ -0,0 +1,129 @@
+import json
+import os
+import shutil
+import time
+
+import h5py
+import numpy as np
+import pytest
+
+from session_merge import MERGE_MANIFEST, merge_sessions, write_session_manifest
+
+
+def make_session(root, name, demos, steps=5, extra_files=()):
+    session_dir = root / name
+    for demo in demos:
+        demo_dir = session_dir / "hdf5" / demo
+        demo_dir.mkdir(parents=True)
+        with h5py.File(demo_dir / f"{demo}.hdf5", "w") as f:
+            f["timestamps"] = np.arange(steps, dtype=np.int64)
+        (session_dir / "hdf5" / f"{demo}_metadata.json").write_text(
+            json.dumps({"session": name})
+        )
+        for extra in extra_files:
+            (demo_dir / extra).write_text(name)
+    write_session_manifest(str(session_dir))
+    return str(session_dir)
+
+
+def merged_session_of(merged_dir, demo):
+    with open(os.path.join(merged_dir, MERGE_MANIFEST)) as f:
+        return json.load(f)[demo]["session_dir"]
+
+
+def test_rerun_skips_unchanged_demos(tmp_path):
+    sessions = [
+        make_session(tmp_path, "s1", ["demo_1", "demo_2"]),
+        make_session(tmp_path, "s2", ["demo_3"]),
+    ]
+    merged_dir = str(tmp_path / "merged")
+
+    first = merge_sessions(sessions, merged_dir)
+    second = merge_sessions(sessions, merged_dir)
+
+    assert (first.demos_merged, first.demos_skipped) == (3, 0)
+    assert (second.demos_merged, second.demos_skipped) == (0, 3)
+    with h5py.File(first.training_view, "r") as f:
+        assert list(f["data"]) == ["demo_1", "demo_2", "demo_3"]
+        assert f["data"].attrs["total"] == 15
+        assert len(f["data/demo_2/timestamps"]) == 5
+
+
+@pytest.mark.parametrize("workers", [1, 8])
+def test_conflicts_resolve_in_session_order(tmp_path, workers):
+    first = make_session(tmp_path, "first", ["demo_1"], extra_files=["owner.txt"])
+    second = make_session(
+        tmp_path, "second", ["demo_1", "demo_2"], extra_files=["owner.txt"]
+    )
+    merged_dir = str(tmp_path / "merged")
+
+    report = merge_sessions([first, second], merged_dir, workers=workers)
+
+    assert report.conflicts == [f"demo_1: {second} (kept {first})"]
+    assert merged_session_of(merged_dir, "demo_1") == first
+    owner = os.path.join(merged_dir, "hdf5", "demo_1", "owner.txt")
+    assert open(owner).read() == "first"
+
+    # The previous owner keeps the name even when listed later
+    rerun = merge_sessions([second, first], merged_dir, workers=workers)
+    assert rerun.conflicts == [f"demo_1: {second} (kept {first})"]
+    assert merged_session_of(merged_dir, "demo_1") == first
+
+
+def test_remerge_removes_files_the_demo_no_longer_has(tmp_path):
+    session = make_session(tmp_path, "s1", ["demo_1"], extra_files=["a.txt", "b.txt"])
+    merged_dir = str(tmp_path / "merged")
+    merge_sessions([session], merged_dir)
+
+    os.remove(os.path.join(session, "hdf5", "demo_1", "b.txt"))
+    write_session_manifest(session)
+    report = merge_sessions([session], merged_dir)
+
+    assert report.demos_merged == 1
+    demo_dir = os.path.join(merged_dir, "hdf5", "demo_1")
+    assert sorted(os.listdir(demo_dir)) == ["a.txt", "demo_1.hdf5"]
+
+
+def test_non_numeric_demo_names_and_missing_sessions(tmp_path):
+    session = make_session(tmp_path, "s1", ["demo_10", "demo_2", "demo_extra"])
+    missing = str(tmp_path / "gone")
+
+    report = merge_sessions([session, missing], str(tmp_path / "merged"))
+
+    assert report.missing_sessions == [missing]
+    with h5py.File(report.training_view, "r") as f:
+        lengths = json.loads(f["data"].attrs["demo_lengths"])
+    assert list(lengths) == ["demo_2", "demo_10", "demo_extra"]
+
+
+def process_session(download_root, output_dir):
+    # What MCAPAnalysisFlow.process_session does to a fresh download: copy the
+    # demo, index it against the bag, re-encode the video, write the manifest
+    from synthetic_data import SessionSpec, write_session
+    from timestamp_index import index_demo_dir
+
+    spec = SessionSpec(cameras=1, height=8, width=8, duration_s=2.0)
+    exp_dir = write_session(str(download_root), "sess", "task", spec=spec)
+    demo_dir = os.path.join(output_dir, "hdf5", "demo_0")
+    shutil.copytree(os.path.join(exp_dir, "hdf5", "demo_0"), demo_dir)
+    index_demo_dir(demo_dir, os.path.join(exp_dir, "sess.mcap"))
+    os.makedirs(os.path.join(output_dir, "videos", "demo_0"), exist_ok=True)
+    with open(os.path.join(output_dir, "videos", "demo_0", "video.mp4"), "wb") as f:
+        f.write(b"encoded video")
+    write_session_manifest(output_dir)
+
+
+def test_reprocessed_session_is_not_merged_again(tmp_path):
+    session_dir = str(tmp_path / "sess")
+    merged_dir = str(tmp_path / "merged")
+    process_session(tmp_path / "download_1", session_dir)
+    first = merge_sessions([session_dir], merged_dir)
+
+    # The next run downloads and rebuilds everything with new mtimes
+    shutil.rmtree(session_dir)
+    time.sleep(0.01)
+    process_session(tmp_path / "download_2", session_dir)
+    second = merge_sessions([session_dir], merged_dir)
+
+    assert first.demos_merged == 1
+    assert (second.demos_merged, second.demos_skipped) == (0, 1)
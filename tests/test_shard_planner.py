@@ -0,0 +1,81 @@
+import h5py
+import numpy as np
+import pytest
+
+from shard_planner import (
+    EpisodeInfo,
+    ShardSampler,
+    _imbalance,
+    plan_shards,
+    scan_episodes,
+    write_shards,
+)
+
+
+def episodes(frames, bytes_per_frame=100):
+    return [
+        EpisodeInfo(f"demo_{i}", n, n * bytes_per_frame) for i, n in enumerate(frames)
+    ]
+
+
+@pytest.mark.parametrize("num_shards", [1, 2, 3, 5, 8])
+def test_every_episode_lands_in_one_shard_in_order(num_shards):
+    rng = np.random.default_rng(num_shards)
+    eps = episodes(rng.integers(20, 400, size=23).tolist())
+    shards = plan_shards(eps, num_shards)
+    assert len(shards) == num_shards
+    assert all(shards)
+    placed = [e.demo for shard in shards for e in shard]
+    assert sorted(placed) == sorted(e.demo for e in eps)
+    order = {e.demo: i for i, e in enumerate(eps)}
+    for shard in shards:
+        assert [order[e.demo] for e in shard] == sorted(order[e.demo] for e in shard)
+
+
+def test_balance_is_within_one_episode_of_the_mean():
+    rng = np.random.default_rng(0)
+    eps = episodes(rng.integers(50, 500, size=60).tolist())
+    shards = plan_shards(eps, 4)
+    frames = [sum(e.frames for e in shard) for shard in shards]
+    # Greedy LPT bound: no shard exceeds the mean by more than the largest episode
+    assert max(frames) <= sum(frames) / 4 + max(e.frames for e in eps)
+    assert _imbalance(frames) < 1.05
+
+
+def test_balances_frames_and_bytes_together():
+    # Half the episodes are long but compress well, half short but large on disk
+    eps = [EpisodeInfo(f"demo_{i}", 400, 1_000) for i in range(4)]
+    eps += [EpisodeInfo(f"demo_{i + 4}", 100, 40_000) for i in range(4)]
+    shards = plan_shards(eps, 4)
+    assert _imbalance([sum(e.frames for e in s) for s in shards]) == 1.0
+    assert _imbalance([sum(e.bytes for e in s) for s in shards]) == 1.0
+
+
+def test_rejects_impossible_shard_counts():
+    with pytest.raises(ValueError):
+        plan_shards(episodes([10, 10]), 0)
+    with pytest.raises(ValueError):
+        plan_shards(episodes([10, 10]), 3)
+
+
+def test_written_shards_read_back_every_step(tmp_path):
+    path = tmp_path / "training_data.hdf5"
+    lengths = [30, 5, 17, 12, 40]
+    with h5py.File(path, "w") as f:
+        data = f.create_group("data")
+        for i, n in enumerate(lengths):
+            demo = data.create_group(f"demo_{i}")
+            demo["actions"] = np.full((n, 2), i, dtype=np.float32)
+    assert [e.frames for e in scan_episodes(path)] == lengths
+
+    manifest = write_shards(path, tmp_path / "shards", 2)
+    assert manifest["num_shards"] == 2
+    steps = 0
+    for rank in range(2):
+        sampler = ShardSampler(tmp_path / "shards", rank)
+        steps += len(sampler)
+        window = sampler.sample(len(sampler) - 1, 4)
+        # The last step is repeated rather than crossing into another episode
+        assert (window["actions"] == window["actions"][0]).all()
+        sampler.close()
+    assert steps == sum(lengths)
@@ -0,0 +1,93 @@
+import numpy as np
+import pytest
+
+from synthetic_data import SessionSpec, write_demo_hdf5, write_mcap
+from timestamp_index import (
+    REFERENCE,
+    VIDEO,
+    TimestampIndex,
+    build_index,
+    load_index,
+    write_index,
+)
+
+
+def brute_nearest_times(times, queries):
+    # Time of the closest sample to each query, by exhaustive search
+    distance = np.abs(times[None, :] - queries[:, None])
+    return times[distance.argmin(axis=1)]
+
+
+@pytest.fixture
+def index():
+    rng = np.random.default_rng(0)
+    return TimestampIndex(
+        {
+            # Unsorted, with duplicates, and a single-sample stream
+            "a": rng.integers(0, 10_000, size=500),
+            "b": rng.permutation(np.arange(0, 10_000, 7)),
+            "one": np.array([5_000]),
+        }
+    )
+
+
+@pytest.mark.parametrize("stream", ["a", "b", "one"])
+def test_nearest_matches_brute_force(index, stream):
+    queries = np.random.default_rng(1).integers(-1_000, 11_000, size=2_000)
+    found = index.nearest(stream, queries)
+    times = index.times(stream)
+    assert np.array_equal(
+        np.abs(times[found] - queries),
+        np.abs(brute_nearest_times(times, queries) - queries),
+    )
+
+
+def test_nearest_on_exact_timestamps_returns_that_sample(index):
+    times = index.times("b")
+    assert np.array_equal(index.nearest("b", times), np.arange(len(times)))
+
+
+def test_map_is_nearest_of_source_times(index):
+    mapping = index.map("a", "b")
+    assert np.array_equal(mapping, index.nearest("b", index.times("a")))
+    assert np.array_equal(index.map("a", "b", [3, 1]), mapping[[3, 1]])
+
+
+def test_nearest_rejects_empty_stream():
+    with pytest.raises(ValueError):
+        TimestampIndex({"empty": np.array([], dtype=np.int64)}).nearest("empty", [0])
+
+
+def test_save_load_round_trip(index, tmp_path):
+    index.map("a", "b")
+    path = str(tmp_path / "index.npz")
+    index.save(path)
+    loaded = TimestampIndex.load(path)
+    assert loaded.streams == index.streams
+    for name in index.streams:
+        assert np.array_equal(loaded.times(name), index.times(name))
+    assert ("a", "b") in loaded._maps
+    assert np.array_equal(loaded.map("b", "a"), index.map("b", "a"))
+
+
+def test_build_index_defaults_to_camera_topics(tmp_path):
+    spec = SessionSpec(cameras=2, height=8, width=8, duration_s=4.0)
+    hdf5_path = str(tmp_path / "demo_0.hdf5")
+    mcap_path = str(tmp_path / "session.mcap")
+    write_demo_hdf5(hdf5_path, spec)
+    write_mcap(mcap_path, spec)
+
+    index = build_index(hdf5_path, mcap_path)
+    assert REFERENCE in index.streams and VIDEO in index.streams
+    # Only maps to and from the reference are precomputed
+    assert all(REFERENCE in pair for pair in index._maps)
+    assert set(index.camera_streams()) == {"camera0", "camera1"}
+
+    only_one = build_index(
+        hdf5_path, mcap_path, topics=["/camera/camera0/color/image_raw"]
+    )
+    assert set(only_one.camera_streams()) == {"camera0"}
+
+    write_index(hdf5_path, mcap_path)
+    loaded = load_index(hdf5_path)
+    assert loaded.skew_report()["cameras"].keys() == {"camera0", "camera1"}
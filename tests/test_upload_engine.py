@@ -0,0 +1,138 @@
+import os
+import time
+
+import pytest
+
+from upload_engine import (
+    HASH_CACHE_NAME,
+    MANIFEST_NAME,
+    LocalBackend,
+    UploadEngine,
+    build_manifest,
+    hash_cache_path,
+)
+
+
+def write(path, data: bytes) -> None:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(data)
+
+
+@pytest.fixture
+def tree(tmp_path):
+    src = tmp_path / "src"
+    write(str(src / "a.bin"), b"a" * 1000)
+    write(str(src / "sub" / "b.bin"), os.urandom(5000))
+    write(str(src / "sub" / "a_copy.bin"), b"a" * 1000)
+    return str(src)
+
+
+class FlakyBackend(LocalBackend):
+    """Fails the given part indices once, like an interrupted transfer."""
+
+    def __init__(self, root, fail_parts):
+        super().__init__(root)
+        self.fail_parts = set(fail_parts)
+        self.parts_sent = []
+
+    def put_part(self, local_path, offset, length, key, token, index):
+        if index in self.fail_parts:
+            self.fail_parts.discard(index)
+            raise OSError(f"connection reset on part {index}")
+        self.parts_sent.append(index)
+        super().put_part(local_path, offset, length, key, token, index)
+
+
+class SlowCopyBackend(LocalBackend):
+    """Records server-side copies and delays them behind concurrent uploads."""
+
+    def __init__(self, root):
+        super().__init__(root)
+        self.copies = []
+
+    def copy(self, src_key, dst_key):
+        self.copies.append((src_key, dst_key))
+        time.sleep(0.2)
+        super().copy(src_key, dst_key)
+
+
+def test_manifest_hashes_and_keeps_cache_outside_tree(tree):
+    manifest = build_manifest(tree)
+
+    assert sorted(manifest) == ["a.bin", "sub/a_copy.bin", "sub/b.bin"]
+    assert manifest["a.bin"]["sha256"] == manifest["sub/a_copy.bin"]["sha256"]
+    assert manifest["sub/b.bin"]["size"] == 5000
+    assert not os.path.exists(os.path.join(tree, HASH_CACHE_NAME))
+    assert os.path.isfile(hash_cache_path(tree))
+
+
+def test_manifest_rehashes_changed_files(tree):
+    before = build_manifest(tree)
+    write(os.path.join(tree, "a.bin"), b"changed")
+
+    after = build_manifest(tree)
+
+    assert after["a.bin"]["sha256"] != before["a.bin"]["sha256"]
+    assert after["sub/b.bin"] == before["sub/b.bin"]
+
+
+def test_upload_is_a_delta(tree, tmp_path):
+    dst = str(tmp_path / "dst")
+    engine = UploadEngine(LocalBackend(dst), workers=2)
+
+    first = engine.upload(tree)
+    second = engine.upload(tree)
+    write(os.path.join(tree, "sub", "b.bin"), os.urandom(100))
+    third = engine.upload(tree)
+
+    assert (first.files_uploaded, first.files_deduplicated) == (2, 1)
+    assert second.files_uploaded == 0 and second.files_skipped == 3
+    assert third.files_uploaded == 1 and third.files_skipped == 2
+    for rel in ("a.bin", "sub/a_copy.bin", "sub/b.bin"):
+        with open(os.path.join(tree, rel), "rb") as local:
+            with open(os.path.join(dst, rel), "rb") as remote:
+                assert local.read() == remote.read()
+    assert os.path.isfile(os.path.join(dst, MANIFEST_NAME))
+    assert not os.path.exists(os.path.join(dst, HASH_CACHE_NAME))
+
+
+def test_interrupted_multipart_upload_resumes(tmp_path):
+    src = tmp_path / "src"
+    payload = os.urandom(10_000)
+    write(str(src / "big.bin"), payload)
+    backend = FlakyBackend(str(tmp_path / "dst"), fail_parts=[3])
+    engine = UploadEngine(backend, workers=1, part_size=1000, multipart_threshold=1000)
+
+    with pytest.raises(RuntimeError, match="1 uploads failed"):
+        engine.upload(str(src))
+    assert not os.path.exists(tmp_path / "dst" / "big.bin")
+
+    sent_before = len(backend.parts_sent)
+    report = engine.upload(str(src))
+
+    assert report.files_uploaded == 1
+    assert report.parts_resumed == sent_before
+    assert sorted(backend.parts_sent[sent_before:]) == [3]
+    assert (tmp_path / "dst" / "big.bin").read_bytes() == payload
+
+
+def test_no_copy_from_a_key_being_overwritten(tmp_path):
+    # a changes OLD -> NEW while new file b has OLD's content: b must not be
+    # copied from a, which may already hold NEW by the time the copy runs
+    src = tmp_path / "src"
+    old, new = b"o" * 1000, b"n" * 1000
+    write(str(src / "a.bin"), old)
+    backend = SlowCopyBackend(str(tmp_path / "dst"))
+    engine = UploadEngine(backend, workers=2)
+    engine.upload(str(src))
+
+    write(str(src / "a.bin"), new)
+    write(str(src / "b.bin"), old)
+    report = engine.upload(str(src))
+
+    assert ("a.bin", "b.bin") not in backend.copies
+    assert report.files_uploaded == 2
+    assert (tmp_path / "dst" / "a.bin").read_bytes() == new
+    assert (tmp_path / "dst" / "b.bin").read_bytes() == old
+    assert engine.upload(str(src)).files_skipped == 2
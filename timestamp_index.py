@@ -0,0 +1,450 @@
+#!/usr/bin/env python3
+
+import argparse
+import functools
+import json
+import os
+import re
+import struct
+import time
+from typing import Callable, Dict, List, Optional, Sequence, Tuple, Union
+
+import h5py
+import numpy as np
+
+from content_hash import file_digest, stat_key
+
+SIDECAR_SUFFIX = ".tsindex.npz"
+REFERENCE = "hdf5"
+VIDEO = "video"
+# The topic video_ripper_cli rips; its i-th message is the video's i-th frame
+VIDEO_TOPIC = "/camera/camera1/color/image_raw"
+_CAMERA = re.compile(r"(camera\d+)")
+
+
+class TimestampIndex:
+    """
+    Sorted timestamps per stream and nearest-neighbour maps between streams.
+
+    A stream is one clock: ``hdf5`` is the demo's ``timestamps`` dataset, which
+    every ``camera*_rgb``/``camera*_depth`` frame and robot-state sample is
+    stored against; ``<name>_timestamps`` datasets become stream ``<name>``;
+    MCAP topics are streams named by topic (message log times), and ``video``
+    is the ripped topic, so its indices are video frame numbers. Indices are
+    always positions in the stream's original order. Every lookup is a
+    vectorized ``searchsorted``.
+
+    Args:
+        streams (Dict[str, np.ndarray]): Timestamps in ns per stream, any order
+        maps (Optional[Dict[Tuple[str, str], np.ndarray]]): Precomputed
+            ``(src, dst)`` nearest maps; missing pairs are computed on demand
+            and kept
+        meta (Optional[Dict]): Provenance stored with the sidecar
+    """
+
+    def __init__(
+        self,
+        streams: Dict[str, np.ndarray],
+        maps: Optional[Dict[Tuple[str, str], np.ndarray]] = None,
+        meta: Optional[Dict] = None,
+    ):
+        self._order: Dict[str, np.ndarray] = {}
+        self._times: Dict[str, np.ndarray] = {}
+        for name, times in streams.items():
+            times = np.asarray(times, dtype=np.int64)
+            order = np.argsort(times, kind="stable")
+            self._order[name] = order
+            self._times[name] = times[order]
+        self._maps = dict(maps or {})
+        self.meta = dict(meta or {})
+
+    @property
+    def streams(self) -> List[str]:
+        return list(self._times)
+
+    def __len__(self) -> int:
+        return len(self._times)
+
+    def count(self, stream: str) -> int:
+        return len(self._times[stream])
+
+    def times(self, stream: str, indices=None) -> np.ndarray:
+        """Timestamps of ``stream`` in original order (or at ``indices``)."""
+        original = np.empty_like(self._times[stream])
+        original[self._order[stream]] = self._times[stream]
+        return original if indices is None else original[np.asarray(indices)]
+
+    def span(self) -> Tuple[int, int]:
+        """Earliest and latest timestamp over all streams."""
+        starts = [t[0] for t in self._times.values() if len(t)]
+        ends = [t[-1] for t in self._times.values() if len(t)]
+        return int(min(starts)), int(max(ends))
+
+    def nearest(self, stream: str, times) -> np.ndarray:
+        """Index of the sample of ``stream`` closest to each of ``times``."""
+        sorted_times = self._times[stream]
+        if not len(sorted_times):
+            raise ValueError(f"Stream {stream} is empty")
+        query = np.asarray(times, dtype=np.int64)
+        last = len(sorted_times) - 1
+        pos = np.clip(np.searchsorted(sorted_times, query), 1, max(last, 1))
+        left = sorted_times[pos - 1]
+        right = sorted_times[np.minimum(pos, last)]
+        pick = np.where(query - left <= right - query, pos - 1, pos)
+        return self._order[stream][np.minimum(pick, last)]
+
+    def window(self, stream: str, start_ns: int, end_ns: int) -> np.ndarray:
+        """Indices of samples with ``start_ns <= t < end_ns``, in time order."""
+        lo, hi = np.searchsorted(self._times[stream], [start_ns, end_ns])
+        return self._order[stream][lo:hi]
+
+    def map(self, src: str, dst: str, indices=None) -> np.ndarray:
+        """Nearest ``dst`` index for each ``src`` index (all of them by default)."""
+        mapping = self._maps.get((src, dst))
+        if mapping is None:
+            mapping = self.nearest(dst, self.times(src))
+            self._maps[(src, dst)] = mapping
+        return mapping if indices is None else mapping[np.asarray(indices)]
+
+    def interpolate(self, stream: str, values: np.ndarray, times) -> np.ndarray:
+        """
+        Linearly resample per-sample ``values`` of ``stream`` at ``times``.
+
+        Args:
+            stream (str): Stream the rows of ``values`` are sampled on
+            values (np.ndarray): (N, ...) array in the stream's original order
+            times: Query timestamps in ns; clamped to the stream's range
+
+        Returns:
+            np.ndarray: (len(times), ...) float64 array
+        """
+        sorted_times = self._times[stream]
+        query = np.asarray(times, dtype=np.int64)
+        last = len(sorted_times) - 1
+        hi = np.clip(np.searchsorted(sorted_times, query, side="right"), 0, last)
+        lo = np.clip(hi - 1, 0, last)
+        gap = (sorted_times[hi] - sorted_times[lo]).astype(np.float64)
+        alpha = np.divide(
+            (query - sorted_times[lo]).astype(np.float64),
+            gap,
+            out=np.zeros(len(query)),
+            where=gap > 0,
+        )
+        alpha = np.clip(alpha, 0.0, 1.0).reshape(-1, *([1] * (np.ndim(values) - 1)))
+        order = self._order[stream]
+        values = np.asarray(values, dtype=np.float64)
+        return values[order[lo]] * (1.0 - alpha) + values[order[hi]] * alpha
+
+    def skew(self, stream: str, reference: str = REFERENCE) -> Dict[str, float]:
+        """Offset (ms) from each ``reference`` sample to the nearest ``stream`` sample."""
+        ref_times = self.times(reference)
+        offsets = (self.times(stream, self.map(reference, stream)) - ref_times) / 1e6
+        magnitude = np.abs(offsets)
+        return {
+            "samples": int(len(offsets)),
+            "mean_offset_ms": float(offsets.mean()),
+            "median_ms": float(np.median(magnitude)),
+            "p95_ms": float(np.percentile(magnitude, 95)),
+            "max_ms": float(magnitude.max()),
+        }
+
+    def camera_streams(self) -> Dict[str, str]:
+        """Camera name -> stream for streams whose name contains ``camera<N>``."""
+        cameras = {}
+        for name in self.streams:
+            match = _CAMERA.search(name)
+            if match and match.group(1) not in cameras:
+                cameras[match.group(1)] = name
+        return cameras
+
+    def skew_report(self, reference: str = REFERENCE) -> Dict:
+        """
+        Per-camera sync skew against ``reference``, plus the spread across cameras.
+
+        ``spread`` is, per reference sample, the time between the earliest and
+        latest camera frame matched to it.
+        """
+        cameras = self.camera_streams()
+        report = {
+            "reference": reference,
+            "cameras": {c: self.skew(s, reference) for c, s in cameras.items()},
+        }
+        if len(cameras) > 1:
+            matched = np.stack(
+                [self.times(s, self.map(reference, s)) for s in cameras.values()]
+            )
+            spread = (matched.max(axis=0) - matched.min(axis=0)) / 1e6
+            report["spread"] = {
+                "median_ms": float(np.median(spread)),
+                "p95_ms": float(np.percentile(spread, 95)),
+                "max_ms": float(spread.max()),
+            }
+        return report
+
+    def save(self, path: str) -> None:
+        names = self.streams
+        arrays = {"meta": np.array(json.dumps(dict(self.meta, streams=names)))}
+        for i, name in enumerate(names):
+            arrays[f"times_{i}"] = self._times[name]
+            arrays[f"order_{i}"] = self._order[name]
+        for (src, dst), mapping in self._maps.items():
+            arrays[f"map_{names.index(src)}_{names.index(dst)}"] = mapping
+        tmp_path = path + ".tmp.npz"
+        np.savez_compressed(tmp_path, **arrays)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> "TimestampIndex":
+        with np.load(path) as data:
+            meta = json.loads(str(data["meta"]))
+            names = meta.pop("streams")
+            index = cls({}, meta=meta)
+            for i, name in enumerate(names):
+                index._times[name] = data[f"times_{i}"]
+                index._order[name] = data[f"order_{i}"]
+            for key in data.files:
+                if key.startswith("map_"):
+                    src, dst = key.split("_")[1:]
+                    index._maps[(names[int(src)], names[int(dst)])] = data[key]
+        return index
+
+
+def hdf5_streams(path: str) -> Dict[str, np.ndarray]:
+    """The ``timestamps`` clock and any ``<name>_timestamps`` datasets of a demo."""
+    streams = {}
+    with h5py.File(path, "r") as f:
+        for key, item in f.items():
+            if not isinstance(item, h5py.Dataset) or item.ndim != 1:
+                continue
+            if key == "timestamps":
+                streams[REFERENCE] = item[()]
+            elif key.endswith("_timestamps"):
+                streams[key[: -len("_timestamps")]] = item[()]
+    return streams
+
+
+def camera_topic(topic: str, video_topic: str = VIDEO_TOPIC) -> bool:
+    """Whether :func:`build_index` indexes ``topic`` by default."""
+    return topic == video_topic or _CAMERA.search(topic) is not None
+
+
+def mcap_streams(
+    path: str,
+    topics: Union[Sequence[str], Callable[[str], bool], None] = None,
+) -> Dict[str, np.ndarray]:
+    """
+    Message log times per topic from one MCAP scan.
+
+    ``topics`` is a list of topics or a predicate on the topic name; all
+    topics are read by default.
+    """
+    from mcap_reader import OP_CHANNEL, OP_MESSAGE, iter_records, read_string
+
+    if topics is None or callable(topics):
+        wanted = topics
+    else:
+        wanted = set(topics).__contains__
+    channels: Dict[int, str] = {}
+    times: Dict[int, List[int]] = {}
+    for opcode, body in iter_records(path):
+        if opcode == OP_CHANNEL:
+            channel_id = struct.unpack_from("<H", body, 0)[0]
+            topic, _ = read_string(body, 4)
+            if wanted is None or wanted(topic):
+                channels[channel_id] = topic
+                times.setdefault(channel_id, [])
+        elif opcode == OP_MESSAGE:
+            channel_id, _, log_time = struct.unpack_from("<HIQ", body, 0)
+            if channel_id in channels:
+                times[channel_id].append(log_time)
+    return {channels[c]: np.array(t, dtype=np.int64) for c, t in times.items()}
+
+
+def build_index(
+    hdf5_path: str,
+    mcap_path: Optional[str] = None,
+    topics: Optional[Sequence[str]] = None,
+    video_topic: str = VIDEO_TOPIC,
+) -> TimestampIndex:
+    """
+    Index a demo's streams and precompute the nearest maps to and from ``hdf5``.
+
+    Maps between other pairs are computed on first use. With the defaults, an
+    index of a demo with a few cameras is well under a megabyte.
+
+    Args:
+        hdf5_path (str): Demo HDF5
+        mcap_path (Optional[str]): The session's bag, for per-topic and video times
+        topics (Optional[Sequence[str]]): MCAP topics to index (default: the
+            ``camera<N>`` topics and ``video_topic``)
+        video_topic (str): Topic the session video was ripped from
+
+    Returns:
+        TimestampIndex: The index
+    """
+    streams = hdf5_streams(hdf5_path)
+    if mcap_path:
+        if topics is None:
+            topics = functools.partial(camera_topic, video_topic=video_topic)
+        streams.update(mcap_streams(mcap_path, topics))
+        if video_topic in streams:
+            streams[VIDEO] = streams[video_topic]
+    streams = {name: times for name, times in streams.items() if len(times)}
+    index = TimestampIndex(streams, meta={"mcap": os.path.basename(mcap_path or "")})
+    if REFERENCE in index.streams:
+        for name in index.streams:
+            if name != REFERENCE:
+                index.map(REFERENCE, name)
+                index.map(name, REFERENCE)
+    return index
+
+
+def sidecar_path(hdf5_path: str) -> str:
+    return hdf5_path + SIDECAR_SUFFIX
+
+
+def write_index(hdf5_path: str, mcap_path: Optional[str] = None, **kwargs) -> str:
+    """
+    Build the index of a demo and store it next to the HDF5.
+
+    Like the normalizer stats sidecar, it records the HDF5's SHA-256 and
+    size/mtime so :func:`load_index` can validate it without rehashing.
+
+    Returns:
+        str: Path of the written sidecar
+    """
+    start = time.perf_counter()
+    index = build_index(hdf5_path, mcap_path, **kwargs)
+    size, mtime_ns = stat_key(hdf5_path)
+    index.meta.update(content_hash=file_digest(hdf5_path), size=size, mtime_ns=mtime_ns)
+    path = sidecar_path(hdf5_path)
+    index.save(path)
+    print(
+        f"Wrote timestamp index of {len(index)} streams to {path} "
+        f"in {time.perf_counter() - start:.2f}s"
+    )
+    return path
+
+
+def load_index(hdf5_path: str, verify: bool = False) -> Optional[TimestampIndex]:
+    """
+    Load a demo's index if it still matches the HDF5.
+
+    A matching size and mtime is accepted as-is; otherwise (or with
+    ``verify``) the file is rehashed and compared with the recorded hash.
+
+    Returns:
+        Optional[TimestampIndex]: The index, or None if missing or stale
+    """
+    path = sidecar_path(hdf5_path)
+    if not os.path.isfile(path):
+        return None
+    index = TimestampIndex.load(path)
+    size, mtime_ns = stat_key(hdf5_path)
+    meta = index.meta
+    unchanged = meta.get("size") == size and meta.get("mtime_ns") == mtime_ns
+    if verify or not unchanged:
+        if size != meta.get("size"):
+            return None
+        if file_digest(hdf5_path) != meta.get("content_hash"):
+            return None
+    return index
+
+
+def get_index(hdf5_path: str, mcap_path: Optional[str] = None) -> TimestampIndex:
+    """Load the demo's index, building and storing it first if needed."""
+    index = load_index(hdf5_path)
+    if index is None:
+        write_index(hdf5_path, mcap_path)
+        index = load_index(hdf5_path)
+    return index
+
+
+def index_demo_dir(demo_dir: str, mcap_path: Optional[str] = None) -> Dict[str, Dict]:
+    """
+    Write the index of every demo HDF5 in ``demo_dir`` against the session bag.
+
+    Returns:
+        Dict[str, Dict]: Skew report per HDF5 file name
+    """
+    reports = {}
+    for name in sorted(os.listdir(demo_dir)):
+        if name.endswith(".hdf5"):
+            path = os.path.join(demo_dir, name)
+            write_index(path, mcap_path)
+            index = load_index(path)
+            if REFERENCE in index.streams and index.camera_streams():
+                reports[name] = index.skew_report()
+                print(format_skew(reports[name]))
+    return reports
+
+
+def format_skew(report: Dict) -> str:
+    lines = [f"Sync skew against {report['reference']}:"]
+    for camera, skew in report["cameras"].items():
+        lines.append(
+            f"  {camera:10s} median {skew['median_ms']:7.2f} ms, "
+            f"p95 {skew['p95_ms']:7.2f} ms, max {skew['max_ms']:7.2f} ms, "
+            f"mean offset {skew['mean_offset_ms']:+7.2f} ms"
+        )
+    if "spread" in report:
+        spread = report["spread"]
+        lines.append(
+            f"  across cameras: median {spread['median_ms']:.2f} ms, "
+            f"p95 {spread['p95_ms']:.2f} ms, max {spread['max_ms']:.2f} ms"
+        )
+    return "\n".join(lines)
+
+
+def parse_arguments() -> argparse.Namespace:
+    """
+    Parse command line arguments.
+
+    Returns:
+        argparse.Namespace: Parsed command line arguments
+    """
+    parser = argparse.ArgumentParser(
+        description="Build or load a demo's timestamp index and report sync skew",
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+    )
+    parser.add_argument("hdf5", type=str, help="Demo HDF5 file")
+    parser.add_argument("--mcap", type=str, default=None, help="The session's bag")
+    parser.add_argument(
+        "--check", action="store_true", help="Only load an existing valid index"
+    )
+    parser.add_argument(
+        "--lookups", type=int, default=1_000_000, help="Random lookups to time"
+    )
+    return parser.parse_args()
+
+
+def main() -> None:
+    """Write (or load) the index, print the skew report and time lookups."""
+    args = parse_arguments()
+    if not args.check:
+        write_index(args.hdf5, args.mcap)
+    start = time.perf_counter()
+    index = load_index(args.hdf5)
+    if index is None:
+        print(f"No valid timestamp index for {args.hdf5}")
+        return
+    print(f"Loaded index in {(time.perf_counter() - start) * 1000:.1f} ms")
+    for name in index.streams:
+        print(f"  {name}: {index.count(name)} samples")
+    if index.camera_streams() and REFERENCE in index.streams:
+        print(format_skew(index.skew_report()))
+
+    first, last = index.span()
+    queries = np.random.default_rng(0).integers(first, last + 1, size=args.lookups)
+    start = time.perf_counter()
+    for name in index.streams:
+        index.nearest(name, queries)
+    elapsed = time.perf_counter() - start
+    print(
+        f"{args.lookups * len(index)} nearest lookups in {elapsed:.3f}s "
+        f"({args.lookups * len(index) / max(elapsed, 1e-9) / 1e6:.1f} M/s)"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,4 @@
-from metaflow import FlowSpec, kubernetes, Parameter, step
+from metaflow import FlowSpec, current, kubernetes, Parameter, step
 import subprocess
 import os
 import shutil
@@ -7,37 +7,81 @@ import json
 DOCKER_IMAGE_GPU = (
     "us-docker.pkg.dev/engineering-380817/bdai/dc/workflows/maple_test:metaflow_v2_gpu"
 )
+# Compared against measured usage by resource_sampler; see the resource_usage artifact.
+# start keeps its GPU: the point-cloud conversion runs pytorch3d on CUDA. Each
+# sweep branch trains on its own GPU while upload_outputs ships the data
+START_RESOURCES = {"gpu": 1, "cpu": 16}
+TRAIN_RESOURCES = {"gpu": 1, "cpu": 16}
+UPLOAD_RESOURCES = {"cpu": 8}
+CLEANUP_RESOURCES = {"cpu": 1}
+# Preprocessed data lives on the PVC so every branch reads the same files;
+# join removes it once the outputs and checkpoints are uploaded
+SHARED_PVC = {"metaflow-pvc": "/mnt/shared"}
 
 
 class TrainFromHDF5(FlowSpec):
     task_query_id = Parameter(
         "task_query_id", type=str, help="task_id to train", required=True
     )
+    query_ttl = Parameter(
+        "query_ttl",
+        type=float,
+        default=0,
+        help="Reuse a cached session list up to this many seconds old (0: always query)",
+    )
+    sweep = Parameter(
+        "sweep",
+        type=str,
+        default="",
+        help=(
+            "Hydra sweep terms, e.g. 'training.num_epochs=500,1000 "
+            "dataloader.batch_size=128,192'; one branch per combination"
+        ),
+    )
+    config_name = Parameter(
+        "config_name", type=str, default="equi_pointcloud_real", help="Hydra config"
+    )
+    trainer = Parameter(
+        "trainer",
+        type=str,
+        default="equidiff",
+        help="Branch trainer: equidiff, stub or module:callable (training_sweep.py)",
+    )
 
     @kubernetes(
         image=DOCKER_IMAGE_GPU,
         service_account="workflows-team-dc",
         namespace="team-dc",
-        gpu=1,
-        cpu=16,
         node_selector={"profile": "gpu-a100-ssd"},
+        persistent_volume_claims=SHARED_PVC,
+        **START_RESOURCES,
     )
     @step
     def start(self):
-        import torch
+        """Download and preprocess once, then fan out one branch per sweep point"""
+        from resource_sampler import ResourceSampler
+        from dataclasses import asdict
 
-        # Query data platform
-        from bdai_tensors.data_platform_location_provider import (
-            DataPlatformLocationProvider,
-        )
+        from training_sweep import expand_sweep, shared_root
 
-        query = f'WHERE JSON_EXTRACT_SCALAR(extra_json, "$.extra_json.task_id") = "{self.task_query_id}"'
-        location_provider = DataPlatformLocationProvider(
-            user_input=query,
-            session_only=True,
-        )
-        locations = location_provider()
-        session_ids = location_provider.resolved_keys
+        sampler = ResourceSampler(interval=10).start()
+
+        # Expand the sweep first so a malformed spec fails before the download
+        self.branches = [asdict(b) for b in expand_sweep(self.sweep, self.config_name)]
+        print(f"Training {len(self.branches)} branch(es)")
+
+        # Per-stage timing, I/O and memory, stored as an artifact and a report
+        from stage_metrics import REPORT_NAME, StageRecorder
+
+        metrics = StageRecorder()
+
+        # Query data platform (memoized; see query_cache.py)
+        from query_cache import resolve_sessions
+
+        with metrics.stage("query"):
+            session_ids = resolve_sessions(
+                [self.task_query_id], ttl_seconds=self.query_ttl
+            ).session_ids
 
         if len(session_ids) > 1:
             raise Exception(
@@ -50,15 +94,22 @@ class TrainFromHDF5(FlowSpec):
         print(f"Processing session: {session_id}")
 
         # Download session data
-        from bdai_cli.data_platform.download import download
+        from fake_platform import get_download
         from tempfile import TemporaryDirectory
 
+        download = get_download()
+
         with TemporaryDirectory() as tmpdir:
-            download(session_id, data_local_path=tmpdir, skip_confirmation=True)
+            with metrics.stage("download", session_id=session_id):
+                download(session_id, data_local_path=tmpdir, skip_confirmation=True)
             self.download_path = tmpdir
 
-            # Set up output directory
-            self.output_dir = "output"
+            # Set up output directory on the shared volume; branch outputs go
+            # next to it, not into it, because it is uploaded while they train
+            self.run_dir = os.path.join(
+                shared_root(), f"train_{self.task_query_id}_{current.run_id}"
+            )
+            self.output_dir = os.path.join(self.run_dir, "output")
             os.makedirs(os.path.join(self.output_dir, "hdf5"), exist_ok=True)
             os.makedirs(os.path.join(self.output_dir, "checkpoints"), exist_ok=True)
 
@@ -89,62 +140,199 @@ class TrainFromHDF5(FlowSpec):
             )
 
         print("Running equidiff data conversion...")
-        subprocess.run(
-            [
-                "python",
-                "/workspaces/bdai/projects/maple/scripts/equidiff/equidiff_data_conversion.py",
-                "--source",
-                f"{self.output_dir}/hdf5",
-                "--output",
-                f"{self.output_dir}/training_data.hdf5",
-                "--point-cloud",
-                "--collected-data",
-                "--force",
-            ],
-            check=True,
-        )
+        with metrics.stage("convert"):
+            subprocess.run(
+                [
+                    "python",
+                    "/workspaces/bdai/projects/maple/scripts/equidiff/equidiff_data_conversion.py",
+                    "--source",
+                    f"{self.output_dir}/hdf5",
+                    "--output",
+                    f"{self.output_dir}/training_data.hdf5",
+                    "--point-cloud",
+                    "--collected-data",
+                    "--force",
+                ],
+                check=True,
+            )
 
-        # Copy training_data.hdf5 to hdf5 directory
-        shutil.copy2(
+        # Link training_data.hdf5 into the hdf5 directory; the upload engine
+        # sends the content once and copies it server-side for the second path
+        from blob_store import dedup_tree, link_or_copy
+
+        link_or_copy(
             os.path.join(self.output_dir, "training_data.hdf5"),
             os.path.join(self.output_dir, "hdf5", "training_data.hdf5"),
         )
 
-        os.environ["WANDB_API_KEY"] = "e654b8d65b121602aede3733bba28ba9610407c7"
-        print("Starting Training")
-        subprocess.run(
-            [
-                "python",
-                "/workspaces/bdai/projects/maple/src/equidiff/train.py",
-                "--config-name=equi_pointcloud_real",
-                f"dataset_path={os.path.join(self.output_dir, 'training_data.hdf5')}",
-                "training.num_epochs=1000",
-                "dataloader.batch_size=192",
-                "dataloader.num_workers=16",
-            ],
-            check=True,
+        self.dataset_path = os.path.join(self.output_dir, "training_data.hdf5")
+
+        # Computed once here so no sweep branch makes its own pass over the data
+        from normalizer_stats import write_stats_sidecar
+
+        with metrics.stage("stats"):
+            write_stats_sidecar(self.dataset_path)
+
+        self.dst = f"gs://project-maple-main-storage/data/HIL_test/{self.task_query_id}"
+
+        with metrics.stage("dedup"):
+            dedup_report = dedup_tree(self.output_dir)
+        self.dedup_report = dedup_report.to_dict()
+        print(dedup_report.summary())
+
+        # upload_outputs adds its stage and ships the report with the outputs
+        self.stage_metrics = metrics.to_dict()
+        print(metrics.summary())
+
+        sampler.stop()
+        self.resource_usage = sampler.report(START_RESOURCES)
+        recommendation = self.resource_usage["recommendation"]
+        print(f"Recommended resources: {recommendation['decorator']}")
+        for note in recommendation["notes"]:
+            print(f"  {note}")
+
+        # Upload and training only read the preprocessed data, so they overlap
+        self.next(self.upload_outputs, self.fan_out)
+
+    @kubernetes(
+        image=DOCKER_IMAGE_GPU,
+        service_account="workflows-team-dc",
+        namespace="team-dc",
+        persistent_volume_claims=SHARED_PVC,
+        **UPLOAD_RESOURCES,
+    )
+    @step
+    def upload_outputs(self):
+        """Upload the preprocessed outputs while the sweep branches train"""
+        from stage_metrics import REPORT_NAME, StageRecord, StageRecorder
+        from upload_engine import upload_tree
+
+        metrics = StageRecorder()
+        metrics.records = [StageRecord(**r) for r in self.stage_metrics["stages"]]
+        with metrics.stage("upload"):
+            self.upload_report = upload_tree(
+                self.output_dir, self.dst, workers=UPLOAD_RESOURCES["cpu"]
+            ).to_dict()
+        print(f"Data uploaded to {self.dst}")
+
+        self.stage_metrics = metrics.to_dict()
+        print(metrics.summary())
+        metrics.write_json(
+            os.path.join(self.output_dir, REPORT_NAME),
+            flow="TrainFromHDF5",
+            task_id=self.task_query_id,
         )
+        upload_tree(self.output_dir, self.dst, keys=[REPORT_NAME])
 
-        # Copy checkpoint
-        checkpoint_path = subprocess.run(
-            ["find", "/metaflow/data", "-name", "latest.ckpt"],
-            capture_output=True,
-            text=True,
-            check=True,
-        ).stdout.strip()
+        self.next(self.join)
 
-        if checkpoint_path:
-            shutil.copy2(
-                checkpoint_path,
-                os.path.join(self.output_dir, "checkpoints/latest.ckpt"),
-            )
+    @step
+    def fan_out(self):
+        """Start one training branch per sweep point"""
+        self.next(self.train, foreach="branches")
+
+    @kubernetes(
+        image=DOCKER_IMAGE_GPU,
+        service_account="workflows-team-dc",
+        namespace="team-dc",
+        node_selector={"profile": "gpu-a100-ssd"},
+        persistent_volume_claims=SHARED_PVC,
+        **TRAIN_RESOURCES,
+    )
+    @step
+    def train(self):
+        """Train one sweep branch on the shared preprocessed dataset"""
+        from resource_sampler import ResourceSampler
+        from stage_metrics import StageRecorder
+        from training_sweep import SweepBranch, get_trainer, run_branch
+
+        sampler = ResourceSampler(interval=10).start()
+        metrics = StageRecorder()
+
+        branch = SweepBranch(**self.input)
+        branch_dir = os.path.join(self.run_dir, "sweeps", branch.name)
+        trainer = get_trainer(self.trainer)
+        print(f"Training branch {branch.name} on {self.dataset_path}")
+
+        # A single branch keeps the original checkpoint location
+        checkpoint_dst = f"{self.dst}/checkpoints"
+        if len(self.branches) > 1:
+            checkpoint_dst = f"{self.dst}/sweeps/{branch.name}/checkpoints"
+
+        # Upload checkpoints as training writes them
+        from checkpoint_watcher import CheckpointWatcher
+
+        checkpoint_root = getattr(trainer, "checkpoint_dir", lambda d: d)(branch_dir)
+        watcher = CheckpointWatcher(checkpoint_root, checkpoint_dst).start()
+
+        try:
+            os.environ["WANDB_API_KEY"] = "e654b8d65b121602aede3733bba28ba9610407c7"
+            with metrics.stage("train", branch=branch.name):
+                result = run_branch(self.dataset_path, branch, branch_dir, trainer)
+        finally:
+            with metrics.stage("checkpoint_upload", branch=branch.name):
+                lineage = watcher.finish()
+
+        sampler.stop()
+        result["checkpoint_lineage"] = lineage
+        result["checkpoint_destination"] = checkpoint_dst
+        result["stage_metrics"] = metrics.to_dict()
+        result["resource_usage"] = sampler.report(TRAIN_RESOURCES)
+        self.branch_result = result
+        print(metrics.summary())
 
-        # Upload to GCS
-        dst = f"gs://project-maple-main-storage/data/HIL_test/{self.task_query_id}"
-        subprocess.run(
-            ["gcloud", "storage", "cp", "-r", self.output_dir, dst], check=True
+        self.next(self.join_branches)
+
+    @step
+    def join_branches(self, inputs):
+        """Collect every branch's result and ship the sweep summary"""
+        self.branch_results = sorted(
+            (input_obj.branch_result for input_obj in inputs),
+            key=lambda result: result["branch"]["name"],
         )
+        self.merge_artifacts(inputs, exclude=["branch_result"])
+
+        for result in self.branch_results:
+            print(
+                f"{result['branch']['name']}: {result['seconds']:.0f}s, "
+                f"checkpoints in {result['checkpoint_destination']}"
+            )
+
+        from tempfile import TemporaryDirectory
+
+        from upload_engine import upload_tree
+
+        # This step has no PVC mount, so the summary is written locally
+        try:
+            with TemporaryDirectory() as tmpdir:
+                summary_path = os.path.join(tmpdir, "sweep_results.json")
+                with open(summary_path, "w") as f:
+                    json.dump(self.branch_results, f, indent=2)
+                upload_tree(tmpdir, self.dst, keys=["sweep_results.json"])
+        except Exception as e:
+            print(f"Error uploading sweep results: {str(e)}")
+
+        self.next(self.join)
+
+    @kubernetes(
+        image=DOCKER_IMAGE_GPU,
+        service_account="workflows-team-dc",
+        namespace="team-dc",
+        persistent_volume_claims=SHARED_PVC,
+        **CLEANUP_RESOURCES,
+    )
+    @step
+    def join(self, inputs):
+        """Wait for both the upload and the sweep, then free the shared volume"""
+        # Only upload_outputs extends the preprocessing stage metrics
+        self.stage_metrics = inputs.upload_outputs.stage_metrics
+        self.merge_artifacts(inputs, exclude=["stage_metrics"])
 
+        # upload_tree and CheckpointWatcher.finish raise on failed uploads, so
+        # reaching here means the outputs and checkpoints are in GCS; the rest
+        # of the branch directories is scratch, as in a pod-local run
+        print(f"Removing {self.run_dir}")
+        shutil.rmtree(self.run_dir, ignore_errors=True)
         self.next(self.end)
 
     @step
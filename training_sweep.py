@@ -0,0 +1,305 @@
+#!/usr/bin/env python3
+
+import argparse
+import importlib
+import itertools
+import json
+import os
+import re
+import subprocess
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict, dataclass, field
+from typing import Callable, Dict, List, Optional, Union
+
+TRAIN_SCRIPT = "/workspaces/bdai/projects/maple/src/equidiff/train.py"
+DEFAULT_CONFIG = "equi_pointcloud_real"
+DEFAULT_OVERRIDES = [
+    "training.num_epochs=1000",
+    "dataloader.batch_size=192",
+    "dataloader.num_workers=16",
+]
+SHARED_ROOT_ENV = "MAPLE_SHARED_ROOT"
+DEFAULT_SHARED_ROOT = "/mnt/shared"  # metaflow-pvc mount, see pvc.yaml
+TRAINER_ENV = "MAPLE_SWEEP_TRAINER"
+CONFIG_KEY = "--config-name"
+
+
+@dataclass
+class SweepBranch:
+    """One training run of a sweep: a Hydra config name plus overrides."""
+
+    name: str
+    config_name: str = DEFAULT_CONFIG
+    overrides: List[str] = field(default_factory=lambda: list(DEFAULT_OVERRIDES))
+
+
+def shared_root() -> str:
+    """Directory every step can see: the PVC, or ``$MAPLE_SHARED_ROOT`` locally."""
+    return os.environ.get(SHARED_ROOT_ENV, DEFAULT_SHARED_ROOT)
+
+
+def cache_root() -> str:
+    """Cache directory: the shared root when mounted (pods are fresh), else ~/.cache."""
+    root = shared_root()
+    if os.path.isdir(root):
+        return root
+    return os.path.join(os.path.expanduser("~"), ".cache")
+
+
+def _split_values(values: str) -> List[str]:
+    # Hydra sweep syntax: commas separate choices, except inside [] or ()
+    parts, depth, current = [], 0, ""
+    for char in values:
+        if char in "[(":
+            depth += 1
+        elif char in "])":
+            depth -= 1
+        if char == "," and depth == 0:
+            parts.append(current)
+            current = ""
+        else:
+            current += char
+    parts.append(current)
+    return [part.strip() for part in parts if part.strip()]
+
+
+def _branch_name(index: int, choices: Dict[str, str]) -> str:
+    label = "_".join(
+        f"{key.split('.')[-1].lstrip('-')}-{value}" for key, value in choices.items()
+    )
+    label = re.sub(r"[^A-Za-z0-9_.-]+", "", label)[:60]
+    return f"{index:03d}_{label}" if label else f"{index:03d}"
+
+
+def expand_sweep(
+    spec: str = "",
+    config_name: str = DEFAULT_CONFIG,
+    base_overrides: Optional[List[str]] = None,
+) -> List[SweepBranch]:
+    """
+    Expand a Hydra multirun-style spec into the grid of branches.
+
+    ``spec`` is whitespace-separated ``key=a,b,c`` terms, as on a Hydra ``-m``
+    command line; ``--config-name=x,y`` sweeps the config too. Every branch
+    starts from ``base_overrides`` and replaces the keys the spec sets. An empty
+    spec is a single branch with the base overrides.
+
+    Args:
+        spec (str): e.g. ``"training.num_epochs=500,1000 dataloader.batch_size=128,192"``
+        config_name (str): Config used when the spec does not sweep it
+        base_overrides (Optional[List[str]]): Overrides shared by every branch
+
+    Returns:
+        List[SweepBranch]: The Cartesian product of the choices
+    """
+    base = list(DEFAULT_OVERRIDES if base_overrides is None else base_overrides)
+    axes: Dict[str, List[str]] = {}
+    for term in spec.split():
+        if "=" not in term:
+            raise ValueError(f"Sweep term {term!r} is not key=value[,value...]")
+        key, values = term.split("=", 1)
+        axes[key] = _split_values(values)
+        if not axes[key]:
+            raise ValueError(f"Sweep term {term!r} has no values")
+
+    branches = []
+    for index, combo in enumerate(itertools.product(*axes.values())):
+        choices = dict(zip(axes, combo))
+        overrides = [o for o in base if o.split("=", 1)[0] not in choices]
+        overrides += [f"{k}={v}" for k, v in choices.items() if k != CONFIG_KEY]
+        branches.append(
+            SweepBranch(
+                name=_branch_name(index, choices),
+                config_name=choices.get(CONFIG_KEY, config_name),
+                overrides=overrides,
+            )
+        )
+    return branches
+
+
+class EquidiffTrainer:
+    """Runs ``equidiff/train.py`` with the branch's config and overrides."""
+
+    def __init__(self, script: str = TRAIN_SCRIPT):
+        self.script = script
+
+    def __call__(self, dataset_path: str, branch: SweepBranch, output_dir: str) -> Dict:
+        cmd = [
+            "python",
+            self.script,
+            f"--config-name={branch.config_name}",
+            f"dataset_path={dataset_path}",
+            *branch.overrides,
+        ]
+        print(f"Training {branch.name}: {' '.join(cmd)}")
+        subprocess.run(cmd, check=True)
+        return {"command": cmd}
+
+    def checkpoint_dir(self, output_dir: str) -> str:
+        # train.py writes its Hydra run directories here, not to output_dir
+        return "/metaflow/data"
+
+
+class StubTrainer:
+    """
+    Stand-in trainer for testing sweep scheduling and data sharing locally.
+
+    It opens the shared dataset read-only, counts its demos and samples, and
+    writes a small checkpoint file per "epoch" (capped at 3) into
+    ``output_dir/checkpoints``. The dataset's inode is reported so a test can
+    confirm every branch read the same file rather than a copy.
+    """
+
+    def __init__(self, seconds_per_epoch: float = 0.0):
+        self.seconds_per_epoch = seconds_per_epoch
+
+    def __call__(self, dataset_path: str, branch: SweepBranch, output_dir: str) -> Dict:
+        settings = dict(o.split("=", 1) for o in branch.overrides if "=" in o)
+        epochs = min(3, int(settings.get("training.num_epochs", 1)))
+        if os.path.isdir(dataset_path):
+            demos = len([n for n in os.listdir(dataset_path) if n.endswith(".npy")])
+            samples = None
+        else:
+            import h5py
+
+            with h5py.File(dataset_path, "r") as f:
+                demos = len(f["data"]) if "data" in f else 0
+                samples = int(f["data"].attrs.get("total", 0)) if "data" in f else 0
+
+        checkpoint_dir = os.path.join(output_dir, "checkpoints")
+        os.makedirs(checkpoint_dir, exist_ok=True)
+        for epoch in range(epochs):
+            time.sleep(self.seconds_per_epoch)
+            with open(os.path.join(checkpoint_dir, f"epoch={epoch:04d}.ckpt"), "w") as f:
+                json.dump({"branch": branch.name, "epoch": epoch}, f)
+        st = os.stat(dataset_path)
+        return {
+            "demos": demos,
+            "samples": samples,
+            "epochs": epochs,
+            "dataset_inode": [st.st_dev, st.st_ino],
+        }
+
+    def checkpoint_dir(self, output_dir: str) -> str:
+        return os.path.join(output_dir, "checkpoints")
+
+
+TRAINERS: Dict[str, Callable[[], Callable]] = {
+    "equidiff": EquidiffTrainer,
+    "stub": StubTrainer,
+}
+
+
+def get_trainer(name: Optional[str] = None) -> Callable:
+    """
+    Resolve a trainer by name: ``equidiff``, ``stub`` or ``module:callable``.
+
+    ``name`` defaults to ``$MAPLE_SWEEP_TRAINER``, then ``equidiff``. A
+    ``module:callable`` target is called with no arguments to build the trainer.
+    """
+    name = name or os.environ.get(TRAINER_ENV, "equidiff")
+    if name in TRAINERS:
+        return TRAINERS[name]()
+    if ":" not in name:
+        raise ValueError(
+            f"Unknown trainer {name!r}; use {sorted(TRAINERS)} or module:attr"
+        )
+    module, attr = name.split(":", 1)
+    return getattr(importlib.import_module(module), attr)()
+
+
+def run_branch(
+    dataset_path: str,
+    branch: SweepBranch,
+    output_dir: str,
+    trainer: Union[str, Callable, None] = None,
+) -> Dict:
+    """
+    Train one branch against the shared dataset.
+
+    Args:
+        dataset_path (str): Shared ``training_data.hdf5`` (or flat export); never copied
+        branch (SweepBranch): Config and overrides to train with
+        output_dir (str): Branch-private output directory
+        trainer (Union[str, Callable, None]): Trainer or a name for :func:`get_trainer`
+
+    Returns:
+        Dict: The branch, its output directory, wall time and the trainer's info
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    if trainer is None or isinstance(trainer, str):
+        trainer = get_trainer(trainer)
+    start = time.perf_counter()
+    info = trainer(dataset_path, branch, output_dir)
+    return {
+        "branch": asdict(branch),
+        "output_dir": output_dir,
+        "seconds": time.perf_counter() - start,
+        "info": info,
+    }
+
+
+def _run_branch_args(args) -> Dict:
+    return run_branch(*args)
+
+
+def run_sweep(
+    dataset_path: str,
+    branches: List[SweepBranch],
+    output_dir: str,
+    trainer: Optional[str] = None,
+    workers: int = 1,
+) -> List[Dict]:
+    """Run every branch locally, ``workers`` processes at a time, on one dataset."""
+    jobs = [
+        (dataset_path, branch, os.path.join(output_dir, branch.name), trainer)
+        for branch in branches
+    ]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(_run_branch_args, jobs))
+
+
+def parse_arguments() -> argparse.Namespace:
+    """
+    Parse command line arguments.
+
+    Returns:
+        argparse.Namespace: Parsed command line arguments
+    """
+    parser = argparse.ArgumentParser(
+        description="Expand a training sweep and run it locally on one dataset",
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+    )
+    parser.add_argument("dataset", type=str, help="training_data.hdf5 or flat directory")
+    parser.add_argument("--sweep", type=str, default="", help="Hydra key=a,b terms")
+    parser.add_argument("--config-name", type=str, default=DEFAULT_CONFIG)
+    parser.add_argument("--trainer", type=str, default="stub", help="Trainer name")
+    parser.add_argument("--workers", type=int, default=2, help="Concurrent branches")
+    parser.add_argument(
+        "--output", type=str, default="sweep_output", help="Branch outputs"
+    )
+    parser.add_argument("--dry-run", action="store_true", help="Only list the branches")
+    return parser.parse_args()
+
+
+def main() -> None:
+    """Print the branches, then run them unless ``--dry-run``."""
+    args = parse_arguments()
+    branches = expand_sweep(args.sweep, args.config_name)
+    for branch in branches:
+        overrides = " ".join(branch.overrides)
+        print(f"{branch.name}: --config-name={branch.config_name} {overrides}")
+    if args.dry_run:
+        return
+    start = time.perf_counter()
+    results = run_sweep(args.dataset, branches, args.output, args.trainer, args.workers)
+    inodes = {tuple(r["info"].get("dataset_inode", ())) for r in results}
+    print(
+        f"Ran {len(results)} branches in {time.perf_counter() - start:.1f}s with "
+        f"{args.workers} workers; {len(inodes)} distinct dataset file(s) read"
+    )
+
+
+if __name__ == "__main__":
+    main()
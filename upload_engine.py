@@ -0,0 +1,576 @@
+#!/usr/bin/env python3
+
+import argparse
+import hashlib
+import json
+import os
+import posixpath
+import shutil
+import tempfile
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import asdict, dataclass
+from typing import Dict, List, Optional, Set
+
+from content_hash import file_digest, stat_key
+
+MANIFEST_NAME = ".upload_manifest.json"
+# Older runs kept the hash cache inside the tree; such files are still skipped
+HASH_CACHE_NAME = ".upload_hash_cache.json"
+HASH_CACHE_DIR_ENV = "MAPLE_UPLOAD_HASH_CACHE"
+PART_SIZE = 64 * 1024 * 1024
+MULTIPART_THRESHOLD = 256 * 1024 * 1024
+COPY_BUFFER = 8 * 1024 * 1024
+
+
+class StorageBackend:
+    """
+    Destination of an upload, rooted at one prefix.
+
+    Keys are POSIX-style paths relative to the root. Large files are sent as
+    numbered parts under a per-file ``token`` (the content hash) and then
+    composed, so an interrupted upload resumes from the parts that made it.
+    """
+
+    def read_manifest(self) -> Optional[Dict]:
+        raise NotImplementedError
+
+    def write_manifest(self, manifest: Dict) -> None:
+        raise NotImplementedError
+
+    def put_file(self, local_path: str, key: str) -> None:
+        raise NotImplementedError
+
+    def existing_parts(self, key: str, token: str) -> Set[int]:
+        raise NotImplementedError
+
+    def put_part(
+        self, local_path: str, offset: int, length: int, key: str, token: str, index: int
+    ) -> None:
+        raise NotImplementedError
+
+    def compose(self, key: str, token: str, num_parts: int) -> None:
+        raise NotImplementedError
+
+    def copy(self, src_key: str, dst_key: str) -> None:
+        """Server-side copy of an object that is already at the destination."""
+        raise NotImplementedError
+
+
+class LocalBackend(StorageBackend):
+    """Directory stand-in for an object store, used for tests and benchmarks."""
+
+    def __init__(self, root: str):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+
+    def __repr__(self) -> str:
+        return f"LocalBackend({self.root!r})"
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.root, *key.split("/"))
+
+    def _parts_dir(self, token: str) -> str:
+        return os.path.join(self.root, ".parts", token)
+
+    def read_manifest(self) -> Optional[Dict]:
+        path = self._path(MANIFEST_NAME)
+        if not os.path.isfile(path):
+            return None
+        with open(path, "r") as f:
+            return json.load(f)
+
+    def write_manifest(self, manifest: Dict) -> None:
+        path = self._path(MANIFEST_NAME)
+        with open(path + ".tmp", "w") as f:
+            json.dump(manifest, f, indent=2)
+        os.replace(path + ".tmp", path)
+
+    def put_file(self, local_path: str, key: str) -> None:
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        shutil.copyfile(local_path, path + ".tmp")
+        os.replace(path + ".tmp", path)
+
+    def existing_parts(self, key: str, token: str) -> Set[int]:
+        parts_dir = self._parts_dir(token)
+        if not os.path.isdir(parts_dir):
+            return set()
+        return {int(name) for name in os.listdir(parts_dir) if name.isdigit()}
+
+    def put_part(
+        self, local_path: str, offset: int, length: int, key: str, token: str, index: int
+    ) -> None:
+        parts_dir = self._parts_dir(token)
+        os.makedirs(parts_dir, exist_ok=True)
+        part_path = os.path.join(parts_dir, f"{index:05d}")
+        with open(local_path, "rb") as src, open(part_path + ".tmp", "wb") as dst:
+            src.seek(offset)
+            _copy_range(src, dst, length)
+        os.replace(part_path + ".tmp", part_path)
+
+    def compose(self, key: str, token: str, num_parts: int) -> None:
+        parts_dir = self._parts_dir(token)
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path + ".tmp", "wb") as dst:
+            for index in range(num_parts):
+                with open(os.path.join(parts_dir, f"{index:05d}"), "rb") as src:
+                    shutil.copyfileobj(src, dst, COPY_BUFFER)
+        os.replace(path + ".tmp", path)
+        shutil.rmtree(parts_dir, ignore_errors=True)
+
+    def copy(self, src_key: str, dst_key: str) -> None:
+        path = self._path(dst_key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        shutil.copyfile(self._path(src_key), path + ".tmp")
+        os.replace(path + ".tmp", path)
+
+
+class GCSBackend(StorageBackend):
+    """Google Cloud Storage destination using ``google-cloud-storage``."""
+
+    # GCS compose accepts at most 32 source objects per call
+    MAX_COMPOSE = 32
+
+    def __init__(self, url: str):
+        from google.cloud import storage
+
+        bucket, _, prefix = url[len("gs://") :].partition("/")
+        self.url = url
+        self.prefix = prefix.strip("/")
+        self._bucket_name = bucket
+        self._storage = storage
+        self._local = threading.local()
+
+    def __repr__(self) -> str:
+        return f"GCSBackend({self.url!r})"
+
+    @property
+    def _bucket(self):
+        # Clients are not shared across threads
+        if not hasattr(self._local, "bucket"):
+            self._local.bucket = self._storage.Client().bucket(self._bucket_name)
+        return self._local.bucket
+
+    def _name(self, key: str) -> str:
+        return posixpath.join(self.prefix, key) if self.prefix else key
+
+    def _part_name(self, token: str, index: int) -> str:
+        return self._name(f".parts/{token}/{index:05d}")
+
+    def read_manifest(self) -> Optional[Dict]:
+        blob = self._bucket.blob(self._name(MANIFEST_NAME))
+        if not blob.exists():
+            return None
+        return json.loads(blob.download_as_bytes())
+
+    def write_manifest(self, manifest: Dict) -> None:
+        blob = self._bucket.blob(self._name(MANIFEST_NAME))
+        blob.upload_from_string(
+            json.dumps(manifest, indent=2), content_type="application/json"
+        )
+
+    def put_file(self, local_path: str, key: str) -> None:
+        self._bucket.blob(self._name(key)).upload_from_filename(local_path)
+
+    def existing_parts(self, key: str, token: str) -> Set[int]:
+        prefix = self._name(f".parts/{token}/")
+        blobs = self._bucket.list_blobs(prefix=prefix)
+        names = [blob.name.rsplit("/", 1)[-1] for blob in blobs]
+        return {int(name) for name in names if name.isdigit()}
+
+    def put_part(
+        self, local_path: str, offset: int, length: int, key: str, token: str, index: int
+    ) -> None:
+        with open(local_path, "rb") as f:
+            f.seek(offset)
+            data = f.read(length)
+        self._bucket.blob(self._part_name(token, index)).upload_from_string(data)
+
+    def compose(self, key: str, token: str, num_parts: int) -> None:
+        sources = [self._bucket.blob(self._part_name(token, i)) for i in range(num_parts)]
+        round_index = 0
+        while len(sources) > self.MAX_COMPOSE:
+            grouped = []
+            for start in range(0, len(sources), self.MAX_COMPOSE):
+                target = self._bucket.blob(
+                    self._name(f".parts/{token}/compose-{round_index}-{start:05d}")
+                )
+                target.compose(sources[start : start + self.MAX_COMPOSE])
+                grouped.append(target)
+            sources = grouped
+            round_index += 1
+        self._bucket.blob(self._name(key)).compose(sources)
+        for blob in list(self._bucket.list_blobs(prefix=self._name(f".parts/{token}/"))):
+            blob.delete()
+
+    def copy(self, src_key: str, dst_key: str) -> None:
+        bucket = self._bucket
+        bucket.copy_blob(bucket.blob(self._name(src_key)), bucket, self._name(dst_key))
+
+
+def get_backend(dst: str) -> StorageBackend:
+    """Return the backend for a ``gs://`` URL or a local directory path."""
+    if dst.startswith("gs://"):
+        from fake_platform import active_platform
+
+        platform = active_platform()
+        if platform is not None:
+            return platform.storage_backend(dst)
+        return GCSBackend(dst)
+    if dst.startswith("file://"):
+        dst = dst[len("file://") :]
+    return LocalBackend(dst)
+
+
+def _copy_range(src, dst, length: int) -> None:
+    remaining = length
+    while remaining > 0:
+        chunk = src.read(min(COPY_BUFFER, remaining))
+        if not chunk:
+            break
+        dst.write(chunk)
+        remaining -= len(chunk)
+
+
+def hash_cache_path(src: str, cache_dir: Optional[str] = None) -> str:
+    """
+    Hash cache file for a tree, kept outside it so uploads never include it.
+
+    Args:
+        src (str): Directory being described
+        cache_dir (Optional[str]): Cache directory (default ``$MAPLE_UPLOAD_HASH_CACHE``)
+
+    Returns:
+        str: One JSON file per absolute ``src`` path
+    """
+    cache_dir = cache_dir or os.environ.get(
+        HASH_CACHE_DIR_ENV,
+        os.path.join(os.path.expanduser("~"), ".cache", "maple_upload_hashes"),
+    )
+    name = hashlib.sha1(os.path.abspath(src).encode()).hexdigest()
+    return os.path.join(cache_dir, f"{name}.json")
+
+
+def _write_hash_cache(path: str, cache: Dict) -> None:
+    # Background and final passes may describe the same tree concurrently, so
+    # each writes a private temp file and swaps it in
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        with os.fdopen(fd, "w") as f:
+            json.dump(cache, f)
+        os.replace(tmp_path, path)
+    except OSError as e:
+        print(f"Warning: could not write upload hash cache: {e}")
+
+
+def build_manifest(src: str, keys: Optional[List[str]] = None) -> Dict[str, Dict]:
+    """
+    Describe every file under ``src`` by size and SHA-256.
+
+    Hashes are reused from a cache file (see :func:`hash_cache_path`) when size
+    and mtime are unchanged, so re-running on a mostly unchanged tree only
+    hashes new files.
+
+    Args:
+        src (str): Directory (or single file) to describe
+        keys (Optional[List[str]]): Only describe these relative paths
+
+    Returns:
+        Dict[str, Dict]: ``{relative_path: {"size", "sha256"}}``
+    """
+    if os.path.isfile(src):
+        entry = {"size": os.path.getsize(src), "sha256": file_digest(src)}
+        return {os.path.basename(src): entry}
+
+    cache_path = hash_cache_path(src)
+    try:
+        with open(cache_path, "r") as f:
+            cache = json.load(f)
+    except (OSError, ValueError):
+        cache = {}
+
+    if keys is None:
+        keys = []
+        for root, dirs, files in os.walk(src):
+            dirs.sort()
+            for name in sorted(files):
+                if name in (HASH_CACHE_NAME, MANIFEST_NAME):
+                    continue
+                rel = os.path.relpath(os.path.join(root, name), src)
+                keys.append(rel.replace(os.sep, "/"))
+        new_cache = {}
+    else:
+        new_cache = dict(cache)
+
+    manifest = {}
+    for rel in keys:
+        path = os.path.join(src, *rel.split("/"))
+        try:
+            size, mtime_ns = stat_key(path)
+        except FileNotFoundError:
+            continue
+        cached = cache.get(rel)
+        if cached and cached["size"] == size and cached["mtime_ns"] == mtime_ns:
+            digest = cached["sha256"]
+        else:
+            digest = file_digest(path)
+        manifest[rel] = {"size": size, "sha256": digest}
+        new_cache[rel] = {"size": size, "mtime_ns": mtime_ns, "sha256": digest}
+
+    _write_hash_cache(cache_path, new_cache)
+    return manifest
+
+
+@dataclass
+class UploadReport:
+    destination: str
+    files_total: int = 0
+    files_uploaded: int = 0
+    files_skipped: int = 0
+    bytes_uploaded: int = 0
+    bytes_skipped: int = 0
+    files_deduplicated: int = 0
+    bytes_deduplicated: int = 0
+    parts_resumed: int = 0
+    seconds: float = 0.0
+
+    @property
+    def throughput_mb_s(self) -> float:
+        return self.bytes_uploaded / max(self.seconds, 1e-9) / 1e6
+
+    def to_dict(self) -> Dict:
+        result = asdict(self)
+        result["throughput_mb_s"] = self.throughput_mb_s
+        return result
+
+    def summary(self) -> str:
+        return (
+            f"Uploaded {self.files_uploaded}/{self.files_total} files "
+            f"({self.bytes_uploaded / 1e6:.1f} MB, {self.throughput_mb_s:.1f} MB/s) "
+            f"to {self.destination} in {self.seconds:.1f}s; "
+            f"skipped {self.files_skipped} unchanged "
+            f"({self.bytes_skipped / 1e6:.1f} MB), "
+            f"deduplicated {self.files_deduplicated} "
+            f"({self.bytes_deduplicated / 1e6:.1f} MB)"
+        )
+
+
+class UploadEngine:
+    """
+    Delta uploader: compares local and remote manifests and ships only changes.
+
+    Manifest entries are keyed by content hash, so a file whose bytes already
+    exist at the destination (or that is a duplicate of another file in the
+    same upload) is materialized with a server-side copy instead of being
+    transferred again.
+
+    Args:
+        backend (StorageBackend): Destination
+        workers (int): Concurrent file/part uploads
+        part_size (int): Bytes per part for multipart uploads
+        multipart_threshold (int): Files at least this large are sent in parts
+    """
+
+    def __init__(
+        self,
+        backend: StorageBackend,
+        workers: int = 8,
+        part_size: int = PART_SIZE,
+        multipart_threshold: int = MULTIPART_THRESHOLD,
+    ):
+        self.backend = backend
+        self.workers = workers
+        self.part_size = part_size
+        self.multipart_threshold = multipart_threshold
+
+    def upload(self, src: str, keys: Optional[List[str]] = None) -> UploadReport:
+        """
+        Upload new or changed files under ``src``.
+
+        The remote manifest is rewritten even when some files fail, so the
+        next attempt skips everything that already arrived.
+
+        Args:
+            src (str): Local directory (or single file)
+            keys (Optional[List[str]]): Restrict the upload to these relative paths
+
+        Returns:
+            UploadReport: What was transferred and how fast
+        """
+        start = time.perf_counter()
+        local = build_manifest(src, keys)
+        remote = self.backend.read_manifest() or {}
+        report = UploadReport(destination=repr(self.backend), files_total=len(local))
+
+        pending = []
+        for rel, entry in local.items():
+            if remote.get(rel, {}).get("sha256") == entry["sha256"]:
+                report.files_skipped += 1
+                report.bytes_skipped += entry["size"]
+            else:
+                pending.append(rel)
+
+        # Largest first keeps the pool busy at the end of the transfer
+        pending.sort(key=lambda rel: local[rel]["size"], reverse=True)
+        base = os.path.dirname(src) if os.path.isfile(src) else src
+        # A key about to be overwritten is no copy source: the copy could read
+        # the new content while the manifest records the old
+        overwritten = set(pending)
+        remote_by_hash = {
+            entry["sha256"]: key
+            for key, entry in remote.items()
+            if key not in overwritten
+        }
+        primaries: Dict[str, str] = {}
+        duplicates: Dict[str, List[str]] = {}
+        errors = []
+        try:
+            with ThreadPoolExecutor(max_workers=self.workers) as pool:
+                futures = {}
+                parts_left = {}
+                for rel in pending:
+                    path = os.path.join(base, rel)
+                    entry = local[rel]
+                    token = entry["sha256"]
+                    if token in remote_by_hash:
+                        future = pool.submit(self.backend.copy, remote_by_hash[token], rel)
+                        futures[future] = ("copy", rel)
+                        continue
+                    if token in primaries:
+                        duplicates.setdefault(token, []).append(rel)
+                        continue
+                    primaries[token] = rel
+                    if entry["size"] < self.multipart_threshold:
+                        future = pool.submit(self.backend.put_file, path, rel)
+                        futures[future] = ("file", rel)
+                        continue
+                    # Parts of large files go through the same pool as small
+                    # files so one big file still uploads in parallel
+                    num_parts = -(-entry["size"] // self.part_size)
+                    done = self.backend.existing_parts(rel, token)
+                    report.parts_resumed += len(done & set(range(num_parts)))
+                    missing = [i for i in range(num_parts) if i not in done]
+                    parts_left[rel] = len(missing)
+                    for index in missing:
+                        offset = index * self.part_size
+                        length = min(self.part_size, entry["size"] - offset)
+                        future = pool.submit(
+                            self.backend.put_part, path, offset, length, rel, token, index
+                        )
+                        futures[future] = ("part", rel)
+                    if not missing:
+                        future = pool.submit(self.backend.compose, rel, token, num_parts)
+                        futures[future] = ("file", rel)
+
+                while futures:
+                    finished, _ = wait(futures, return_when=FIRST_COMPLETED)
+                    for future in finished:
+                        kind, rel = futures.pop(future)
+                        token = local[rel]["sha256"]
+                        try:
+                            future.result()
+                        except Exception as e:
+                            errors.append(f"{rel}: {e}")
+                            parts_left.pop(rel, None)
+                            for duplicate in duplicates.pop(token, []):
+                                errors.append(f"{duplicate}: source {rel} failed")
+                            continue
+                        if kind == "part":
+                            if rel not in parts_left:
+                                continue  # an earlier part of this file failed
+                            parts_left[rel] -= 1
+                            if parts_left[rel] == 0:
+                                num_parts = -(-local[rel]["size"] // self.part_size)
+                                future = pool.submit(
+                                    self.backend.compose, rel, token, num_parts
+                                )
+                                futures[future] = ("file", rel)
+                            continue
+
+                        remote[rel] = local[rel]
+                        if kind == "copy":
+                            report.files_deduplicated += 1
+                            report.bytes_deduplicated += local[rel]["size"]
+                            continue
+                        report.files_uploaded += 1
+                        report.bytes_uploaded += local[rel]["size"]
+                        # The first copy of this content is up, now place the rest
+                        for duplicate in duplicates.pop(token, []):
+                            future = pool.submit(self.backend.copy, rel, duplicate)
+                            futures[future] = ("copy", duplicate)
+        finally:
+            self.backend.write_manifest(remote)
+            report.seconds = time.perf_counter() - start
+
+        if errors:
+            raise RuntimeError(f"{len(errors)} uploads failed:\n  " + "\n  ".join(errors))
+        return report
+
+
+def upload_tree(
+    src: str,
+    dst: str,
+    workers: int = 8,
+    keys: Optional[List[str]] = None,
+    **kwargs,
+) -> UploadReport:
+    """
+    Delta-upload a directory or file to ``dst`` and print a throughput summary.
+
+    Args:
+        src (str): Local directory or file
+        dst (str): ``gs://bucket/prefix`` or a local directory
+        workers (int): Concurrent uploads
+        keys (Optional[List[str]]): Only upload these relative paths under ``src``
+
+    Returns:
+        UploadReport: What was transferred and how fast
+    """
+    engine = UploadEngine(get_backend(dst), workers=workers, **kwargs)
+    report = engine.upload(src, keys=keys)
+    print(report.summary())
+    return report
+
+
+def parse_arguments() -> argparse.Namespace:
+    """
+    Parse command line arguments.
+
+    Returns:
+        argparse.Namespace: Parsed command line arguments
+    """
+    parser = argparse.ArgumentParser(
+        description="Upload only new or changed files to GCS or a local directory",
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+    )
+    parser.add_argument("src", type=str, help="Local directory or file")
+    parser.add_argument("dst", type=str, help="gs://bucket/prefix or local directory")
+    parser.add_argument("--workers", type=int, default=8, help="Concurrent uploads")
+    parser.add_argument("--part-size-mb", type=int, default=PART_SIZE // (1024 * 1024))
+    parser.add_argument(
+        "--multipart-threshold-mb", type=int, default=MULTIPART_THRESHOLD // (1024 * 1024)
+    )
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+    return parser.parse_args()
+
+
+def main() -> None:
+    """Run one delta upload from the command line."""
+    args = parse_arguments()
+    report = upload_tree(
+        args.src,
+        args.dst,
+        workers=args.workers,
+        part_size=args.part_size_mb * 1024 * 1024,
+        multipart_threshold=args.multipart_threshold_mb * 1024 * 1024,
+    )
+    if args.json:
+        print(json.dumps(report.to_dict(), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,255 @@
+#!/usr/bin/env python3
+
+import argparse
+import copy
+import os
+import sys
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import h5py
+import numpy as np
+import yaml
+
+# Resolved at import time: MapleWorkflowLinear chdirs into /workspaces/bdai.
+# Metaflow only packages config/ with --package-suffixes .py,.yaml; without it
+# the pod falls back to DEFAULT_EXPECTATIONS.
+CONFIG_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "config")
+HDF5_SUFFIXES = (".hdf5", ".h5")
+# Mirrors config/world_conf.yaml and config/robot_conf.yaml; keep in sync
+DEFAULT_EXPECTATIONS = {
+    "cameras": ["camera0", "camera1", "camera2"],
+    "robot_states": ["ee_goal_pose", "ee_pose", "gripper_cmd", "joint_states"],
+    "frequency": 5.0,
+}
+
+
+class DataValidationError(Exception):
+    """Raised when a demo fails the pre-training validation gate."""
+
+
+@dataclass
+class ValidationReport:
+    demo_dir: str
+    errors: List[str] = field(default_factory=list)
+    frame_counts: Dict[str, int] = field(default_factory=dict)
+    elapsed_seconds: float = 0.0
+
+    @property
+    def ok(self) -> bool:
+        return not self.errors
+
+
+def load_expectations(config_dir: str = CONFIG_DIR) -> Dict:
+    """
+    Read camera names, state names and sampling frequency from the configs.
+
+    Falls back to :data:`DEFAULT_EXPECTATIONS` when the configs are missing,
+    as they are in a pod whose code package left out ``.yaml`` files.
+
+    Args:
+        config_dir (str): Directory holding ``world_conf.yaml`` and ``robot_conf.yaml``
+
+    Returns:
+        Dict: ``cameras``, ``robot_states`` and ``frequency`` (Hz)
+    """
+    names = ("world_conf.yaml", "robot_conf.yaml")
+    if not all(os.path.isfile(os.path.join(config_dir, n)) for n in names):
+        print(f"Warning: no configs in {config_dir}; using built-in expectations")
+        return copy.deepcopy(DEFAULT_EXPECTATIONS)
+    with open(os.path.join(config_dir, "world_conf.yaml"), "r") as f:
+        world = yaml.safe_load(f)
+    with open(os.path.join(config_dir, "robot_conf.yaml"), "r") as f:
+        robot = yaml.safe_load(f)
+
+    return {
+        "cameras": sorted(t["save_as"] for t in world["topics"]),
+        "robot_states": sorted(t.get("save_as", t["name"]) for t in robot["topics"]),
+        "frequency": float(world["sampling"]["frequency"]),
+    }
+
+
+def _timestamps_to_seconds(timestamps: np.ndarray) -> np.ndarray:
+    timestamps = timestamps.astype(np.float64)
+    # Recorded timestamps are nanoseconds; tolerate second-based files too
+    if len(timestamps) > 1 and np.median(np.diff(timestamps)) > 1e3:
+        return timestamps / 1e9
+    return timestamps
+
+
+def validate_demo(
+    demo_dir: str,
+    expectations: Optional[Dict] = None,
+    dt_tolerance: float = 0.5,
+    max_bad_dt_fraction: float = 0.05,
+) -> ValidationReport:
+    """
+    Check one demo directory using only metadata, timestamps and state arrays.
+
+    Camera pixel data is never read, so this runs in well under a second per
+    demo regardless of resolution.
+
+    Args:
+        demo_dir (str): ``hdf5/demo_N`` directory with the demo's HDF5 files
+        expectations (Optional[Dict]): Output of :func:`load_expectations`
+        dt_tolerance (float): Allowed relative deviation of dt from 1/frequency
+        max_bad_dt_fraction (float): Fraction of out-of-tolerance steps tolerated
+
+    Returns:
+        ValidationReport: Collected errors and per-key frame counts
+    """
+    start = time.perf_counter()
+    expectations = expectations or load_expectations()
+    report = ValidationReport(demo_dir=demo_dir)
+
+    files = sorted(
+        os.path.join(root, name)
+        for root, _, names in os.walk(demo_dir)
+        for name in names
+        if name.endswith(HDF5_SUFFIXES)
+    )
+    if not files:
+        report.errors.append("no HDF5 files in demo directory")
+        return report
+
+    cameras_found = set()
+    found_timestamps = False
+    for path in files:
+        name = os.path.relpath(path, demo_dir)
+        with h5py.File(path, "r") as f:
+            counts = {}
+            for key, dataset in f.items():
+                if not isinstance(dataset, h5py.Dataset) or dataset.ndim == 0:
+                    continue
+                for suffix in ("_rgb", "_depth"):
+                    if key.endswith(suffix):
+                        cameras_found.add(key[: -len(suffix)])
+                if _is_stream(key, expectations):
+                    counts[key] = dataset.shape[0]
+                    report.frame_counts[f"{name}:{key}"] = dataset.shape[0]
+                if (
+                    _is_state(key, expectations)
+                    and dataset.dtype.kind == "f"
+                    and dataset.size
+                ):
+                    values = dataset[()]
+                    nan_steps = np.isnan(values).reshape(len(values), -1).any(axis=1)
+                    if nan_steps.any():
+                        report.errors.append(
+                            f"{name}:{key} has NaNs in {int(nan_steps.sum())} steps"
+                        )
+
+            if counts and min(counts.values()) == 0:
+                report.errors.append(f"{name} is empty: {counts}")
+            elif len(set(counts.values())) > 1:
+                report.errors.append(f"{name} has mismatched frame counts: {counts}")
+
+            if "timestamps" in f:
+                found_timestamps = True
+                _check_timestamps(
+                    f["timestamps"][()],
+                    expectations["frequency"],
+                    dt_tolerance,
+                    max_bad_dt_fraction,
+                    f"{name}:timestamps",
+                    report,
+                )
+
+    expected_cameras = set(expectations["cameras"])
+    if cameras_found != expected_cameras:
+        missing = sorted(expected_cameras - cameras_found)
+        extra = sorted(cameras_found - expected_cameras)
+        report.errors.append(
+            f"camera mismatch with world_conf: missing {missing}, extra {extra}"
+        )
+    if not found_timestamps:
+        report.errors.append("no timestamps dataset found")
+
+    report.elapsed_seconds = time.perf_counter() - start
+    return report
+
+
+def _is_stream(key: str, expectations: Dict) -> bool:
+    if key == "timestamps":
+        return True
+    if any(key.startswith(f"{camera}_") for camera in expectations["cameras"]):
+        return key.endswith(("_rgb", "_depth"))
+    return key in expectations["robot_states"]
+
+
+def _is_state(key: str, expectations: Dict) -> bool:
+    return key in expectations["robot_states"] or "pose" in key or "joint" in key
+
+
+def _check_timestamps(
+    timestamps: np.ndarray,
+    frequency: float,
+    tolerance: float,
+    max_bad_fraction: float,
+    name: str,
+    report: ValidationReport,
+) -> None:
+    if len(timestamps) < 2:
+        return
+    dt = np.diff(_timestamps_to_seconds(timestamps))
+    non_monotonic = int((dt <= 0).sum())
+    if non_monotonic:
+        report.errors.append(f"{name} is not strictly increasing at {non_monotonic} steps")
+
+    expected = 1.0 / frequency
+    bad = np.abs(dt - expected) > tolerance * expected
+    if bad.mean() > max_bad_fraction:
+        report.errors.append(
+            f"{name}: {int(bad.sum())}/{len(dt)} steps have dt outside "
+            f"{expected:.3f}s +/- {tolerance:.0%} (median {np.median(dt):.3f}s)"
+        )
+
+
+def check_demo(demo_dir: str, **kwargs) -> ValidationReport:
+    """Validate a demo and raise :class:`DataValidationError` if it fails."""
+    report = validate_demo(demo_dir, **kwargs)
+    if not report.ok:
+        details = "\n  ".join(report.errors)
+        raise DataValidationError(f"Validation failed for {demo_dir}:\n  {details}")
+    print(f"Validated {demo_dir} in {report.elapsed_seconds * 1000:.0f} ms")
+    return report
+
+
+def parse_arguments() -> argparse.Namespace:
+    """
+    Parse command line arguments.
+
+    Returns:
+        argparse.Namespace: Parsed command line arguments
+    """
+    parser = argparse.ArgumentParser(
+        description="Validate demo HDF5 directories before conversion and training",
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+    )
+    parser.add_argument("demo_dirs", type=Path, nargs="+", help="hdf5/demo_N directories")
+    parser.add_argument("--config-dir", type=str, default=CONFIG_DIR)
+    parser.add_argument("--dt-tolerance", type=float, default=0.5)
+    return parser.parse_args()
+
+
+def main() -> None:
+    """Validate every given demo and exit non-zero if any fails."""
+    args = parse_arguments()
+    expectations = load_expectations(args.config_dir)
+
+    failed = False
+    for demo_dir in args.demo_dirs:
+        report = validate_demo(str(demo_dir), expectations, args.dt_tolerance)
+        status = "OK" if report.ok else "FAILED"
+        print(f"{demo_dir}: {status} ({report.elapsed_seconds * 1000:.0f} ms)")
+        for error in report.errors:
+            print(f"  {error}", file=sys.stderr)
+        failed = failed or not report.ok
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
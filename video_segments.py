@@ -0,0 +1,397 @@
+#!/usr/bin/env python3
+
+import argparse
+import json
+import os
+import shutil
+import struct
+import subprocess
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+from mcap_reader import (
+    MCAP_MAGIC,
+    OP_CHANNEL,
+    OP_DATA_END,
+    OP_FOOTER,
+    OP_HEADER,
+    OP_MESSAGE,
+    OP_SCHEMA,
+    iter_records,
+    read_string,
+)
+from resource_sampler import available_cpus
+
+ENCODER = "video_ripper_cli"
+IMAGE_TOPIC = "/camera/camera1/color/image_raw"
+# Schemas whose messages are each a complete frame, so any message is a valid
+# cut point: every segment's encoder starts a fresh GOP on its first frame
+INDEPENDENT_FRAME_SCHEMAS = (
+    "sensor_msgs/msg/Image",
+    "sensor_msgs/msg/CompressedImage",
+    "foxglove.RawImage",
+    "foxglove.CompressedImage",
+)
+MIN_SEGMENT_FRAMES = 30
+
+
+@dataclass
+class TopicIndex:
+    """The records needed to rewrite one topic, plus its message times."""
+
+    topic: str
+    schema_name: str
+    schema_record: bytes
+    channel_record: bytes
+    channel_id: int
+    header_record: bytes = b""
+    log_times: List[int] = field(default_factory=list)
+
+
+def index_topic(path: str, topic: str) -> TopicIndex:
+    """
+    Scan an MCAP file for one topic's schema, channel and message log times.
+
+    Raises:
+        ValueError: If the topic is missing or its frames are not independently
+            decodable, so segments could not start on a keyframe
+    """
+    schemas: Dict[int, Tuple[str, bytes]] = {}
+    index: Optional[TopicIndex] = None
+    header = b""
+    for opcode, body in iter_records(path):
+        if opcode == OP_HEADER:
+            header = body
+        elif opcode == OP_SCHEMA:
+            (schema_id,) = struct.unpack_from("<H", body, 0)
+            name, _ = read_string(body, 2)
+            schemas[schema_id] = (name, body)
+        elif opcode == OP_CHANNEL and index is None:
+            channel_id, schema_id = struct.unpack_from("<HH", body, 0)
+            channel_topic, _ = read_string(body, 4)
+            if channel_topic == topic:
+                schema_name, schema_body = schemas.get(schema_id, ("", b""))
+                index = TopicIndex(
+                    topic, schema_name, schema_body, body, channel_id, header
+                )
+        elif opcode == OP_MESSAGE and index is not None:
+            channel_id, _, log_time = struct.unpack_from("<HIQ", body, 0)
+            if channel_id == index.channel_id:
+                index.log_times.append(log_time)
+    if index is None or not index.log_times:
+        raise ValueError(f"No messages on {topic} in {path}")
+    if index.schema_name not in INDEPENDENT_FRAME_SCHEMAS:
+        raise ValueError(
+            f"{topic} has schema {index.schema_name!r}; segmenting needs every "
+            f"message to be a keyframe ({', '.join(INDEPENDENT_FRAME_SCHEMAS)})"
+        )
+    return index
+
+
+def plan_segments(
+    log_times: List[int], segments: int, min_frames: int = MIN_SEGMENT_FRAMES
+) -> List[Tuple[int, int]]:
+    """
+    Split a topic into contiguous ``[start, end)`` log-time ranges of equal frame count.
+
+    Boundaries fall on message timestamps, so every segment starts on a whole
+    frame. Segments shorter than ``min_frames`` are merged away because each one
+    pays encoder start-up and a fresh keyframe.
+    """
+    times = sorted(log_times)
+    segments = max(1, min(segments, len(times) // max(1, min_frames)))
+    starts = [times[len(times) * i // segments] for i in range(segments)]
+    ends = starts[1:] + [times[-1] + 1]
+    return list(zip(starts, ends))
+
+
+def split_mcap(
+    path: str, index: TopicIndex, ranges: List[Tuple[int, int]], output_dir: str
+) -> List[str]:
+    """
+    Write one unindexed MCAP per time range holding only ``index.topic``.
+
+    The source is read once; segment files need roughly the topic's share of the
+    source size in scratch space.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    paths = [
+        os.path.join(output_dir, f"segment_{i:04d}.mcap") for i in range(len(ranges))
+    ]
+    files = [open(p, "wb") for p in paths]
+    starts = [start for start, _ in ranges]
+
+    def record(opcode: int, body: bytes) -> bytes:
+        return struct.pack("<BQ", opcode, len(body)) + body
+
+    try:
+        for f in files:
+            f.write(MCAP_MAGIC)
+            f.write(record(OP_HEADER, index.header_record or struct.pack("<II", 0, 0)))
+            if index.schema_record:
+                f.write(record(OP_SCHEMA, index.schema_record))
+            f.write(record(OP_CHANNEL, index.channel_record))
+        current = 0
+        for opcode, body in iter_records(path):
+            if opcode != OP_MESSAGE:
+                continue
+            channel_id, _, log_time = struct.unpack_from("<HIQ", body, 0)
+            if channel_id != index.channel_id:
+                continue
+            # Messages are near-sorted by log time; seek the owning range
+            while current + 1 < len(ranges) and log_time >= starts[current + 1]:
+                current += 1
+            while current > 0 and log_time < starts[current]:
+                current -= 1
+            files[current].write(record(OP_MESSAGE, body))
+        for f in files:
+            f.write(record(OP_DATA_END, struct.pack("<I", 0)))
+            f.write(record(OP_FOOTER, struct.pack("<QQI", 0, 0, 0)))
+            f.write(MCAP_MAGIC)
+    finally:
+        for f in files:
+            f.close()
+    return paths
+
+
+def encode(
+    mcap_path: str, output: str, topic: str = IMAGE_TOPIC, encoder: str = ENCODER
+) -> None:
+    """Rip ``topic`` from one MCAP file into ``output`` with the encoder CLI."""
+    subprocess.run(
+        [encoder, "--image-topic", topic, mcap_path, output],
+        check=True,
+        stdout=subprocess.DEVNULL,
+    )
+
+
+def concat_videos(parts: List[str], output: str) -> None:
+    """Join encoded segments without re-encoding (ffmpeg concat demuxer)."""
+    list_path = output + ".segments.txt"
+    with open(list_path, "w") as f:
+        for part in parts:
+            f.write(f"file '{os.path.abspath(part)}'\n")
+    try:
+        subprocess.run(
+            [
+                "ffmpeg", "-y", "-loglevel", "error", "-f", "concat", "-safe", "0",
+                "-i", list_path, "-c", "copy", output,
+            ],
+            check=True,
+        )
+    finally:
+        os.remove(list_path)
+
+
+@dataclass
+class SegmentReport:
+    output: str
+    frames: int = 0
+    segments: int = 1
+    workers: int = 1
+    index_seconds: float = 0.0
+    split_seconds: float = 0.0
+    encode_seconds: float = 0.0
+    concat_seconds: float = 0.0
+    total_seconds: float = 0.0
+    fallback: Optional[str] = None
+
+    def to_dict(self) -> Dict:
+        return asdict(self)
+
+    def summary(self) -> str:
+        text = (
+            f"Encoded {self.frames} frames in {self.segments} segments with "
+            f"{self.workers} workers in {self.total_seconds:.1f}s (index "
+            f"{self.index_seconds:.1f}s, split {self.split_seconds:.1f}s, encode "
+            f"{self.encode_seconds:.1f}s, concat {self.concat_seconds:.1f}s)"
+        )
+        if self.fallback:
+            text += f"; {self.fallback}"
+        return text
+
+
+def extract_video_segmented(
+    mcap_path: str,
+    output: str,
+    topic: str = IMAGE_TOPIC,
+    segments: Optional[int] = None,
+    workers: Optional[int] = None,
+    encoder: str = ENCODER,
+    scratch_dir: Optional[str] = None,
+) -> SegmentReport:
+    """
+    Encode ``topic`` as time segments in parallel and join them losslessly.
+
+    Args:
+        mcap_path (str): Source bag
+        output (str): Destination video (e.g. ``.mp4``)
+        topic (str): Image topic to encode
+        segments (Optional[int]): Segment count; defaults to ``workers``
+        workers (Optional[int]): Concurrent encoders; defaults to the CPUs this
+            container may use (cgroup quota, i.e. the pod's CPU request/limit)
+        encoder (str): Encoder CLI taking ``--image-topic TOPIC SRC DST``
+        scratch_dir (Optional[str]): Where segment files go; defaults next to ``output``
+
+    Returns:
+        SegmentReport: Timings per phase. One segment runs the encoder once on
+        the source, as the serial path does. So does anything that stops the
+        segmented path (a bag it cannot index, no ``ffmpeg``, a failed split,
+        segment encode or join); ``fallback`` then says why.
+    """
+    start = time.perf_counter()
+    workers = workers or available_cpus()
+    segments = segments or workers
+    report = SegmentReport(output=output, workers=workers)
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+
+    index_start = time.perf_counter()
+    try:
+        index = index_topic(mcap_path, topic)
+    except (ImportError, ValueError) as e:
+        # e.g. zstd/lz4 chunks without the decompressor, or a non-keyframe topic
+        return _encode_whole(mcap_path, output, topic, encoder, report, start, str(e))
+    report.frames = len(index.log_times)
+    report.index_seconds = time.perf_counter() - index_start
+    ranges = plan_segments(index.log_times, segments)
+    if len(ranges) > 1 and shutil.which("ffmpeg") is None:
+        return _encode_whole(
+            mcap_path, output, topic, encoder, report, start, "ffmpeg not found"
+        )
+    if len(ranges) == 1:
+        return _encode_whole(mcap_path, output, topic, encoder, report, start)
+
+    report.segments = len(ranges)
+    scratch_root = scratch_dir or os.path.dirname(os.path.abspath(output))
+    try:
+        with tempfile.TemporaryDirectory(prefix="segments_", dir=scratch_root) as tmpdir:
+            split_start = time.perf_counter()
+            parts_in = split_mcap(mcap_path, index, ranges, tmpdir)
+            report.split_seconds = time.perf_counter() - split_start
+
+            ext = os.path.splitext(output)[1] or ".mp4"
+            parts_out = [os.path.splitext(p)[0] + ext for p in parts_in]
+            encode_start = time.perf_counter()
+            # Each job is its own encoder process; threads only wait on them
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                list(
+                    pool.map(
+                        lambda io: encode(io[0], io[1], topic, encoder),
+                        zip(parts_in, parts_out),
+                    )
+                )
+            report.encode_seconds = time.perf_counter() - encode_start
+
+            concat_start = time.perf_counter()
+            concat_videos(parts_out, output)
+            report.concat_seconds = time.perf_counter() - concat_start
+    except (OSError, subprocess.SubprocessError) as e:
+        return _encode_whole(
+            mcap_path, output, topic, encoder, report, start, f"segmented encode: {e}"
+        )
+
+    report.total_seconds = time.perf_counter() - start
+    return report
+
+
+def _encode_whole(
+    mcap_path: str,
+    output: str,
+    topic: str,
+    encoder: str,
+    report: SegmentReport,
+    start: float,
+    reason: Optional[str] = None,
+) -> SegmentReport:
+    if reason:
+        report.fallback = f"{reason}; encoded as one segment"
+        print(f"Segmented encoding skipped: {report.fallback}")
+    encode_start = time.perf_counter()
+    encode(mcap_path, output, topic, encoder)
+    report.encode_seconds = time.perf_counter() - encode_start
+    report.segments = 1
+    report.workers = 1
+    report.total_seconds = time.perf_counter() - start
+    return report
+
+
+def benchmark(
+    mcap_path: str,
+    segment_counts: List[int],
+    topic: str = IMAGE_TOPIC,
+    workers: Optional[int] = None,
+    encoder: str = ENCODER,
+) -> List[Dict]:
+    """
+    Time segmented encoding for each segment count and report speedup over the first.
+
+    Returns:
+        List[Dict]: One report per count with ``speedup`` added
+    """
+    results = []
+    with tempfile.TemporaryDirectory(prefix="segment_bench_") as tmpdir:
+        for count in segment_counts:
+            output = os.path.join(tmpdir, f"video_{count}.mp4")
+            report = extract_video_segmented(
+                mcap_path, output, topic, count, workers or count, encoder
+            ).to_dict()
+            report["requested_segments"] = count
+            report["output_bytes"] = os.path.getsize(output)
+            results.append(report)
+    baseline = results[0]["total_seconds"] if results else 0.0
+    for result in results:
+        result["speedup"] = baseline / max(result["total_seconds"], 1e-9)
+    return results
+
+
+def parse_arguments() -> argparse.Namespace:
+    """
+    Parse command line arguments.
+
+    Returns:
+        argparse.Namespace: Parsed command line arguments
+    """
+    parser = argparse.ArgumentParser(
+        description="Encode an MCAP image topic as parallel time segments",
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+    )
+    parser.add_argument("mcap", type=str, help="Source MCAP file")
+    parser.add_argument("--output", type=str, default="output_behavior.mp4", help="Video")
+    parser.add_argument("--topic", type=str, default=IMAGE_TOPIC, help="Image topic")
+    parser.add_argument("--segments", type=int, default=None, help="Segment count")
+    parser.add_argument("--workers", type=int, default=None, help="Concurrent encoders")
+    parser.add_argument("--encoder", type=str, default=ENCODER, help="Encoder CLI")
+    parser.add_argument(
+        "--benchmark",
+        type=str,
+        default=None,
+        help="Comma-separated segment counts to time instead of encoding once",
+    )
+    return parser.parse_args()
+
+
+def main() -> None:
+    """Encode once, or run the segment-count benchmark."""
+    args = parse_arguments()
+    if args.benchmark:
+        counts = [int(c) for c in args.benchmark.split(",")]
+        results = benchmark(args.mcap, counts, args.topic, args.workers, args.encoder)
+        print(f"{'segments':>8s} {'workers':>7s} {'seconds':>8s} {'speedup':>7s}")
+        for result in results:
+            print(
+                f"{result['segments']:8d} {result['workers']:7d} "
+                f"{result['total_seconds']:8.2f} {result['speedup']:7.2f}"
+            )
+        print(json.dumps(results, indent=2))
+        return
+    report = extract_video_segmented(
+        args.mcap, args.output, args.topic, args.segments, args.workers, args.encoder
+    )
+    print(report.summary())
+
+
+if __name__ == "__main__":
+    main()